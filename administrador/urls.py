@@ -15,6 +15,7 @@ router.register(r'logs', LogEntryViewSet, basename='admin-log')
 urlpatterns = [
     path('', include(router.urls)),
     path('stats/', AdminDashboardStatsAPIView.as_view(), name='admin-dashboard-stats'),
+    path('utilizacao/', UtilizacaoMedicosAPIView.as_view(), name='admin-utilizacao-medicos'),
     # --- NEW: Super Admin endpoint ---
     path('super/create-clinic-with-admin/', ClinicWithAdminCreateView.as_view(), name='super-create-clinic'),
     # --- NEW: Super Admin endpoint ---
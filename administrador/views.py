@@ -11,7 +11,8 @@ from agendamentos.models import Consulta
 # Modelos do projeto
 from users.models import User, Admin
 from pacientes.models import Paciente
-from medicos.models import Medico
+from medicos.models import Medico, UtilizacaoSemanal
+from medicos.utilizacao import indicadores, semana_de
 from secretarias.models import Secretaria
 from .models import LogEntry
 from clinicas.models import Clinica
@@ -34,6 +35,9 @@ from django.core.mail import send_mail
 from django.conf import settings
 from rest_framework import generics
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
 
 # --- NOVO: permissão para Superuser OU Admin de clínica ---
 class IsSuperOrClinicAdmin(permissions.BasePermission):
@@ -431,4 +435,55 @@ class AssignClinicAdminAPIView(APIView):
                 "admin_email": user.email,
             },
             status=status.HTTP_200_OK,
-        )
\ No newline at end of file
+        )
+
+# --- Indicadores semanais de utilização dos médicos ---
+class UtilizacaoMedicosAPIView(APIView):
+    """
+    Taxa de ocupação, taxa de faltas e carga média diária por médico e semana.
+    GET /api/admin/utilizacao/?semanas=8&ate=AAAA-MM-DD&medico=<id>&clinica=<id>
+    O admin de clínica vê a própria clínica; o superusuário informa `clinica`.
+    Lê os consolidados de `UtilizacaoSemanal`: o custo cresce com as semanas
+    exibidas, não com o número de consultas.
+    """
+    permission_classes = [IsSuperOrClinicAdmin]
+    SEMANAS_PADRAO = 8
+    SEMANAS_MAXIMO = 52
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        try:
+            semanas = int(params.get('semanas', self.SEMANAS_PADRAO))
+            medico_id = int(params['medico']) if params.get('medico') else None
+            clinica_id = int(params['clinica']) if params.get('clinica') else None
+        except ValueError:
+            return Response(
+                {"error": "Os parâmetros 'semanas', 'medico' e 'clinica' devem ser números."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        semanas = min(max(semanas, 1), self.SEMANAS_MAXIMO)
+
+        if not request.user.is_superuser:
+            clinica_id = request.user.perfil_admin.clinica_id
+        elif clinica_id is None:
+            return Response({"error": "Informe o parâmetro 'clinica'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        ate = parse_date(params.get('ate') or '') or timezone.now().date()
+        ultima = semana_de(ate)
+        primeira = ultima - timedelta(weeks=semanas - 1)
+
+        linhas = (
+            UtilizacaoSemanal.objects
+            .filter(clinica_id=clinica_id, semana__gte=primeira, semana__lte=ultima)
+            .select_related('medico')
+            .order_by('semana', 'medico__first_name', 'medico_id')
+        )
+        if medico_id is not None:
+            linhas = linhas.filter(medico_id=medico_id)
+
+        return Response({
+            'clinica': clinica_id,
+            'semana_inicial': primeira,
+            'semana_final': ultima,
+            'resultados': indicadores(linhas),
+        })
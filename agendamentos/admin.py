@@ -1,6 +1,6 @@
 # agendamentos/admin.py
 from django.contrib import admin
-from .models import Consulta, Pagamento, ConsultaStatusLog
+from .models import Consulta, Pagamento, ConsultaStatusLog, AtendimentoConsulta
 
 class ConsultaStatusLogInline(admin.TabularInline):
     model = ConsultaStatusLog
@@ -36,4 +36,10 @@ class ConsultaAdmin(admin.ModelAdmin):
     def get_inline_instances(self, request, obj=None):
         if not obj:
             return []
-        return super().get_inline_instances(request, obj)
\ No newline at end of file
+        return super().get_inline_instances(request, obj)
+
+@admin.register(AtendimentoConsulta)
+class AtendimentoConsultaAdmin(admin.ModelAdmin):
+    list_display = ('consulta', 'medico', 'dia', 'check_in', 'chamada', 'inicio', 'fim')
+    list_filter = ('dia',)
+    raw_id_fields = ('consulta', 'medico')
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AgendamentosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'agendamentos'
+
+    def ready(self):
+        # Importa os sinais para que eles sejam conectados quando a app for carregada.
+        import agendamentos.signals
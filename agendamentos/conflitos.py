@@ -0,0 +1,70 @@
+# agendamentos/conflitos.py
+"""
+Verificação de conflitos em memória para operações com muitas consultas
+(lotes, séries recorrentes).
+
+Os horários ativos de todos os médicos e pacientes envolvidos são carregados
+com uma única consulta ao banco; cada novo horário é então testado com busca
+binária contra as listas ordenadas, que também recebem os horários já aceitos
+da própria operação.
+"""
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from django.db.models import Q
+
+from .consts import JANELA_CONFLITO
+from .models import Consulta
+
+
+def _colide(horarios, data_hora):
+    """True se algum horário da lista ordenada estiver a menos de JANELA_CONFLITO."""
+    i = bisect_left(horarios, data_hora)
+    if i < len(horarios) and horarios[i] - data_hora < JANELA_CONFLITO:
+        return True
+    return i > 0 and data_hora - horarios[i - 1] < JANELA_CONFLITO
+
+
+class MapaOcupacao:
+    """
+    Horários ocupados de um conjunto de médicos e pacientes entre `inicio` e `fim`.
+    """
+
+    def __init__(self, medico_ids, paciente_ids, inicio, fim, excluir_ids=()):
+        self.medicos = defaultdict(list)
+        self.pacientes = defaultdict(list)
+
+        medico_ids, paciente_ids = set(medico_ids), set(paciente_ids)
+        if not medico_ids and not paciente_ids:
+            return
+
+        consultas = (
+            Consulta.objects.ativas()
+            .filter(
+                Q(medico_id__in=medico_ids) | Q(paciente_id__in=paciente_ids),
+                data_hora__gt=inicio - JANELA_CONFLITO,
+                data_hora__lt=fim + JANELA_CONFLITO,
+            )
+            .exclude(pk__in=excluir_ids)
+            .order_by('data_hora')
+            .values_list('medico_id', 'paciente_id', 'data_hora')
+        )
+        # Já vêm em ordem de data_hora: os append mantêm cada lista ordenada
+        for medico_id, paciente_id, data_hora in consultas:
+            if medico_id in medico_ids:
+                self.medicos[medico_id].append(data_hora)
+            if paciente_id in paciente_ids:
+                self.pacientes[paciente_id].append(data_hora)
+
+    def conflito(self, medico_id, paciente_id, data_hora):
+        """Retorna 'medico', 'paciente' ou None."""
+        if _colide(self.medicos[medico_id], data_hora):
+            return 'medico'
+        if _colide(self.pacientes[paciente_id], data_hora):
+            return 'paciente'
+        return None
+
+    def reservar(self, medico_id, paciente_id, data_hora):
+        """Marca o horário como ocupado para os próximos testes."""
+        insort(self.medicos[medico_id], data_hora)
+        insort(self.pacientes[paciente_id], data_hora)
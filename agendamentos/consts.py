@@ -1,4 +1,5 @@
 # agendamentos/consts.py
+from datetime import time, timedelta
 from django.utils.translation import gettext_lazy as _
 
 # Opções para o status da consulta
@@ -7,11 +8,16 @@ STATUS_CONSULTA_CONFIRMADA = 'CONFIRMADA'
 STATUS_CONSULTA_CANCELADA = 'CANCELADA'
 STATUS_CONSULTA_CONCLUIDA = 'CONCLUIDA'
 STATUS_CONSULTA_REAGENDAMENTO_SOLICITADO = 'REAGENDAMENTO_SOLICITADO'
+# Recepção: paciente com check-in feito e paciente no consultório
+STATUS_CONSULTA_EM_ESPERA = 'EM_ESPERA'
+STATUS_CONSULTA_EM_ATENDIMENTO = 'EM_ATENDIMENTO'
 
 STATUS_CONSULTA_CHOICES = (
     (STATUS_CONSULTA_PENDENTE, _('Pendente')),
     (STATUS_CONSULTA_CONFIRMADA, _('Confirmada')),
     (STATUS_CONSULTA_CANCELADA, _('Cancelada')),
+    (STATUS_CONSULTA_EM_ESPERA, _('Em espera')),
+    (STATUS_CONSULTA_EM_ATENDIMENTO, _('Em atendimento')),
     (STATUS_CONSULTA_CONCLUIDA, _('Concluída')),
     ('SOLICITANDO_REAGENDAMENTO', 'Solicitando Reagendamento'),
     ('REAGENDADA', 'Reagendada'),
@@ -24,4 +30,52 @@ STATUS_PAGAMENTO_PAGO = 'PAGO'
 STATUS_PAGAMENTO_CHOICES = (
     (STATUS_PAGAMENTO_PENDENTE, _('Pendente')),
     (STATUS_PAGAMENTO_PAGO, _('Pago')),
-)
\ No newline at end of file
+)
+
+# Duração de uma consulta: duas consultas do mesmo médico (ou do mesmo paciente)
+# não podem começar a menos de 30 minutos uma da outra.
+JANELA_CONFLITO = timedelta(minutes=30)
+
+# Expediente padrão usado no cálculo de horários livres
+HORARIO_EXPEDIENTE_INICIO = time(8, 0)
+HORARIO_EXPEDIENTE_FIM = time(18, 0)
+INTERVALO_HORARIOS = timedelta(minutes=30)
+
+# Tempo (em segundos) que os horários livres de um médico/dia ficam em cache
+DISPONIBILIDADE_CACHE_TTL = 60 * 60
+
+# Maior intervalo (em dias) aceito numa consulta de disponibilidade
+DISPONIBILIDADE_MAX_DIAS = 31
+
+# Maior quantidade de consultas aceita em uma única requisição de agendamento em lote
+LOTE_MAXIMO = 10_000
+
+# Maior número de ocorrências de uma série recorrente (dois anos de sessões semanais)
+SERIE_MAX_OCORRENCIAS = 104
+
+# Situações de uma entrada na lista de espera
+STATUS_ESPERA_AGUARDANDO = 'AGUARDANDO'
+STATUS_ESPERA_ATENDIDA = 'ATENDIDA'
+STATUS_ESPERA_CANCELADA = 'CANCELADA'
+
+STATUS_ESPERA_CHOICES = (
+    (STATUS_ESPERA_AGUARDANDO, _('Aguardando')),
+    (STATUS_ESPERA_ATENDIDA, _('Atendida')),
+    (STATUS_ESPERA_CANCELADA, _('Cancelada')),
+)
+
+# Quantas entradas da lista de espera são avaliadas por vaga liberada
+LISTA_ESPERA_CANDIDATOS = 20
+
+# Tempo (em segundos) que a fila de espera de um médico fica em cache
+FILA_CACHE_TTL = 60 * 60
+
+# Quantos atendimentos recentes pesam na duração média usada na estimativa de espera
+JANELA_MEDIA_ATENDIMENTOS = 50
+
+# Tempo durante o qual uma Idempotency-Key (e a resposta guardada) vale
+IDEMPOTENCIA_TTL = timedelta(hours=24)
+
+# Tempo de reserva de uma Idempotency-Key em processamento: se o processo cair
+# antes de guardar a resposta, a chave pode ser retomada depois deste prazo
+IDEMPOTENCIA_RESERVA = timedelta(minutes=1)
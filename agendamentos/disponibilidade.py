@@ -0,0 +1,71 @@
+# agendamentos/disponibilidade.py
+"""
+Cálculo dos horários livres dos médicos.
+
+Os horários de cada médico/dia saem dos mapas de bits de `medicos.ocupacao`
+(horário de trabalho, ausências e consultas) e ficam em cache até que a agenda
+daquele médico/dia mude (ver `agendamentos.signals`).
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .consts import DISPONIBILIDADE_CACHE_TTL
+from medicos.ocupacao import ocupacoes, horarios_do_dia
+
+
+def _chave(medico_id, dia):
+    return f'disponibilidade:{medico_id}:{dia.isoformat()}'
+
+
+def combinar(dia, hora):
+    """`datetime.combine` respeitando a configuração USE_TZ do projeto."""
+    valor = datetime.combine(dia, hora)
+    return timezone.make_aware(valor) if settings.USE_TZ else valor
+
+
+def horarios_livres(medico_ids, dias):
+    """
+    Retorna {medico_id: {dia: ['08:00', '08:30', ...]}}.
+
+    Os pares médico/dia presentes no cache são reaproveitados; os demais saem
+    dos mapas de ocupação, lidos (ou montados) juntos.
+    """
+    pares = [(medico_id, dia) for medico_id in medico_ids for dia in dias]
+    em_cache = cache.get_many([_chave(*par) for par in pares])
+
+    resultado = defaultdict(dict)
+    faltantes = []
+    for medico_id, dia in pares:
+        livres = em_cache.get(_chave(medico_id, dia))
+        if livres is None:
+            faltantes.append((medico_id, dia))
+        else:
+            resultado[medico_id][dia] = livres
+
+    if faltantes:
+        # Mapas de todos os pares faltantes de uma vez (montados sob demanda)
+        mapas = ocupacoes(faltantes)
+        novos = {}
+        for medico_id, dia in faltantes:
+            livres = [horario.strftime('%H:%M') for horario in horarios_do_dia(dia, *mapas[(medico_id, dia)])]
+            resultado[medico_id][dia] = livres
+            novos[_chave(medico_id, dia)] = livres
+        cache.set_many(novos, DISPONIBILIDADE_CACHE_TTL)
+
+    return resultado
+
+
+def invalidar_disponibilidade(pares):
+    """Descarta do cache os horários livres dos pares (medico_id, dia) informados."""
+    chaves = [_chave(medico_id, dia) for medico_id, dia in pares]
+    if not chaves:
+        return
+    cache.delete_many(chaves)
+    # Repete após o commit: uma leitura concorrente pode ter recalculado o cache
+    # antes de a transação que alterou a agenda ser confirmada.
+    transaction.on_commit(lambda: cache.delete_many(chaves))
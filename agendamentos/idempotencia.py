@@ -0,0 +1,119 @@
+# agendamentos/idempotencia.py
+"""
+Suporte ao cabeçalho `Idempotency-Key` nas escritas de agendamento e pagamento.
+
+A primeira requisição com uma chave reserva a chave, executa a view e guarda a
+resposta. Repetições da mesma requisição (ex.: o aplicativo reenviando após
+uma falha de rede) recebem a resposta guardada sem tocar nas tabelas da agenda.
+
+Enquanto a primeira requisição roda, a reserva só vale por IDEMPOTENCIA_RESERVA;
+a validade completa (IDEMPOTENCIA_TTL) começa quando a resposta é guardada. Se
+o processo cair no meio, a chave fica livre para uma nova tentativa depois da
+reserva, em vez de responder 409 até expirar.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .consts import IDEMPOTENCIA_TTL, IDEMPOTENCIA_RESERVA
+from .models import ChaveIdempotencia
+
+CABECALHO = 'Idempotency-Key'
+
+
+def _impressao(request):
+    corpo = json.dumps(request.data, sort_keys=True, default=str)
+    bruto = f'{request.method}|{request.path}|{corpo}'
+    return hashlib.sha256(bruto.encode()).hexdigest()
+
+
+def _repetir(registro):
+    response = Response(registro.corpo, status=registro.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotente(metodo):
+    """
+    Decorador para métodos de APIView. Sem o cabeçalho, a view roda normalmente.
+    Respostas 5xx não são guardadas: a chave é liberada para uma nova tentativa.
+    """
+    @wraps(metodo)
+    def wrapper(self, request, *args, **kwargs):
+        chave = request.headers.get(CABECALHO)
+        if not chave or not request.user.is_authenticated:
+            return metodo(self, request, *args, **kwargs)
+        if len(chave) > 255:
+            return Response(
+                {"error": f"O cabeçalho {CABECALHO} deve ter no máximo 255 caracteres."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        agora = timezone.now()
+        impressao = _impressao(request)
+        registro = ChaveIdempotencia.objects.filter(
+            usuario=request.user, chave=chave, expira_em__gt=agora
+        ).first()
+
+        if registro is None:
+            try:
+                with transaction.atomic():
+                    # Uma chave expirada (ou reserva abandonada) ainda não removida pode ser reutilizada
+                    ChaveIdempotencia.objects.filter(
+                        usuario=request.user, chave=chave, expira_em__lte=agora
+                    ).delete()
+                    registro = ChaveIdempotencia.objects.create(
+                        usuario=request.user, chave=chave, impressao=impressao,
+                        expira_em=agora + IDEMPOTENCIA_RESERVA,
+                    )
+            except IntegrityError:
+                # Outra requisição com a mesma chave acabou de reservá-la
+                registro = ChaveIdempotencia.objects.filter(usuario=request.user, chave=chave).first()
+                if registro is None or registro.status_code is None:
+                    return Response(
+                        {"error": "Uma requisição com esta chave ainda está em processamento."},
+                        status=status.HTTP_409_CONFLICT
+                    )
+            else:
+                return _executar(metodo, self, request, args, kwargs, registro)
+
+        if registro.impressao != impressao:
+            return Response(
+                {"error": f"O {CABECALHO} informado já foi usado em outra requisição."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        if registro.status_code is None:
+            return Response(
+                {"error": "Uma requisição com esta chave ainda está em processamento."},
+                status=status.HTTP_409_CONFLICT
+            )
+        return _repetir(registro)
+
+    return wrapper
+
+
+def _executar(metodo, view, request, args, kwargs, registro):
+    try:
+        response = metodo(view, request, *args, **kwargs)
+    except Exception:
+        registro.delete()
+        raise
+
+    if response.status_code >= 500:
+        registro.delete()
+        return response
+
+    # Guarda exatamente o JSON enviado ao cliente. Se a reserva venceu e outra
+    # requisição retomou a chave, o registro já não existe e nada é gravado.
+    ChaveIdempotencia.objects.filter(pk=registro.pk).update(
+        status_code=response.status_code,
+        corpo=json.loads(JSONRenderer().render(response.data) or 'null'),
+        expira_em=timezone.now() + IDEMPOTENCIA_TTL,
+    )
+    return response
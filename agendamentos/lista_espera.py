@@ -0,0 +1,185 @@
+# agendamentos/lista_espera.py
+"""
+Preenchimento automático de vagas com pacientes da lista de espera.
+
+Quando uma consulta futura é cancelada, removida ou remarcada, o horário
+liberado é oferecido à primeira entrada elegível da fila do médico (ou da
+especialidade na clínica) e já fica agendado para o paciente. O trabalho roda
+depois do commit, numa thread em segundo plano, para não atrasar a requisição
+que liberou a vaga.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from heapq import merge
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .conflitos import MapaOcupacao
+from .consts import (
+    STATUS_CONSULTA_CANCELADA, STATUS_PAGAMENTO_PENDENTE,
+    STATUS_ESPERA_AGUARDANDO, STATUS_ESPERA_ATENDIDA, LISTA_ESPERA_CANDIDATOS,
+)
+from .models import Consulta, Pagamento, ConsultaStatusLog, BloqueioAgenda, ListaEspera
+from medicos.models import Medico
+
+logger = logging.getLogger(__name__)
+
+# Uma única thread: as vagas são tratadas em ordem, sem disputarem o bloqueio entre si
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lista-espera')
+
+
+def vagas_liberadas(alteracoes):
+    """
+    Estados (de antes da alteração) cujos horários futuros ficaram livres por
+    cancelamento, remoção ou remarcação da consulta.
+    """
+    agora = timezone.now()
+    vagas = []
+    for antes, depois in alteracoes:
+        if antes is None or antes.data_hora is None or antes.data_hora <= agora:
+            continue
+        if antes.status_atual == STATUS_CONSULTA_CANCELADA:
+            continue
+        if (
+            depois is None
+            or depois.status_atual == STATUS_CONSULTA_CANCELADA
+            or (depois.medico_id, depois.data_hora) != (antes.medico_id, antes.data_hora)
+        ):
+            vagas.append(antes)
+    return vagas
+
+
+def agendar_preenchimento(vagas):
+    """Agenda o preenchimento das vagas para depois do commit da transação corrente."""
+    vagas = list(vagas)
+    if not vagas:
+        return
+
+    def disparar():
+        if settings.LISTA_ESPERA_ASSINCRONA:
+            _executor.submit(_preencher_em_segundo_plano, vagas)
+        else:
+            preencher_vagas(vagas)
+
+    transaction.on_commit(disparar)
+
+
+def _preencher_em_segundo_plano(vagas):
+    try:
+        preencher_vagas(vagas)
+    except Exception:
+        logger.exception('Falha ao preencher vagas com a lista de espera.')
+    finally:
+        # Fora do ciclo de requisição ninguém fecha a conexão desta thread
+        connections.close_all()
+
+
+def preencher_vagas(vagas):
+    """Preenche cada vaga e retorna as consultas criadas."""
+    consultas = []
+    for vaga in vagas:
+        consulta = preencher_vaga(vaga)
+        if consulta is not None:
+            consultas.append(consulta)
+    return consultas
+
+
+def proximos_da_fila(medico_id, clinica_id, especialidade, dia, limite=LISTA_ESPERA_CANDIDATOS):
+    """
+    Primeiras entradas elegíveis para uma vaga do médico no dia informado.
+
+    A fila do médico e a da especialidade são lidas cada uma pelo seu índice,
+    com LIMIT, e intercaladas mantendo a ordem de prioridade e chegada; o
+    custo não depende do tamanho da lista de espera.
+    """
+    base = (
+        ListaEspera.objects
+        .filter(Q(data_limite__isnull=True) | Q(data_limite__gte=dia),
+                clinica_id=clinica_id, status=STATUS_ESPERA_AGUARDANDO)
+        .select_related('paciente__user')
+        .select_for_update(skip_locked=True, of=('self',))
+        .order_by('-prioridade', 'data_entrada', 'pk')
+    )
+    filas = [base.filter(medico_id=medico_id)[:limite]]
+    if especialidade:
+        filas.append(base.filter(medico__isnull=True, especialidade=especialidade)[:limite])
+    ordem = lambda entrada: (-entrada.prioridade, entrada.data_entrada, entrada.pk)
+    return list(merge(*filas, key=ordem))[:limite]
+
+
+def _valor_da_vaga(vaga):
+    valor = Consulta.objects.filter(pk=vaga.id).values_list('valor', flat=True).first()
+    if valor is None:
+        # Consulta removida: usa o valor da consulta mais recente do médico
+        valor = (
+            Consulta.objects.filter(medico_id=vaga.medico_id)
+            .order_by('-data_hora').values_list('valor', flat=True).first()
+        )
+    return valor
+
+
+def preencher_vaga(vaga):
+    """
+    Agenda a vaga (`EstadoAgenda` da consulta que a liberou) para o primeiro
+    paciente elegível da fila. Retorna a nova consulta, ou None se a vaga já
+    foi ocupada ou se ninguém na fila pode assumi-la.
+    """
+    with transaction.atomic():
+        BloqueioAgenda.objects.bloquear_horarios(vaga.medico_id, [vaga.data_hora])
+        if Consulta.objects.conflitos(vaga.data_hora, medico=vaga.medico_id)['medico']:
+            return None
+
+        valor = _valor_da_vaga(vaga)
+        if valor is None:
+            return None
+
+        especialidade = (
+            Medico.objects.filter(pk=vaga.medico_id).values_list('especialidade', flat=True).first()
+        )
+        candidatos = proximos_da_fila(vaga.medico_id, vaga.clinica_id, especialidade, vaga.data_hora.date())
+        if not candidatos:
+            return None
+
+        # A agenda de todos os candidatos no horário, de uma vez
+        mapa = MapaOcupacao((), {entrada.paciente_id for entrada in candidatos}, vaga.data_hora, vaga.data_hora)
+        entrada = next(
+            (e for e in candidatos if mapa.conflito(vaga.medico_id, e.paciente_id, vaga.data_hora) is None),
+            None
+        )
+        if entrada is None:
+            return None
+
+        consulta = Consulta.objects.create(
+            paciente_id=entrada.paciente_id,
+            medico_id=vaga.medico_id,
+            clinica_id=vaga.clinica_id,
+            data_hora=vaga.data_hora,
+            valor=valor,
+        )
+        Pagamento.objects.create(consulta=consulta, status=STATUS_PAGAMENTO_PENDENTE, valor_pago=valor)
+        ConsultaStatusLog.objects.create(consulta=consulta, status_novo=consulta.status_atual, pessoa=None)
+        ListaEspera.objects.filter(pk=entrada.pk).update(status=STATUS_ESPERA_ATENDIDA, consulta=consulta)
+
+    _avisar_paciente(entrada, consulta)
+    return consulta
+
+
+def _avisar_paciente(entrada, consulta):
+    usuario = entrada.paciente.user
+    send_mail(
+        subject="Vaga disponível - MedLink",
+        message=(
+            f"Olá, {usuario.get_full_name()}!\n\n"
+            f"Surgiu uma vaga e agendamos a sua consulta para "
+            f"{consulta.data_hora.strftime('%d/%m/%Y às %H:%M')}.\n\n"
+            f"Se não puder comparecer, cancele pelo aplicativo para liberar o horário.\n\n"
+            f"Atenciosamente,\nEquipe MedLink"
+        ),
+        from_email=settings.EMAIL_HOST_USER,
+        recipient_list=[usuario.email],
+        fail_silently=True,
+    )
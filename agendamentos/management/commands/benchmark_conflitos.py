@@ -0,0 +1,176 @@
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from agendamentos.models import Consulta
+from agendamentos.views import ConsultaAPIView
+from clinicas.models import Clinica, Cidade, Estado, TipoClinica
+from pacientes.models import Paciente
+from secretarias.models import Secretaria
+from users.models import User
+
+
+class _Rollback(Exception):
+    """Usada para desfazer os dados gerados ao final do benchmark."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a latência da marcação de consultas conforme a tabela de consultas '
+        'cresce (ex.: de 10 mil a 5 milhões de linhas): a verificação de conflitos '
+        'isolada e a requisição completa de marcação (POST em ConsultaAPIView: '
+        'validação, bloqueio da agenda, conflitos, gravação e sinais), cada uma '
+        'desfeita ao final da medição. Os dados gerados são descartados ao final, '
+        'a menos que --manter seja usado.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanhos', nargs='+', type=int,
+            default=[10_000, 100_000, 1_000_000, 5_000_000],
+            help='Quantidades de consultas (em ordem crescente) a medir.'
+        )
+        parser.add_argument('--amostras', type=int, default=200, help='Verificações e marcações medidas por tamanho.')
+        parser.add_argument('--medicos', type=int, default=500, help='Quantidade de médicos gerados.')
+        parser.add_argument('--pacientes', type=int, default=20_000, help='Quantidade de pacientes gerados.')
+        parser.add_argument('--lote', type=int, default=10_000, help='Tamanho dos lotes de bulk_create.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--manter', action='store_true', help='Mantém os dados gerados no banco.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        tamanhos = sorted(options['tamanhos'])
+
+        try:
+            with transaction.atomic():
+                clinica, medicos, pacientes = self._criar_cadastros(options['medicos'], options['pacientes'])
+                secretaria = self._criar_secretaria(clinica)
+                self.stdout.write(self.style.HTTP_INFO(
+                    f"{'consultas':>12} | {'conflitos: mediana (ms)':>23} | {'p95 (ms)':>9} | "
+                    f"{'marcação: mediana (ms)':>22} | {'p95 (ms)':>9}"
+                ))
+
+                total = Consulta.objects.count()
+                for tamanho in tamanhos:
+                    total = self._popular(total, tamanho, clinica, medicos, pacientes, options['lote'])
+                    mediana, p95 = self._medir(medicos, pacientes, options['amostras'])
+                    mediana_marcacao, p95_marcacao = self._medir_marcacao(
+                        secretaria, clinica, medicos, pacientes, options['amostras']
+                    )
+                    self.stdout.write(
+                        f'{total:>12} | {mediana:>23.3f} | {p95:>9.3f} | '
+                        f'{mediana_marcacao:>22.3f} | {p95_marcacao:>9.3f}'
+                    )
+
+                if not options['manter']:
+                    raise _Rollback()
+        except _Rollback:
+            self.stdout.write(self.style.WARNING('Dados do benchmark descartados.'))
+            return
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finalizado; dados mantidos no banco.'))
+
+    # Período coberto pelas consultas geradas (aprox. 5 anos)
+    INICIO = datetime(2022, 1, 3, 7, 0)
+    DIAS = 5 * 365
+
+    def _horario_aleatorio(self):
+        dia = self.INICIO + timedelta(days=self.rng.randrange(self.DIAS))
+        return dia + timedelta(minutes=30 * self.rng.randrange(24))
+
+    def _criar_cadastros(self, n_medicos, n_pacientes):
+        estado, _ = Estado.objects.get_or_create(uf='ZZ', defaults={'nome': 'Benchmark'})
+        cidade, _ = Cidade.objects.get_or_create(nome='Benchmark', estado=estado)
+        tipo, _ = TipoClinica.objects.get_or_create(descricao='Benchmark')
+        clinica = Clinica.objects.create(
+            nome_fantasia='Clínica Benchmark', cnpj='99999999999999', cidade=cidade, tipo_clinica=tipo
+        )
+
+        def usuarios(prefixo, quantidade, tipo_usuario):
+            novos = [
+                User(
+                    cpf=f'{prefixo}{i:09d}', email=f'bench.{tipo_usuario.lower()}.{i}@medlink.local',
+                    first_name='Bench', last_name=str(i), user_type=tipo_usuario, password='!'
+                )
+                for i in range(quantidade)
+            ]
+            User.objects.bulk_create(novos, batch_size=5_000)
+            return list(User.objects.filter(cpf__startswith=prefixo, user_type=tipo_usuario).values_list('id', flat=True))
+
+        medicos = usuarios('98', n_medicos, 'MEDICO')
+        pacientes_ids = usuarios('97', n_pacientes, 'PACIENTE')
+        Paciente.objects.bulk_create([Paciente(user_id=uid) for uid in pacientes_ids], batch_size=5_000)
+        return clinica, medicos, pacientes_ids
+
+    def _criar_secretaria(self, clinica):
+        usuario = User.objects.create(
+            cpf='96000000000', email='bench.secretaria@medlink.local', first_name='Bench',
+            last_name='Secretaria', user_type='SECRETARIA', password='!'
+        )
+        Secretaria.objects.create(user=usuario, clinica=clinica)
+        return usuario
+
+    def _popular(self, total, alvo, clinica, medicos, pacientes, lote):
+        while total < alvo:
+            quantidade = min(lote, alvo - total)
+            Consulta.objects.bulk_create([
+                Consulta(
+                    medico_id=self.rng.choice(medicos),
+                    paciente_id=self.rng.choice(pacientes),
+                    clinica=clinica,
+                    data_hora=self._horario_aleatorio(),
+                    valor=Decimal('100.00'),
+                )
+                for _ in range(quantidade)
+            ])
+            total += quantidade
+        return total
+
+    def _medir(self, medicos, pacientes, amostras):
+        tempos = []
+        for _ in range(amostras):
+            medico_id = self.rng.choice(medicos)
+            paciente_id = self.rng.choice(pacientes)
+            data_hora = self._horario_aleatorio()
+            inicio = time.perf_counter()
+            Consulta.objects.conflitos(data_hora, medico=medico_id, paciente=paciente_id)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        return self._resumo(tempos)
+
+    def _medir_marcacao(self, secretaria, clinica, medicos, pacientes, amostras):
+        """Tempo da requisição de marcação inteira; cada marcação é desfeita num savepoint."""
+        fabrica = APIRequestFactory()
+        view = ConsultaAPIView.as_view()
+        tempos, recusadas = [], 0
+        for _ in range(amostras):
+            dados = {
+                'medico': self.rng.choice(medicos),
+                'paciente': self.rng.choice(pacientes),
+                'clinica': clinica.pk,
+                'data_hora': self._horario_aleatorio().isoformat(),
+                'valor': '100.00',
+            }
+            request = fabrica.post('/api/agendamentos/', dados, format='json')
+            force_authenticate(request, user=secretaria)
+            savepoint = transaction.savepoint()
+            inicio = time.perf_counter()
+            response = view(request)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+            transaction.savepoint_rollback(savepoint)
+            if response.status_code != 201:
+                recusadas += 1
+        if recusadas:
+            # Horários sorteados podem conflitar com a agenda gerada: essas amostras medem a recusa
+            self.stdout.write(self.style.WARNING(f'{recusadas} de {amostras} marcação(ões) recusada(s).'))
+        return self._resumo(tempos)
+
+    @staticmethod
+    def _resumo(tempos):
+        p95 = statistics.quantiles(tempos, n=20)[-1] if len(tempos) > 1 else tempos[0]
+        return statistics.median(tempos), p95
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from agendamentos.models import ChaveIdempotencia
+
+
+class Command(BaseCommand):
+    help = (
+        'Remove as chaves de idempotência expiradas em lotes, para não manter '
+        'transações longas nem bloquear a tabela. Pode ser agendado (ex.: cron a cada hora).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5_000, help='Quantidade de chaves removidas por DELETE.')
+
+    def handle(self, *args, **options):
+        agora = timezone.now()
+        lote = max(1, options['lote'])
+        total = 0
+        while True:
+            # Usa o índice de expira_em; cada DELETE atinge no máximo `lote` linhas
+            ids = list(
+                ChaveIdempotencia.objects.filter(expira_em__lte=agora)
+                .order_by('expira_em')
+                .values_list('pk', flat=True)[:lote]
+            )
+            if not ids:
+                break
+            removidas, _ = ChaveIdempotencia.objects.filter(pk__in=ids).delete()
+            total += removidas
+
+        self.stdout.write(self.style.SUCCESS(f'{total} chave(s) de idempotência expirada(s) removida(s).'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0002_consulta_remarcacoes_paciente'),
+        ('clinicas', '0002_initial'),
+        ('pacientes', '0002_paciente_altura_cm_paciente_av_rua_paciente_bairro_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consulta',
+            index=models.Index(fields=['medico', 'data_hora'], name='consulta_medico_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consulta',
+            index=models.Index(fields=['paciente', 'data_hora'], name='consulta_paciente_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consulta',
+            index=models.Index(fields=['clinica', 'data_hora'], name='consulta_clinica_data_idx'),
+        ),
+    ]
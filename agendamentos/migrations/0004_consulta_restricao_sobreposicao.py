@@ -0,0 +1,50 @@
+# Restrições de exclusão opcionais (somente PostgreSQL) contra consultas sobrepostas.
+
+from django.conf import settings
+from django.db import migrations
+
+RESTRICOES = {
+    'consulta_medico_sem_sobreposicao': 'medico_id',
+    'consulta_paciente_sem_sobreposicao': 'paciente_id',
+}
+
+
+def _habilitada(schema_editor):
+    return (
+        schema_editor.connection.vendor == 'postgresql'
+        and getattr(settings, 'CONSULTA_RESTRICAO_SOBREPOSICAO', False)
+    )
+
+
+def criar_restricoes(apps, schema_editor):
+    if not _habilitada(schema_editor):
+        return
+    tabela = apps.get_model('agendamentos', 'Consulta')._meta.db_table
+    tipo_intervalo = 'tstzrange' if settings.USE_TZ else 'tsrange'
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    for nome, coluna in RESTRICOES.items():
+        schema_editor.execute(
+            f"ALTER TABLE {tabela} ADD CONSTRAINT {nome} EXCLUDE USING gist ("
+            f"{coluna} WITH =, "
+            f"{tipo_intervalo}(data_hora, data_hora + interval '30 minutes') WITH &&"
+            f") WHERE (status_atual <> 'CANCELADA')"
+        )
+
+
+def remover_restricoes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    tabela = apps.get_model('agendamentos', 'Consulta')._meta.db_table
+    for nome in RESTRICOES:
+        schema_editor.execute(f'ALTER TABLE {tabela} DROP CONSTRAINT IF EXISTS {nome}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0003_consulta_indices_conflito'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_restricoes, remover_restricoes),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0004_consulta_restricao_sobreposicao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BloqueioAgenda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Dia')),
+                ('medico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bloqueios_agenda', to=settings.AUTH_USER_MODEL, verbose_name='Médico')),
+            ],
+            options={
+                'verbose_name': 'Bloqueio de Agenda',
+                'verbose_name_plural': 'Bloqueios de Agenda',
+                'constraints': [models.UniqueConstraint(fields=('medico', 'dia'), name='bloqueio_agenda_medico_dia_unico')],
+            },
+        ),
+    ]
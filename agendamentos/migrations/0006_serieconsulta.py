@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0005_bloqueioagenda'),
+        ('clinicas', '0002_initial'),
+        ('pacientes', '0002_paciente_altura_cm_paciente_av_rua_paciente_bairro_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SerieConsulta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_inicio', models.DateTimeField(verbose_name='Data e Hora da Primeira Consulta')),
+                ('intervalo_semanas', models.PositiveSmallIntegerField(default=1, verbose_name='Intervalo em Semanas')),
+                ('ocorrencias', models.PositiveSmallIntegerField(verbose_name='Número de Ocorrências')),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Valor de Cada Consulta')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('clinica', models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, related_name='series_consultas', to='clinicas.clinica', verbose_name='Clínica')),
+                ('criado_por', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Criado por')),
+                ('medico', models.ForeignKey(limit_choices_to={'user_type': 'MEDICO'}, on_delete=django.db.models.deletion.RESTRICT, related_name='series_consultas', to=settings.AUTH_USER_MODEL, verbose_name='Médico')),
+                ('paciente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series_consultas', to='pacientes.paciente', verbose_name='Paciente')),
+            ],
+            options={
+                'verbose_name': 'Série de Consultas',
+                'verbose_name_plural': 'Séries de Consultas',
+                'ordering': ['-data_criacao'],
+            },
+        ),
+        migrations.AddField(
+            model_name='consulta',
+            name='serie',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='consultas', to='agendamentos.serieconsulta', verbose_name='Série'),
+        ),
+    ]
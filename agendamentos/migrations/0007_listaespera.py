@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0006_serieconsulta'),
+        ('clinicas', '0002_initial'),
+        ('pacientes', '0002_paciente_altura_cm_paciente_av_rua_paciente_bairro_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListaEspera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('especialidade', models.CharField(blank=True, choices=[('CARDIOLOGIA', 'Cardiologia'), ('DERMATOLOGIA', 'Dermatologia'), ('GINECOLOGIA', 'Ginecologia'), ('ORTOPEDIA', 'Ortopedia'), ('PEDIATRIA', 'Pediatria'), ('CLINICA_GERAL', 'Clínica Geral')], max_length=50, verbose_name='Especialidade')),
+                ('prioridade', models.PositiveSmallIntegerField(default=0, verbose_name='Prioridade')),
+                ('data_limite', models.DateField(blank=True, null=True, verbose_name='Data Limite')),
+                ('status', models.CharField(choices=[('AGUARDANDO', 'Aguardando'), ('ATENDIDA', 'Atendida'), ('CANCELADA', 'Cancelada')], default='AGUARDANDO', max_length=20, verbose_name='Situação')),
+                ('data_entrada', models.DateTimeField(auto_now_add=True, verbose_name='Data de Entrada')),
+                ('clinica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lista_espera', to='clinicas.clinica', verbose_name='Clínica')),
+                ('consulta', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='origem_lista_espera', to='agendamentos.consulta', verbose_name='Consulta Agendada')),
+                ('medico', models.ForeignKey(blank=True, limit_choices_to={'user_type': 'MEDICO'}, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lista_espera', to=settings.AUTH_USER_MODEL, verbose_name='Médico')),
+                ('paciente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='listas_espera', to='pacientes.paciente', verbose_name='Paciente')),
+            ],
+            options={
+                'verbose_name': 'Lista de Espera',
+                'verbose_name_plural': 'Listas de Espera',
+                'ordering': ['-prioridade', 'data_entrada'],
+                'indexes': [models.Index(fields=['medico', 'clinica', 'status', '-prioridade', 'data_entrada'], name='espera_medico_fila_idx'), models.Index(fields=['clinica', 'especialidade', 'status', '-prioridade', 'data_entrada'], name='espera_especialidade_fila_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0007_listaespera'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=255, verbose_name='Chave')),
+                ('impressao', models.CharField(max_length=64, verbose_name='Impressão da Requisição')),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Status HTTP')),
+                ('corpo', models.JSONField(blank=True, null=True, verbose_name='Corpo da Resposta')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('expira_em', models.DateTimeField(db_index=True, verbose_name='Expira em')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chaves_idempotencia', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Chave de Idempotência',
+                'verbose_name_plural': 'Chaves de Idempotência',
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'chave'), name='idempotencia_usuario_chave_unica')],
+            },
+        ),
+    ]
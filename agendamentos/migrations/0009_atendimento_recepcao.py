@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0008_chaveidempotencia'),
+        ('users', '0002_admin'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TempoAtendimentoMedico',
+            fields=[
+                ('medico', models.OneToOneField(limit_choices_to={'user_type': 'MEDICO'}, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='tempo_atendimento', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('atendimentos', models.PositiveIntegerField(default=0)),
+                ('duracao_media', models.FloatField(default=0, verbose_name='Duração Média (segundos)')),
+            ],
+            options={
+                'verbose_name': 'Tempo de Atendimento do Médico',
+                'verbose_name_plural': 'Tempos de Atendimento dos Médicos',
+            },
+        ),
+        migrations.AlterField(
+            model_name='consulta',
+            name='status_atual',
+            field=models.CharField(choices=[('PENDENTE', 'Pendente'), ('CONFIRMADA', 'Confirmada'), ('CANCELADA', 'Cancelada'), ('EM_ESPERA', 'Em espera'), ('EM_ATENDIMENTO', 'Em atendimento'), ('CONCLUIDA', 'Concluída'), ('SOLICITANDO_REAGENDAMENTO', 'Solicitando Reagendamento'), ('REAGENDADA', 'Reagendada')], default='PENDENTE', max_length=50, verbose_name='Status Atual'),
+        ),
+        migrations.CreateModel(
+            name='AtendimentoConsulta',
+            fields=[
+                ('consulta', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='atendimento', serialize=False, to='agendamentos.consulta')),
+                ('dia', models.DateField()),
+                ('check_in', models.DateTimeField(verbose_name='Check-in')),
+                ('chamada', models.DateTimeField(blank=True, null=True, verbose_name='Chamada')),
+                ('inicio', models.DateTimeField(blank=True, null=True, verbose_name='Início do Atendimento')),
+                ('fim', models.DateTimeField(blank=True, null=True, verbose_name='Fim do Atendimento')),
+                ('medico', models.ForeignKey(limit_choices_to={'user_type': 'MEDICO'}, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Atendimento da Consulta',
+                'verbose_name_plural': 'Atendimentos das Consultas',
+                'indexes': [models.Index(fields=['medico', 'dia', 'check_in'], name='atendimento_fila_idx')],
+            },
+        ),
+    ]
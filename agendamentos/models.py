@@ -1,13 +1,84 @@
+from collections import namedtuple
+from datetime import timedelta
+
 from django.db import models
+from django.db.models import Count, Q
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import gettext_lazy as _
 from users.models import User
 from pacientes.models import Paciente
 from clinicas.models import Clinica # Importa o modelo Clinica
+from medicos.models import Medico
 from .consts import (
-    STATUS_CONSULTA_CHOICES, STATUS_CONSULTA_PENDENTE,
+    STATUS_CONSULTA_CHOICES, STATUS_CONSULTA_PENDENTE, STATUS_CONSULTA_CANCELADA,
     STATUS_PAGAMENTO_CHOICES, STATUS_PAGAMENTO_PENDENTE,
+    JANELA_CONFLITO, STATUS_ESPERA_CHOICES, STATUS_ESPERA_AGUARDANDO,
 )
 
+
+# Fotografia dos campos de uma consulta que afetam a agenda. Usada pelos sinais
+# para saber o que mudou (ex.: médico/dia de origem e de destino numa remarcação).
+EstadoAgenda = namedtuple(
+    'EstadoAgenda', ['id', 'medico_id', 'paciente_id', 'clinica_id', 'data_hora', 'status_atual']
+)
+
+
+class ConsultaQuerySet(models.QuerySet):
+    """Consultas reutilizáveis sobre a agenda."""
+
+    def ativas(self):
+        """Consultas que ainda ocupam horário na agenda (não canceladas)."""
+        return self.exclude(status_atual=STATUS_CONSULTA_CANCELADA)
+
+    def com_detalhes(self):
+        """
+        Carrega, no mesmo JOIN, tudo o que o `ConsultaSerializer` lê: paciente
+        e usuário, médico e perfil, clínica, pagamento e anotação. Assim uma
+        listagem custa uma única consulta, independente do número de linhas.
+        """
+        return self.select_related(
+            'paciente__user', 'medico__perfil_medico', 'clinica', 'pagamento', 'anotacao'
+        )
+
+    def conflitos(self, data_hora, medico=None, paciente=None, excluir_pk=None):
+        """
+        Verifica, em uma única ida ao banco, se o médico e/ou o paciente já têm
+        consulta ativa a menos de `JANELA_CONFLITO` de `data_hora`.
+
+        Retorna um dicionário {'medico': bool, 'paciente': bool}. A busca usa
+        os índices (medico, data_hora) e (paciente, data_hora).
+        """
+        filtro_medico = Q(medico=medico) if medico is not None else None
+        filtro_paciente = Q(paciente=paciente) if paciente is not None else None
+        alvos = [f for f in (filtro_medico, filtro_paciente) if f is not None]
+        if not alvos:
+            return {'medico': False, 'paciente': False}
+
+        alvo = alvos[0]
+        for extra in alvos[1:]:
+            alvo |= extra
+
+        qs = self.ativas().filter(
+            alvo,
+            data_hora__gt=data_hora - JANELA_CONFLITO,
+            data_hora__lt=data_hora + JANELA_CONFLITO,
+        )
+        if excluir_pk is not None:
+            qs = qs.exclude(pk=excluir_pk)
+
+        agregados = {}
+        if filtro_medico is not None:
+            agregados['medico'] = Count('id', filter=filtro_medico)
+        if filtro_paciente is not None:
+            agregados['paciente'] = Count('id', filter=filtro_paciente)
+        contagens = qs.aggregate(**agregados)
+
+        return {
+            'medico': bool(contagens.get('medico')),
+            'paciente': bool(contagens.get('paciente')),
+        }
+
+
 class Consulta(models.Model):
     """
     Representa a tabela `Consultas` no banco de dados.
@@ -61,6 +132,15 @@ class Consulta(models.Model):
         verbose_name=_('Clínica')
     )
 
+    # 4. Com a série recorrente que gerou a consulta (se houver)
+    serie = models.ForeignKey(
+        'SerieConsulta',
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='consultas',
+        verbose_name=_('Série')
+    )
+
     data_criacao = models.DateTimeField(
         auto_now_add=True,
         verbose_name=_('Data de Criação')
@@ -70,14 +150,284 @@ class Consulta(models.Model):
         verbose_name=_('Data de Atualização')
     )
     
+    objects = ConsultaQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Consulta")
         verbose_name_plural = _("Consultas")
         ordering = ['data_hora']
+        indexes = [
+            models.Index(fields=['medico', 'data_hora'], name='consulta_medico_data_idx'),
+            models.Index(fields=['paciente', 'data_hora'], name='consulta_paciente_data_idx'),
+            models.Index(fields=['clinica', 'data_hora'], name='consulta_clinica_data_idx'),
+        ]
         
     def __str__(self):
         return f"Consulta de {self.paciente.nome_completo} em {self.data_hora}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._estado_original = instance.estado_agenda()
+        return instance
+
+    def estado_agenda(self):
+        """
+        Retorna o `EstadoAgenda` atual da instância, ou None se algum dos campos
+        não estiver carregado (ex.: consultas com `.only()`).
+        """
+        campos = self.__dict__
+        nomes = ('medico_id', 'paciente_id', 'clinica_id', 'data_hora', 'status_atual')
+        if self.pk is None or any(nome not in campos for nome in nomes):
+            return None
+        data_hora = campos['data_hora']
+        if isinstance(data_hora, str):
+            data_hora = parse_datetime(data_hora)
+        return EstadoAgenda(
+            self.pk, campos['medico_id'], campos['paciente_id'], campos['clinica_id'],
+            data_hora, campos['status_atual'],
+        )
+
+
+class SerieConsulta(models.Model):
+    """
+    Regra de recorrência de uma série de consultas (ex.: sessões semanais).
+    As consultas geradas são linhas comuns de `Consulta`, ligadas à série.
+    """
+    paciente = models.ForeignKey(
+        Paciente,
+        on_delete=models.CASCADE,
+        related_name='series_consultas',
+        verbose_name=_('Paciente')
+    )
+    medico = models.ForeignKey(
+        User,
+        on_delete=models.RESTRICT,
+        limit_choices_to={'user_type': 'MEDICO'},
+        related_name='series_consultas',
+        verbose_name=_('Médico')
+    )
+    clinica = models.ForeignKey(
+        Clinica,
+        on_delete=models.RESTRICT,
+        related_name='series_consultas',
+        verbose_name=_('Clínica')
+    )
+    data_inicio = models.DateTimeField(verbose_name=_('Data e Hora da Primeira Consulta'))
+    intervalo_semanas = models.PositiveSmallIntegerField(
+        default=1,
+        verbose_name=_('Intervalo em Semanas')
+    )
+    ocorrencias = models.PositiveSmallIntegerField(verbose_name=_('Número de Ocorrências'))
+    valor = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name=_('Valor de Cada Consulta')
+    )
+    criado_por = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name=_('Criado por')
+    )
+    data_criacao = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('Data de Criação')
+    )
+
+    class Meta:
+        verbose_name = _("Série de Consultas")
+        verbose_name_plural = _("Séries de Consultas")
+        ordering = ['-data_criacao']
+
+    def __str__(self):
+        return f"Série de {self.ocorrencias} consultas a partir de {self.data_inicio}"
+
+    def horarios(self):
+        """Data/hora de cada ocorrência, em ordem crescente."""
+        passo = timedelta(weeks=self.intervalo_semanas)
+        return [self.data_inicio + passo * i for i in range(self.ocorrencias)]
+
+
+class ListaEspera(models.Model):
+    """
+    Paciente aguardando vaga com um médico específico ou, sem médico, com
+    qualquer médico da especialidade na clínica. A fila é ordenada por
+    prioridade (maior primeiro) e depois por ordem de chegada; os índices
+    seguem essa ordem para que a primeira entrada seja lida direto do índice.
+    """
+    paciente = models.ForeignKey(
+        Paciente,
+        on_delete=models.CASCADE,
+        related_name='listas_espera',
+        verbose_name=_('Paciente')
+    )
+    clinica = models.ForeignKey(
+        Clinica,
+        on_delete=models.CASCADE,
+        related_name='lista_espera',
+        verbose_name=_('Clínica')
+    )
+    medico = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True, blank=True,
+        limit_choices_to={'user_type': 'MEDICO'},
+        related_name='lista_espera',
+        verbose_name=_('Médico')
+    )
+    especialidade = models.CharField(
+        max_length=50,
+        choices=Medico.EspecialidadeChoices.choices,
+        blank=True,
+        verbose_name=_('Especialidade')
+    )
+    prioridade = models.PositiveSmallIntegerField(default=0, verbose_name=_('Prioridade'))
+    # Última data em que o paciente aceita ser encaixado (opcional)
+    data_limite = models.DateField(null=True, blank=True, verbose_name=_('Data Limite'))
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_ESPERA_CHOICES,
+        default=STATUS_ESPERA_AGUARDANDO,
+        verbose_name=_('Situação')
+    )
+    consulta = models.OneToOneField(
+        Consulta,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='origem_lista_espera',
+        verbose_name=_('Consulta Agendada')
+    )
+    data_entrada = models.DateTimeField(auto_now_add=True, verbose_name=_('Data de Entrada'))
+
+    class Meta:
+        verbose_name = _("Lista de Espera")
+        verbose_name_plural = _("Listas de Espera")
+        ordering = ['-prioridade', 'data_entrada']
+        indexes = [
+            models.Index(
+                fields=['medico', 'clinica', 'status', '-prioridade', 'data_entrada'],
+                name='espera_medico_fila_idx'
+            ),
+            models.Index(
+                fields=['clinica', 'especialidade', 'status', '-prioridade', 'data_entrada'],
+                name='espera_especialidade_fila_idx'
+            ),
+        ]
+
+    def __str__(self):
+        alvo = self.medico_id or self.get_especialidade_display()
+        return f"Espera de {self.paciente_id} por {alvo} ({self.status})"
+
+
+class ChaveIdempotencia(models.Model):
+    """
+    Resposta guardada para uma `Idempotency-Key` enviada por um usuário. Uma
+    nova tentativa com a mesma chave recebe esta resposta, sem repetir a
+    operação. `status_code` nulo indica que a primeira requisição ainda está
+    em andamento.
+    """
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='chaves_idempotencia',
+        verbose_name=_('Usuário')
+    )
+    chave = models.CharField(max_length=255, verbose_name=_('Chave'))
+    # Hash de método, caminho e corpo: a mesma chave não vale para outra requisição
+    impressao = models.CharField(max_length=64, verbose_name=_('Impressão da Requisição'))
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name=_('Status HTTP'))
+    corpo = models.JSONField(null=True, blank=True, verbose_name=_('Corpo da Resposta'))
+    data_criacao = models.DateTimeField(auto_now_add=True, verbose_name=_('Data de Criação'))
+    expira_em = models.DateTimeField(db_index=True, verbose_name=_('Expira em'))
+
+    class Meta:
+        verbose_name = _("Chave de Idempotência")
+        verbose_name_plural = _("Chaves de Idempotência")
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'chave'], name='idempotencia_usuario_chave_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.chave} ({self.usuario_id})"
+
+
+class BloqueioAgendaManager(models.Manager):
+
+    def bloquear(self, pares):
+        """
+        Bloqueia, até o fim da transação corrente, as agendas dos pares
+        (medico_id, dia) informados. Marcações concorrentes para os mesmos
+        médicos/dias aguardam; as demais seguem em paralelo.
+        Deve ser chamado dentro de `transaction.atomic()`, antes da verificação
+        de conflitos.
+        """
+        # Ordem fixa para que duas transações nunca esperem uma pela outra em ciclo
+        pares = sorted(set(pares))
+        if not pares:
+            return
+        # Garante que as linhas existam; em SQLite esta escrita já serializa a transação
+        self.bulk_create(
+            [self.model(medico_id=medico_id, dia=dia) for medico_id, dia in pares],
+            ignore_conflicts=True,
+        )
+        # Uma condição por médico mantém o SQL pequeno mesmo em lotes grandes
+        dias_por_medico = {}
+        for medico_id, dia in pares:
+            dias_por_medico.setdefault(medico_id, []).append(dia)
+        filtro = Q()
+        for medico_id, dias in dias_por_medico.items():
+            filtro |= Q(medico_id=medico_id, dia__in=dias)
+        list(
+            self.select_for_update()
+            .filter(filtro)
+            .order_by('medico_id', 'dia')
+            .values_list('pk', flat=True)
+        )
+
+    def bloquear_horarios(self, medico_id, horarios):
+        """
+        Bloqueia os dias do médico tocados pelos horários informados, incluindo
+        o dia vizinho quando a janela de conflito atravessa a meia-noite.
+        """
+        self.bloquear_marcacoes((medico_id, horario) for horario in horarios)
+
+    def bloquear_marcacoes(self, marcacoes):
+        """Como `bloquear_horarios`, para pares (medico_id, data_hora) de vários médicos."""
+        self.bloquear(
+            (medico_id, (horario + desvio).date())
+            for medico_id, horario in marcacoes
+            for desvio in (-JANELA_CONFLITO, JANELA_CONFLITO)
+        )
+
+
+class BloqueioAgenda(models.Model):
+    """
+    Linha de bloqueio por médico/dia. Marcações para o mesmo médico e dia
+    obtêm `SELECT ... FOR UPDATE` nesta linha, de modo que a verificação de
+    conflito e a inserção da consulta ocorrem sem corrida.
+    """
+    medico = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='bloqueios_agenda',
+        verbose_name=_('Médico')
+    )
+    dia = models.DateField(verbose_name=_('Dia'))
+
+    objects = BloqueioAgendaManager()
+
+    class Meta:
+        verbose_name = _("Bloqueio de Agenda")
+        verbose_name_plural = _("Bloqueios de Agenda")
+        constraints = [
+            models.UniqueConstraint(fields=['medico', 'dia'], name='bloqueio_agenda_medico_dia_unico'),
+        ]
+
+    def __str__(self):
+        return f"Agenda de {self.medico_id} em {self.dia}"
+
 
 class Pagamento(models.Model):
     """
@@ -184,4 +534,56 @@ class AnotacaoConsulta(models.Model):
         verbose_name_plural = _("Anotações de Consulta")
 
     def __str__(self):
-        return f"Anotação para a Consulta ID {self.consulta.id}"
\ No newline at end of file
+        return f"Anotação para a Consulta ID {self.consulta.id}"
+
+class AtendimentoConsulta(models.Model):
+    """
+    Marcos da consulta na recepção: check-in, chamada, início e fim do
+    atendimento. A fila de espera do médico no dia são os check-ins ainda
+    não chamados (ver agendamentos.recepcao).
+    """
+    consulta = models.OneToOneField(
+        Consulta,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='atendimento'
+    )
+    # Repetidos da consulta para a fila ser lida só pelo índice
+    medico = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        limit_choices_to={'user_type': 'MEDICO'},
+        related_name='+'
+    )
+    dia = models.DateField()
+    check_in = models.DateTimeField(verbose_name=_('Check-in'))
+    chamada = models.DateTimeField(null=True, blank=True, verbose_name=_('Chamada'))
+    inicio = models.DateTimeField(null=True, blank=True, verbose_name=_('Início do Atendimento'))
+    fim = models.DateTimeField(null=True, blank=True, verbose_name=_('Fim do Atendimento'))
+
+    class Meta:
+        verbose_name = _("Atendimento da Consulta")
+        verbose_name_plural = _("Atendimentos das Consultas")
+        indexes = [
+            models.Index(fields=['medico', 'dia', 'check_in'], name='atendimento_fila_idx'),
+        ]
+
+
+class TempoAtendimentoMedico(models.Model):
+    """
+    Duração média dos atendimentos do médico, atualizada a cada atendimento
+    finalizado (média móvel sobre os JANELA_MEDIA_ATENDIMENTOS mais recentes).
+    """
+    medico = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        limit_choices_to={'user_type': 'MEDICO'},
+        related_name='tempo_atendimento'
+    )
+    atendimentos = models.PositiveIntegerField(default=0)
+    duracao_media = models.FloatField(default=0, verbose_name=_('Duração Média (segundos)'))
+
+    class Meta:
+        verbose_name = _("Tempo de Atendimento do Médico")
+        verbose_name_plural = _("Tempos de Atendimento dos Médicos")
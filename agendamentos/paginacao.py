@@ -0,0 +1,81 @@
+# agendamentos/paginacao.py
+"""
+Paginação por cursor (keyset) sobre a ordenação (data_hora, id).
+
+Em vez de OFFSET, cada página continua a partir da última linha da página
+anterior, de modo que o custo de qualquer página depende só do tamanho da
+página e não da quantidade de consultas já percorridas.
+"""
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 500
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(data_hora, pk):
+    bruto = f'{data_hora.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(bruto.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    try:
+        data_str, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        data_hora = parse_datetime(data_str)
+        pk = int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise CursorInvalido('Cursor inválido.')
+    if data_hora is None:
+        raise CursorInvalido('Cursor inválido.')
+    return data_hora, pk
+
+
+def ler_limite(valor):
+    """Converte o parâmetro `limite` da URL, respeitando LIMITE_MAXIMO."""
+    if valor in (None, ''):
+        return LIMITE_PADRAO
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        raise CursorInvalido("O parâmetro 'limite' deve ser um número.")
+    return max(1, min(limite, LIMITE_MAXIMO))
+
+
+def paginar_por_cursor(queryset, cursor=None, limite=LIMITE_PADRAO, decrescente=False):
+    """
+    Retorna (itens, proximo_cursor). `proximo_cursor` é None na última página.
+    Funciona tanto com instâncias quanto com dicionários de `.values()`.
+    """
+    if cursor:
+        data_hora, pk = decodificar_cursor(cursor)
+        if decrescente:
+            # O filtro simples em data_hora mantém a busca no índice (…, data_hora)
+            queryset = queryset.filter(
+                Q(data_hora__lt=data_hora) | Q(data_hora=data_hora, pk__lt=pk),
+                data_hora__lte=data_hora,
+            )
+        else:
+            queryset = queryset.filter(
+                Q(data_hora__gt=data_hora) | Q(data_hora=data_hora, pk__gt=pk),
+                data_hora__gte=data_hora,
+            )
+
+    ordem = ('-data_hora', '-pk') if decrescente else ('data_hora', 'pk')
+    itens = list(queryset.order_by(*ordem)[:limite + 1])
+
+    proximo_cursor = None
+    if len(itens) > limite:
+        itens = itens[:limite]
+        ultimo = itens[-1]
+        if isinstance(ultimo, dict):
+            proximo_cursor = codificar_cursor(ultimo['data_hora'], ultimo['id'])
+        else:
+            proximo_cursor = codificar_cursor(ultimo.data_hora, ultimo.pk)
+    return itens, proximo_cursor
@@ -0,0 +1,218 @@
+# agendamentos/recepcao.py
+"""
+Recepção: check-in, chamada, início e fim do atendimento, e a fila de espera
+de cada médico no dia.
+
+Os marcos ficam em `AtendimentoConsulta`; o check-in leva a consulta a
+EM_ESPERA e o início a EM_ATENDIMENTO (o fim continua sendo a finalização da
+consulta, que a leva a CONCLUIDA). A fila são os check-ins ainda não chamados,
+em ordem de chegada.
+
+A fila de (médico, dia) fica em cache já ordenada, com um índice
+consulta -> posição: próximo paciente e posição de uma consulta são leituras
+diretas. Qualquer mudança na fila descarta o cache, que é remontado do banco
+(índice (medico, dia, check_in)) na leitura seguinte.
+
+A espera estimada usa a duração média dos atendimentos do médico
+(`TempoAtendimentoMedico`), atualizada a cada atendimento finalizado, e o
+tempo já decorrido do atendimento em andamento; nada varre as consultas do dia.
+
+Consultas canceladas ou removidas saem da fila por `retirar_da_fila`, ligada
+ao sinal `consultas_alteradas`.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .consts import (
+    STATUS_CONSULTA_PENDENTE, STATUS_CONSULTA_CONFIRMADA, STATUS_CONSULTA_CANCELADA, STATUS_CONSULTA_EM_ESPERA,
+    STATUS_CONSULTA_EM_ATENDIMENTO, JANELA_CONFLITO, FILA_CACHE_TTL, JANELA_MEDIA_ATENDIMENTOS,
+)
+from .models import AtendimentoConsulta, ConsultaStatusLog, TempoAtendimentoMedico
+
+
+def _chave(medico_id, dia):
+    return f'fila_medico:{medico_id}:{dia.isoformat()}'
+
+
+def _agora():
+    return timezone.now()
+
+
+def _hoje():
+    agora = _agora()
+    return (timezone.localtime(agora) if timezone.is_aware(agora) else agora).date()
+
+
+def _dia_da_consulta(consulta):
+    data_hora = consulta.data_hora
+    return (timezone.localtime(data_hora) if timezone.is_aware(data_hora) else data_hora).date()
+
+
+def invalidar_fila(medico_id, dia):
+    chave = _chave(medico_id, dia)
+    cache.delete(chave)
+    # Repete após o commit: uma leitura concorrente pode ter remontado a fila
+    # antes de a transação que a alterou ser confirmada.
+    transaction.on_commit(lambda: cache.delete(chave))
+
+
+def _alterar_status(consulta, novo_status, pessoa):
+    consulta.status_atual = novo_status
+    consulta.save()
+    ConsultaStatusLog.objects.create(consulta=consulta, status_novo=novo_status, pessoa=pessoa)
+
+
+def _atendimento(consulta):
+    try:
+        return AtendimentoConsulta.objects.select_for_update().get(consulta=consulta)
+    except AtendimentoConsulta.DoesNotExist:
+        raise ValueError("O paciente ainda não fez check-in.")
+
+
+def fazer_check_in(consulta, pessoa):
+    """Registra a chegada do paciente e o coloca no fim da fila do médico."""
+    if consulta.status_atual not in (STATUS_CONSULTA_PENDENTE, STATUS_CONSULTA_CONFIRMADA):
+        raise ValueError("Só é possível fazer check-in de consultas pendentes ou confirmadas.")
+    dia = _dia_da_consulta(consulta)
+    if dia != _hoje():
+        raise ValueError("O check-in só pode ser feito no dia da consulta.")
+    if AtendimentoConsulta.objects.filter(consulta=consulta).exists():
+        raise ValueError("O check-in desta consulta já foi feito.")
+
+    atendimento = AtendimentoConsulta.objects.create(
+        consulta=consulta, medico_id=consulta.medico_id, dia=dia, check_in=_agora()
+    )
+    _alterar_status(consulta, STATUS_CONSULTA_EM_ESPERA, pessoa)
+    invalidar_fila(atendimento.medico_id, dia)
+    return atendimento
+
+
+def chamar_paciente(consulta, pessoa):
+    """Chama o paciente ao consultório: ele sai da fila."""
+    atendimento = _atendimento(consulta)
+    if atendimento.chamada is not None:
+        raise ValueError("O paciente já foi chamado.")
+    atendimento.chamada = _agora()
+    atendimento.save(update_fields=['chamada'])
+    invalidar_fila(atendimento.medico_id, atendimento.dia)
+    return atendimento
+
+
+def iniciar_atendimento(consulta, pessoa):
+    """Marca o início do atendimento (chamando o paciente, se ainda não foi chamado)."""
+    atendimento = _atendimento(consulta)
+    if atendimento.inicio is not None:
+        raise ValueError("O atendimento já foi iniciado.")
+    atendimento.inicio = _agora()
+    atendimento.chamada = atendimento.chamada or atendimento.inicio
+    atendimento.save(update_fields=['chamada', 'inicio'])
+    _alterar_status(consulta, STATUS_CONSULTA_EM_ATENDIMENTO, pessoa)
+    invalidar_fila(atendimento.medico_id, atendimento.dia)
+    return atendimento
+
+
+def encerrar_atendimento(consulta):
+    """
+    Chamado na finalização da consulta: marca o fim do atendimento (se houve
+    check-in e início) e inclui a duração na média do médico.
+    """
+    atendimento = AtendimentoConsulta.objects.select_for_update().filter(
+        consulta=consulta, inicio__isnull=False, fim__isnull=True
+    ).first()
+    if atendimento is None:
+        return None
+    atendimento.fim = _agora()
+    atendimento.save(update_fields=['fim'])
+
+    TempoAtendimentoMedico.objects.get_or_create(medico_id=atendimento.medico_id)
+    tempo = TempoAtendimentoMedico.objects.select_for_update().get(medico_id=atendimento.medico_id)
+    duracao = (atendimento.fim - atendimento.inicio).total_seconds()
+    tempo.atendimentos += 1
+    # Média acumulada até JANELA_MEDIA_ATENDIMENTOS atendimentos; depois, móvel
+    tempo.duracao_media += (duracao - tempo.duracao_media) / min(tempo.atendimentos, JANELA_MEDIA_ATENDIMENTOS)
+    tempo.save(update_fields=['atendimentos', 'duracao_media'])
+
+    invalidar_fila(atendimento.medico_id, atendimento.dia)
+    return atendimento
+
+
+def retirar_da_fila(alteracoes):
+    """
+    Descarta o atendimento em aberto das consultas canceladas ou removidas, a
+    partir das alterações (antes, depois) de `consultas_alteradas`.
+    """
+    canceladas, removidas = [], []
+    for antes, depois in alteracoes:
+        if antes is None:
+            continue
+        if depois is None:
+            removidas.append(antes)
+        elif depois.status_atual == STATUS_CONSULTA_CANCELADA and antes.status_atual != STATUS_CONSULTA_CANCELADA:
+            canceladas.append(antes)
+    if canceladas:
+        AtendimentoConsulta.objects.filter(
+            consulta_id__in=[antes.id for antes in canceladas], fim__isnull=True
+        ).delete()
+    # As removidas já levaram o atendimento junto (CASCADE); só a fila em cache fica
+    for antes in canceladas + removidas:
+        invalidar_fila(antes.medico_id, _dia_da_consulta(antes))
+
+
+def fila(medico_id, dia=None):
+    """
+    Fila do médico no dia: {'fila': [(consulta_id, check_in), ...],
+    'posicoes': {consulta_id: posição a partir de 1}, 'em_atendimento_desde',
+    'duracao_media'}. Montada com duas consultas e guardada em cache.
+    """
+    dia = dia or _hoje()
+    chave = _chave(medico_id, dia)
+    em_cache = cache.get(chave)
+    if em_cache is not None:
+        return em_cache
+
+    abertos = AtendimentoConsulta.objects.filter(
+        medico_id=medico_id, dia=dia, fim__isnull=True
+    ).order_by('check_in', 'consulta_id').values_list('consulta_id', 'check_in', 'chamada', 'inicio')
+    aguardando, em_atendimento = [], []
+    for consulta_id, check_in, chamada, inicio in abertos:
+        if chamada is None:
+            aguardando.append((consulta_id, check_in))
+        elif inicio is not None:
+            em_atendimento.append(inicio)
+    duracao_media = (
+        TempoAtendimentoMedico.objects.filter(medico_id=medico_id).values_list('duracao_media', flat=True).first()
+    )
+
+    resultado = {
+        'fila': aguardando,
+        'posicoes': {consulta_id: posicao for posicao, (consulta_id, _) in enumerate(aguardando, start=1)},
+        'em_atendimento_desde': max(em_atendimento) if em_atendimento else None,
+        'duracao_media': duracao_media or JANELA_CONFLITO.total_seconds(),
+    }
+    cache.set(chave, resultado, FILA_CACHE_TTL)
+    return resultado
+
+
+def proximo_paciente(medico_id, dia=None):
+    """Consulta do próximo paciente da fila, ou None."""
+    aguardando = fila(medico_id, dia)['fila']
+    return aguardando[0][0] if aguardando else None
+
+
+def posicao_na_fila(medico_id, consulta_id, dia=None):
+    """Posição (a partir de 1) da consulta na fila, ou None se não estiver aguardando."""
+    return fila(medico_id, dia)['posicoes'].get(consulta_id)
+
+
+def espera_estimada(dados_fila, posicao, agora=None):
+    """Espera estimada (timedelta) de quem está na `posicao` da fila."""
+    media = dados_fila['duracao_media']
+    restante = 0
+    desde = dados_fila['em_atendimento_desde']
+    if desde is not None:
+        decorrido = ((agora or _agora()) - desde).total_seconds()
+        restante = max(media - decorrido, 0)
+    return timedelta(seconds=restante + (posicao - 1) * media)
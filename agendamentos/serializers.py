@@ -1,10 +1,12 @@
 # agendamentos/serializers.py
 
 from rest_framework import serializers
-from .models import Consulta, Pagamento, AnotacaoConsulta 
+from .models import Consulta, Pagamento, AnotacaoConsulta, SerieConsulta, ListaEspera
+from .consts import (
+    STATUS_CONSULTA_CHOICES, STATUS_CONSULTA_PENDENTE, STATUS_CONSULTA_CONFIRMADA, SERIE_MAX_OCORRENCIAS,
+)
 from users.models import User
 from pacientes.models import Paciente
-from clinicas.models import Clinica
 from medicos.models import Medico
 
 class PagamentoSerializer(serializers.ModelSerializer):
@@ -13,6 +15,10 @@ class PagamentoSerializer(serializers.ModelSerializer):
         fields = ['status', 'valor_pago', 'data_pagamento']
 
 class ConsultaSerializer(serializers.ModelSerializer):
+    """
+    Para listagens, use `Consulta.objects.com_detalhes()` no queryset: todos os
+    campos abaixo passam a ser lidos sem consultas extras por linha.
+    """
     pagamento = PagamentoSerializer(read_only=True)
     paciente_detalhes = serializers.SerializerMethodField()
     medico_detalhes = serializers.SerializerMethodField()
@@ -75,15 +81,92 @@ class ConsultaSerializer(serializers.ModelSerializer):
         return None
 
     def get_clinica_detalhes(self, obj):
-        try:
-            clinica = Clinica.objects.get(id=obj.clinica.id)
-            return {
-                'id': clinica.id,
-                'nome_fantasia': clinica.nome_fantasia,
-                'cnpj': clinica.cnpj,
-            }
-        except Clinica.DoesNotExist:
+        # Usa a clínica já carregada (ver ConsultaQuerySet.com_detalhes)
+        clinica = obj.clinica
+        if clinica is None:
             return None
+        return {
+            'id': clinica.id,
+            'nome_fantasia': clinica.nome_fantasia,
+            'cnpj': clinica.cnpj,
+        }
+
+class ConsultaLoteItemSerializer(serializers.Serializer):
+    """
+    Item do agendamento em lote. Os relacionamentos chegam como ids e são
+    validados em conjunto pela view (uma consulta por modelo, não por item).
+    """
+    paciente = serializers.IntegerField()
+    medico = serializers.IntegerField()
+    clinica = serializers.IntegerField()
+    data_hora = serializers.DateTimeField()
+    valor = serializers.DecimalField(max_digits=10, decimal_places=2)
+    # Só status iniciais: cancelamento, recepção e conclusão têm fluxo (e log) próprios
+    status_atual = serializers.ChoiceField(
+        choices=[
+            (valor, rotulo) for valor, rotulo in STATUS_CONSULTA_CHOICES
+            if valor in (STATUS_CONSULTA_PENDENTE, STATUS_CONSULTA_CONFIRMADA)
+        ],
+        required=False, default=STATUS_CONSULTA_PENDENTE
+    )
+
+class SerieConsultaSerializer(serializers.ModelSerializer):
+    """
+    Série recorrente e as consultas que ela gerou. Para listagens, use
+    `prefetch_related('consultas')` no queryset.
+    """
+    consultas = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SerieConsulta
+        fields = [
+            'id', 'paciente', 'medico', 'clinica', 'data_inicio', 'intervalo_semanas',
+            'ocorrencias', 'valor', 'consultas', 'data_criacao'
+        ]
+        read_only_fields = ['data_criacao']
+
+    def validate_medico(self, value):
+        if value.user_type != 'MEDICO':
+            raise serializers.ValidationError("O usuário informado não é um médico.")
+        return value
+
+    def validate_intervalo_semanas(self, value):
+        if value < 1:
+            raise serializers.ValidationError("O intervalo deve ser de pelo menos uma semana.")
+        return value
+
+    def validate_ocorrencias(self, value):
+        if not 1 <= value <= SERIE_MAX_OCORRENCIAS:
+            raise serializers.ValidationError(
+                f"A série deve ter entre 1 e {SERIE_MAX_OCORRENCIAS} ocorrências."
+            )
+        return value
+
+    def get_consultas(self, obj):
+        return [
+            {'id': consulta.id, 'data_hora': consulta.data_hora, 'status_atual': consulta.status_atual}
+            for consulta in obj.consultas.all()
+        ]
+
+class ListaEsperaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ListaEspera
+        fields = [
+            'id', 'paciente', 'clinica', 'medico', 'especialidade', 'prioridade',
+            'data_limite', 'status', 'consulta', 'data_entrada'
+        ]
+        read_only_fields = ['status', 'consulta', 'data_entrada']
+
+    def validate(self, data):
+        medico = data.get('medico')
+        if medico is None and not data.get('especialidade'):
+            raise serializers.ValidationError("Informe o médico ou a especialidade desejada.")
+        if medico is not None:
+            perfil = getattr(medico, 'perfil_medico', None)
+            if medico.user_type != 'MEDICO' or perfil is None:
+                raise serializers.ValidationError({'medico': "O usuário informado não é um médico."})
+            data.setdefault('especialidade', perfil.especialidade)
+        return data
 
 class AnotacaoConsultaSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,53 @@
+# agendamentos/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+
+from .models import Consulta
+from .disponibilidade import invalidar_disponibilidade
+from .lista_espera import vagas_liberadas, agendar_preenchimento
+from .recepcao import retirar_da_fila
+
+# Disparado sempre que consultas mudam na agenda. Recebe `alteracoes`, uma lista
+# de pares (antes, depois) de `EstadoAgenda` (None quando a consulta não existia
+# antes ou deixou de existir). Operações em lote (bulk_create/update), que não
+# disparam post_save, enviam este sinal explicitamente.
+consultas_alteradas = Signal()
+
+
+@receiver(post_save, sender=Consulta)
+def consulta_salva(sender, instance, created, **kwargs):
+    antes = None if created else getattr(instance, '_estado_original', None)
+    depois = instance.estado_agenda()
+    instance._estado_original = depois
+    if antes != depois:
+        consultas_alteradas.send(sender=Consulta, alteracoes=[(antes, depois)])
+
+
+@receiver(post_delete, sender=Consulta)
+def consulta_removida(sender, instance, **kwargs):
+    antes = getattr(instance, '_estado_original', None) or instance.estado_agenda()
+    if antes is not None:
+        consultas_alteradas.send(sender=Consulta, alteracoes=[(antes, None)])
+
+
+@receiver(consultas_alteradas)
+def invalidar_horarios_livres(sender, alteracoes, **kwargs):
+    """Descarta os horários livres em cache dos médicos/dias afetados."""
+    afetados = set()
+    for antes, depois in alteracoes:
+        for estado in (antes, depois):
+            if estado is not None and estado.data_hora is not None:
+                afetados.add((estado.medico_id, estado.data_hora.date()))
+    invalidar_disponibilidade(afetados)
+
+
+@receiver(consultas_alteradas)
+def oferecer_vagas_liberadas(sender, alteracoes, **kwargs):
+    """Oferece à lista de espera os horários liberados, depois do commit e fora da requisição."""
+    agendar_preenchimento(vagas_liberadas(alteracoes))
+
+
+@receiver(consultas_alteradas)
+def atualizar_fila_da_recepcao(sender, alteracoes, **kwargs):
+    """Tira da fila do médico as consultas canceladas ou removidas."""
+    retirar_da_fila(alteracoes)
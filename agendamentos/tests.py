@@ -1,15 +1,30 @@
 # agendamentos/tests.py (VERSÃO CORRIGIDA)
 
-from django.test import TestCase
+import random
+import threading
+import time as time_module
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.core import mail
+from django.core.management import call_command
+from io import StringIO
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.urls import reverse
 from django.utils import timezone
+from django.core.cache import cache
+from datetime import datetime, time
 from decimal import Decimal
 
 # Modelos da app agendamentos
-from .models import Consulta, Pagamento, AnotacaoConsulta, ConsultaStatusLog
+from .models import (
+    Consulta, Pagamento, AnotacaoConsulta, ConsultaStatusLog, SerieConsulta, ListaEspera, ChaveIdempotencia,
+    AtendimentoConsulta, TempoAtendimentoMedico,
+)
 # Modelos de outras apps necessários para criar dados
 from pacientes.models import Paciente
 from medicos.models import Medico
@@ -24,8 +39,9 @@ from .serializers import (
     DashboardConsultaSerializer
 )
 
+
 # Constantes de status
-from .consts import STATUS_PAGAMENTO_PENDENTE, STATUS_CONSULTA_CONCLUIDA
+from .consts import STATUS_PAGAMENTO_PENDENTE, STATUS_CONSULTA_CONCLUIDA, JANELA_CONFLITO, IDEMPOTENCIA_RESERVA
 
 # Pega o modelo de User customizado
 User = get_user_model()
@@ -384,4 +400,790 @@ class AgendamentoAPIViewTests(BaseAPITestCase):
         data = {'conteudo': '...'}
         response = self.client.post(url, data, format='json')
 
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+# --- Testes de conflito de horário (ConsultaQuerySet.conflitos) ---
+
+class ConflitoAgendamentoTests(BaseAPITestCase):
+
+    def test_conflitos_usa_uma_unica_consulta(self):
+        """
+        A verificação de médico e paciente deve custar uma única ida ao banco.
+        """
+        with self.assertNumQueries(1):
+            conflitos = Consulta.objects.conflitos(
+                self.consulta.data_hora, medico=self.user_medico, paciente=self.paciente
+            )
+        self.assertEqual(conflitos, {'medico': True, 'paciente': True})
+
+    def test_conflito_apenas_do_paciente(self):
+        """
+        Outro médico no mesmo horário: só o paciente está em conflito.
+        """
+        conflitos = Consulta.objects.conflitos(
+            self.consulta.data_hora + timezone.timedelta(minutes=10),
+            medico=self.user_medico_2, paciente=self.paciente
+        )
+        self.assertEqual(conflitos, {'medico': False, 'paciente': True})
+
+    def test_horarios_consecutivos_nao_conflitam(self):
+        """
+        Consultas de 30 minutos podem ser marcadas em sequência, antes ou depois.
+        """
+        for delta in (-30, 30):
+            conflitos = Consulta.objects.conflitos(
+                self.consulta.data_hora + timezone.timedelta(minutes=delta), medico=self.user_medico
+            )
+            self.assertFalse(conflitos['medico'])
+
+    def test_consulta_cancelada_nao_ocupa_horario(self):
+        self.consulta.status_atual = 'CANCELADA'
+        self.consulta.save()
+        conflitos = Consulta.objects.conflitos(self.consulta.data_hora, medico=self.user_medico)
+        self.assertFalse(conflitos['medico'])
+
+    def test_remarcacao_ignora_a_propria_consulta(self):
+        self.client.force_authenticate(user=self.user_secretaria)
+        url = reverse('agendamentos-detail-delete', kwargs={'pk': self.consulta.pk})
+        nova_data = self.consulta.data_hora + timezone.timedelta(minutes=15)
+
+        response = self.client.put(url, {'data_hora': nova_data}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.consulta.refresh_from_db()
+        self.assertEqual(self.consulta.data_hora, nova_data)
+
+
+# --- Testes de horários livres (DisponibilidadeAPIView) ---
+
+class DisponibilidadeTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.dia = (timezone.now() + timezone.timedelta(days=20)).date()
+        self.url = reverse('agendamentos-disponibilidade')
+        self.medico.clinicas.add(self.clinica)
+        Consulta.objects.create(
+            paciente=self.paciente, medico=self.user_medico, clinica=self.clinica,
+            data_hora=datetime.combine(self.dia, time(9, 0)), valor=Decimal('100.00')
+        )
+
+    def _horarios(self, **params):
+        params.setdefault('data_inicio', self.dia.isoformat())
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {m['id']: m['horarios'][self.dia.isoformat()] for m in response.data['medicos']}
+
+    def test_horarios_por_medico(self):
+        self.client.force_authenticate(user=self.user_paciente)
+        horarios = self._horarios(medico=self.user_medico.pk, clinica=self.clinica.pk)
+
+        self.assertNotIn('09:00', horarios[self.user_medico.pk])
+        self.assertIn('09:30', horarios[self.user_medico.pk])
+
+    def test_horarios_por_especialidade(self):
+        self.client.force_authenticate(user=self.user_paciente)
+        horarios = self._horarios(especialidade='Clínica Geral')
+
+        self.assertEqual(set(horarios), {self.user_medico.pk, self.user_medico_2.pk})
+        self.assertIn('09:00', horarios[self.user_medico_2.pk])
+
+    def test_cache_invalidado_ao_marcar_consulta(self):
+        self.client.force_authenticate(user=self.user_secretaria)
+        self.assertIn('10:00', self._horarios(medico=self.user_medico.pk)[self.user_medico.pk])
+
+        response = self.client.post(reverse('agendamentos-list-create'), {
+            "paciente": self.paciente.pk,
+            "medico": self.user_medico.pk,
+            "clinica": self.clinica.pk,
+            "data_hora": datetime.combine(self.dia, time(10, 0)),
+            "valor": "100.00",
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertNotIn('10:00', self._horarios(medico=self.user_medico.pk)[self.user_medico.pk])
+
+    def test_parametros_obrigatorios(self):
+        self.client.force_authenticate(user=self.user_paciente)
+        response = self.client.get(self.url, {'data_inicio': self.dia.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+# --- Teste de estresse: marcações concorrentes (BloqueioAgenda) ---
+
+class MarcacaoConcorrenteTests(TransactionTestCase):
+    """
+    Várias threads disputam os mesmos horários de poucos médicos.
+    Nenhum médico pode terminar com duas consultas ativas sobrepostas.
+    """
+    THREADS = 8
+    HORARIOS = 12
+
+    def setUp(self):
+        estado = Estado.objects.create(nome="Tocantins", uf="TO")
+        cidade = Cidade.objects.create(nome="Palmas", estado=estado)
+        tipo_clinica = TipoClinica.objects.create(descricao="Geral")
+        self.clinica = Clinica.objects.create(
+            nome_fantasia="MedLink Estresse", cidade=cidade, tipo_clinica=tipo_clinica, cnpj="11222333000155"
+        )
+        self.user_secretaria = User.objects.create_user(
+            cpf='40000000000', email='sec.estresse@email.com', user_type='SECRETARIA'
+        )
+        Secretaria.objects.create(user=self.user_secretaria, clinica=self.clinica)
+        self.medicos = [
+            User.objects.create_user(cpf=f'2000000000{i}', email=f'med{i}@email.com', user_type='MEDICO')
+            for i in range(3)
+        ]
+        self.pacientes = [
+            Paciente.objects.create(
+                user=User.objects.create_user(cpf=f'1000000{i:04d}', email=f'pac{i}@email.com', user_type='PACIENTE')
+            )
+            for i in range(self.THREADS * self.HORARIOS)
+        ]
+        dia = (timezone.now() + timezone.timedelta(days=30)).date()
+        # Passos de 15 minutos: horários vizinhos também conflitam entre si
+        self.horarios = [
+            datetime.combine(dia, time(8, 0)) + timezone.timedelta(minutes=15 * i)
+            for i in range(self.HORARIOS)
+        ]
+
+    @staticmethod
+    def _bloqueio_do_sqlite(response):
+        erro = str(response.data.get('error', '')) if isinstance(response.data, dict) else ''
+        return (
+            response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+            and connection.vendor == 'sqlite'
+            and 'locked' in erro
+        )
+
+    def _marcar(self, indice, resultados):
+        client = APIClient()
+        client.force_authenticate(user=self.user_secretaria)
+        rng = random.Random(indice)
+        tentativas = [(medico, horario) for medico in self.medicos for horario in self.horarios]
+        rng.shuffle(tentativas)
+        try:
+            for n, (medico, horario) in enumerate(tentativas):
+                paciente = self.pacientes[(indice * self.HORARIOS + n) % len(self.pacientes)]
+                dados = {
+                    "paciente": paciente.pk, "medico": medico.pk, "clinica": self.clinica.pk,
+                    "data_hora": horario, "valor": "100.00",
+                }
+                for _ in range(50):
+                    response = client.post(reverse('agendamentos-list-create'), dados, format='json')
+                    # SQLite em memória (testes) não espera por bloqueios: só esse erro é repetido
+                    if not self._bloqueio_do_sqlite(response):
+                        break
+                    time_module.sleep(0.01)
+                resultados.append(response.status_code)
+        finally:
+            connection.close()
+
+    def test_nenhuma_marcacao_dupla(self):
+        resultados = []
+        threads = [
+            threading.Thread(target=self._marcar, args=(i, resultados)) for i in range(self.THREADS)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        criadas = resultados.count(status.HTTP_201_CREATED)
+        self.assertNotIn(status.HTTP_500_INTERNAL_SERVER_ERROR, resultados)
+        self.assertGreater(criadas, 0)
+        for medico in self.medicos:
+            horarios = list(
+                Consulta.objects.filter(medico=medico).order_by('data_hora').values_list('data_hora', flat=True)
+            )
+            for anterior, seguinte in zip(horarios, horarios[1:]):
+                self.assertGreaterEqual(seguinte - anterior, JANELA_CONFLITO)
+
+
+# --- Testes de número de queries da listagem (ConsultaQuerySet.com_detalhes) ---
+
+class ListagemConsultasQueriesTests(BaseAPITestCase):
+
+    def _criar_consultas(self, quantidade):
+        inicio = timezone.now() + timezone.timedelta(days=60)
+        consultas = Consulta.objects.bulk_create([
+            Consulta(
+                paciente=self.paciente, medico=self.user_medico if i % 2 else self.user_medico_2,
+                clinica=self.clinica, data_hora=inicio + timezone.timedelta(minutes=30 * i),
+                valor=Decimal('100.00')
+            )
+            for i in range(quantidade - 1)  # a do setUp completa a quantidade
+        ])
+        Pagamento.objects.bulk_create([Pagamento(consulta=c) for c in consultas[::2]])
+        AnotacaoConsulta.objects.bulk_create([
+            AnotacaoConsulta(consulta=c, conteudo='Retorno') for c in consultas[::3]
+        ])
+
+    def _listar(self, quantidade):
+        self._criar_consultas(quantidade)
+        self.client.force_authenticate(user=self.user_secretaria)
+        # O perfil da secretária já está em memória: resta uma única query para a listagem
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('agendamentos-list-create'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), quantidade)
+        return response.data
+
+    def test_listagem_10_consultas(self):
+        dados = self._listar(10)
+        self.assertEqual(dados[0]['clinica_detalhes']['nome_fantasia'], 'MedLink Testes')
+        self.assertEqual(dados[0]['medico_detalhes']['crm'], '12345-TO')
+
+    def test_listagem_10000_consultas(self):
+        dados = self._listar(10_000)
+        self.assertTrue(any(item['anotacao_conteudo'] == 'Retorno' for item in dados))
+        self.assertTrue(any(item['pagamento'] is None for item in dados))
+
+
+# --- Testes de paginação por cursor e filtros da listagem ---
+
+class ListagemPaginadaTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('agendamentos-list-create')
+        self.client.force_authenticate(user=self.user_secretaria)
+        self.inicio = datetime.combine((timezone.now() + timezone.timedelta(days=40)).date(), time(8, 0))
+        # Duas consultas no mesmo horário (médicos diferentes) testam o desempate por id
+        for i, medico in enumerate([self.user_medico, self.user_medico_2, self.user_medico, self.user_medico_2]):
+            Consulta.objects.create(
+                paciente=self.paciente, medico=medico, clinica=self.clinica,
+                data_hora=self.inicio + timezone.timedelta(hours=i // 2), valor=Decimal('100.00')
+            )
+
+    def test_percorre_todas_as_paginas_sem_repetir(self):
+        vistos, cursor = [], None
+        while True:
+            params = {'limite': 2}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            vistos += [item['id'] for item in response.data['resultados']]
+            cursor = response.data['proximo_cursor']
+            if not cursor:
+                break
+
+        esperados = list(Consulta.objects.order_by('data_hora', 'id').values_list('id', flat=True))
+        self.assertEqual(vistos, esperados)
+
+    def test_filtros_de_data_e_medico(self):
+        response = self.client.get(self.url, {
+            'data_inicio': self.inicio.date().isoformat(),
+            'data_fim': self.inicio.date().isoformat(),
+            'medico': self.user_medico_2.pk,
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        self.assertTrue(all(item['medico'] == self.user_medico_2.pk for item in response.data))
+
+    def test_cursor_invalido(self):
+        response = self.client.get(self.url, {'cursor': 'nao-e-um-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+# --- Testes do agendamento em lote (ConsultaLoteAPIView) ---
+
+class ConsultaLoteTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('agendamentos-lote')
+        self.client.force_authenticate(user=self.user_secretaria)
+        self.inicio = datetime.combine((timezone.now() + timezone.timedelta(days=50)).date(), time(8, 0))
+
+    def _item(self, minutos, medico=None, **extra):
+        item = {
+            "paciente": self.paciente.pk,
+            "medico": (medico or self.user_medico).pk,
+            "clinica": self.clinica.pk,
+            "data_hora": (self.inicio + timezone.timedelta(minutes=minutos)).isoformat(),
+            "valor": "150.00",
+        }
+        item.update(extra)
+        return item
+
+    def test_lote_com_resultados_por_item(self):
+        itens = [
+            self._item(0),
+            self._item(10, medico=self.user_medico_2),   # paciente em conflito dentro do lote
+            self._item(30),
+            self._item(60, medico=self.user_medico_2),
+            self._item(90, medico=None, paciente=999999),  # paciente inexistente
+            {"medico": self.user_medico.pk},              # item incompleto
+        ]
+        response = self.client.post(self.url, {'consultas': itens}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['criadas'], 3)
+        self.assertEqual(
+            [r['status'] for r in response.data['resultados']],
+            ['criada', 'conflito', 'criada', 'criada', 'erro', 'erro']
+        )
+        self.assertEqual(Consulta.objects.count(), 4)
+        self.assertEqual(Pagamento.objects.count(), 4)
+        self.assertEqual(ConsultaStatusLog.objects.count(), 3)
+
+    def test_lote_aceita_apenas_status_iniciais(self):
+        response = self.client.post(self.url, {'consultas': [
+            self._item(0, status_atual='CONFIRMADA'),
+            self._item(0, medico=self.user_medico_2, status_atual='CANCELADA'),
+            self._item(60, status_atual='EM_ESPERA'),
+        ]}, format='json')
+
+        self.assertEqual([r['status'] for r in response.data['resultados']], ['criada', 'erro', 'erro'])
+        self.assertEqual(Consulta.objects.filter(status_atual='CONFIRMADA').count(), 1)
+
+    def test_lote_respeita_consultas_existentes(self):
+        response = self.client.post(self.url, {'consultas': [
+            {**self._item(0), 'data_hora': self.consulta.data_hora.isoformat()},
+        ]}, format='json')
+
+        self.assertEqual(response.data['resultados'][0]['status'], 'conflito')
+        self.assertEqual(Consulta.objects.count(), 1)
+
+    def test_lote_grande_em_poucas_queries(self):
+        pacientes = [
+            Paciente.objects.create(
+                user=User.objects.create_user(cpf=f'5550000{i:04d}', email=f'lote{i}@email.com', user_type='PACIENTE')
+            )
+            for i in range(20)
+        ]
+        itens = [
+            self._item(30 * (i // 2), medico=self.user_medico if i % 2 else self.user_medico_2, paciente=pacientes[i % 20].pk)
+            for i in range(500)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'consultas': itens}, format='json')
+        self.assertEqual(response.data['criadas'], 500)
+        # Consultas de leitura fixas (incluindo mapas de ocupação, utilização
+        # semanal, contadores diários e vínculos médico-clínica, com a montagem
+        # dos dias ainda sem mapa);
+        # os INSERTs só crescem com os lotes do bulk_create. Os consolidados
+        # mantidos pelos sinais somam um número fixo de escritas.
+        selects = [q for q in queries.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 14)
+        self.assertLess(len(queries.captured_queries), 50)
+
+
+class SerieConsultaTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('agendamentos-series')
+        self.client.force_authenticate(user=self.user_secretaria)
+        self.inicio = datetime.combine((timezone.now() + timezone.timedelta(days=60)).date(), time(14, 0))
+
+    def _serie(self, **extra):
+        dados = {
+            "paciente": self.paciente.pk,
+            "medico": self.user_medico.pk,
+            "clinica": self.clinica.pk,
+            "data_inicio": self.inicio.isoformat(),
+            "ocorrencias": 52,
+            "valor": "120.00",
+        }
+        dados.update(extra)
+        return dados
+
+    def test_serie_semanal_em_uma_passada(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, self._serie(), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['consultas']), 52)
+        serie = SerieConsulta.objects.get()
+        self.assertEqual(serie.consultas.count(), 52)
+        self.assertEqual(Pagamento.objects.filter(consulta__serie=serie).count(), 52)
+        ultima = serie.consultas.order_by('-data_hora').first()
+        self.assertEqual(ultima.data_hora, self.inicio + timezone.timedelta(weeks=51))
+        # 3 relacionamentos do serializer + bloqueio + agenda da série + mapas de
+        # ocupação (com a montagem dos dias ainda sem mapa) + utilização semanal +
+        # contadores diários + vínculos médico-clínica + resposta, independente do
+        # número de ocorrências
+        selects = [q for q in queries.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 15)
+
+    def test_serie_com_conflito_nao_cria_nada(self):
+        Consulta.objects.create(
+            paciente=self.paciente, medico=self.user_medico_2, clinica=self.clinica,
+            data_hora=self.inicio + timezone.timedelta(weeks=10, minutes=15), valor=Decimal('100.00')
+        )
+        response = self.client.post(self.url, self._serie(), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data['conflitos']), 1)
+        self.assertFalse(SerieConsulta.objects.exists())
+        self.assertFalse(Consulta.objects.filter(serie__isnull=False).exists())
+
+    def test_serie_pulando_conflitos(self):
+        Consulta.objects.create(
+            paciente=self.paciente, medico=self.user_medico, clinica=self.clinica,
+            data_hora=self.inicio + timezone.timedelta(weeks=2), valor=Decimal('100.00')
+        )
+        response = self.client.post(
+            self.url, self._serie(ocorrencias=4, intervalo_semanas=2, pular_conflitos=True), format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['consultas']), 3)
+        self.assertEqual(len(response.data['conflitos']), 1)
+
+    def test_serie_limite_de_ocorrencias(self):
+        response = self.client.post(self.url, self._serie(ocorrencias=500), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ocorrencias', response.data)
+
+
+@override_settings(LISTA_ESPERA_ASSINCRONA=False)
+class ListaEsperaTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.pacientes = [
+            Paciente.objects.create(user=User.objects.create_user(
+                cpf=f'6660000000{i}', email=f'espera{i}@email.com', first_name='Espera', last_name=str(i),
+                user_type='PACIENTE'
+            ))
+            for i in range(2)
+        ]
+        # Fila do médico (prioridade normal) e da especialidade (prioridade maior)
+        self.entrada_medico = ListaEspera.objects.create(
+            paciente=self.pacientes[0], clinica=self.clinica, medico=self.user_medico,
+            especialidade=self.medico.especialidade
+        )
+        self.entrada_especialidade = ListaEspera.objects.create(
+            paciente=self.pacientes[1], clinica=self.clinica, especialidade=self.medico.especialidade,
+            prioridade=5
+        )
+        self.client.force_authenticate(user=self.user_secretaria)
+
+    def _cancelar_consulta(self):
+        url = reverse('agendamentos-status-update', kwargs={'pk': self.consulta.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(url, {'status_atual': 'CANCELADA'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_vaga_cancelada_vai_para_maior_prioridade(self):
+        self._cancelar_consulta()
+
+        nova = Consulta.objects.exclude(pk=self.consulta.pk).get(data_hora=self.consulta.data_hora, medico=self.user_medico)
+        self.assertEqual(nova.paciente, self.pacientes[1])
+        self.assertEqual(nova.valor, Decimal('200.00'))
+        self.entrada_especialidade.refresh_from_db()
+        self.assertEqual(self.entrada_especialidade.consulta, nova)
+        self.entrada_medico.refresh_from_db()
+        self.assertEqual(self.entrada_medico.status, 'AGUARDANDO')
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_paciente_com_conflito_e_pulado(self):
+        Consulta.objects.create(
+            paciente=self.pacientes[1], medico=self.user_medico_2, clinica=self.clinica,
+            data_hora=self.consulta.data_hora, valor=Decimal('100.00')
+        )
+        self._cancelar_consulta()
+
+        nova = Consulta.objects.exclude(pk=self.consulta.pk).get(data_hora=self.consulta.data_hora, medico=self.user_medico)
+        self.assertEqual(nova.paciente, self.pacientes[0])
+
+    def test_consulta_removida_tambem_libera_vaga(self):
+        # Sem a consulta removida, o valor vem da consulta mais recente do médico
+        Consulta.objects.create(
+            paciente=self.paciente, medico=self.user_medico, clinica=self.clinica,
+            data_hora=timezone.now() - timezone.timedelta(days=3), valor=Decimal('180.00')
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('agendamentos-detail-delete', kwargs={'pk': self.consulta.pk}))
+
+        nova = Consulta.objects.get(data_hora=self.consulta.data_hora, medico=self.user_medico)
+        self.assertEqual(nova.paciente, self.pacientes[1])
+        self.assertEqual(nova.valor, Decimal('180.00'))
+
+    def test_preenchimento_fora_da_requisicao(self):
+        with override_settings(LISTA_ESPERA_ASSINCRONA=True), \
+                mock.patch('agendamentos.lista_espera._executor') as executor:
+            self._cancelar_consulta()
+
+        # A requisição apenas entrega a vaga à thread de segundo plano
+        executor.submit.assert_called_once()
+        self.assertFalse(Consulta.objects.filter(data_hora=self.consulta.data_hora, status_atual='PENDENTE').exists())
+
+    def test_paciente_entra_na_fila_por_si_mesmo(self):
+        self.client.force_authenticate(user=self.user_paciente)
+        response = self.client.post(reverse('agendamentos-lista-espera'), {
+            'paciente': self.pacientes[0].pk, 'clinica': self.clinica.pk,
+            'medico': self.user_medico.pk, 'prioridade': 9,
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['paciente'], self.paciente.pk)
+        self.assertEqual(response.data['prioridade'], 0)
+        self.assertEqual(response.data['especialidade'], self.medico.especialidade)
+
+
+class IdempotenciaTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.user_secretaria)
+        self.url = reverse('agendamentos-list-create')
+        self.dados = {
+            "paciente": self.paciente.pk,
+            "medico": self.user_medico_2.pk,
+            "clinica": self.clinica.pk,
+            "data_hora": (timezone.now() + timezone.timedelta(days=20)).replace(microsecond=0).isoformat(),
+            "valor": "150.00",
+        }
+
+    def test_repeticao_devolve_resposta_guardada(self):
+        primeira = self.client.post(self.url, self.dados, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        self.assertEqual(primeira.status_code, status.HTTP_201_CREATED)
+
+        with CaptureQueriesContext(connection) as queries:
+            segunda = self.client.post(self.url, self.dados, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+
+        self.assertEqual(segunda.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertEqual(segunda.json(), primeira.json())
+        self.assertEqual(Consulta.objects.filter(medico=self.user_medico_2).count(), 1)
+        # A repetição não toca nas tabelas da agenda
+        self.assertFalse(any('agendamentos_consulta' in q['sql'] for q in queries.captured_queries))
+
+    def test_mesma_chave_com_outra_requisicao(self):
+        self.client.post(self.url, self.dados, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        outra = {**self.dados, 'valor': '999.00'}
+        response = self.client.post(self.url, outra, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_pagamento_repetido(self):
+        url = reverse('agendamentos-pagamento-update', kwargs={'pk': self.consulta.pk})
+        primeira = self.client.put(url, format='json', HTTP_IDEMPOTENCY_KEY='pag-1')
+        segunda = self.client.put(url, format='json', HTTP_IDEMPOTENCY_KEY='pag-1')
+
+        self.assertEqual(primeira.status_code, status.HTTP_200_OK)
+        self.assertEqual(segunda.json(), primeira.json())
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+
+    def test_reserva_abandonada_e_retomada(self):
+        # Processo caiu entre reservar a chave e guardar a resposta
+        self.client.post(self.url, self.dados, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        Consulta.objects.filter(medico=self.user_medico_2).delete()
+        reserva = ChaveIdempotencia.objects.get(chave='abc-123')
+        ChaveIdempotencia.objects.filter(pk=reserva.pk).update(
+            status_code=None, corpo=None, expira_em=timezone.now() + IDEMPOTENCIA_RESERVA
+        )
+        response = self.client.post(self.url, self.dados, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        ChaveIdempotencia.objects.filter(pk=reserva.pk).update(expira_em=timezone.now())
+        response = self.client.post(self.url, self.dados, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        registro = ChaveIdempotencia.objects.get(chave='abc-123')
+        self.assertEqual(registro.status_code, status.HTTP_201_CREATED)
+        self.assertGreater(registro.expira_em, timezone.now() + IDEMPOTENCIA_RESERVA)
+
+    def test_limpeza_remove_apenas_chaves_expiradas(self):
+        agora = timezone.now()
+        ChaveIdempotencia.objects.bulk_create([
+            ChaveIdempotencia(usuario=self.user_secretaria, chave=f'k{i}', impressao='x', status_code=201,
+                              expira_em=agora - timezone.timedelta(minutes=1))
+            for i in range(7)
+        ] + [
+            ChaveIdempotencia(usuario=self.user_secretaria, chave='valida', impressao='x', status_code=201,
+                              expira_em=agora + timezone.timedelta(hours=1))
+        ])
+
+        saida = StringIO()
+        call_command('limpar_chaves_idempotencia', lote=3, stdout=saida)
+
+        self.assertIn('7 chave(s)', saida.getvalue())
+        self.assertEqual(list(ChaveIdempotencia.objects.values_list('chave', flat=True)), ['valida'])
+
+
+class MarcacaoPeloPacienteTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.medico.clinicas.add(self.clinica)
+        self.user_medico.first_name, self.user_medico.last_name = 'José', 'Álvares'
+        self.user_medico.save()
+        self.url = reverse('paciente-marcar-consulta')
+        self.client.force_authenticate(user=self.user_paciente)
+        self.data_hora = (timezone.now() + timezone.timedelta(days=3)).replace(hour=9, minute=0, second=0, microsecond=0)
+
+    def test_nome_normalizado_acompanha_o_usuario(self):
+        self.medico.refresh_from_db()
+        self.assertEqual(self.medico.nome_normalizado, 'jose alvares')
+
+    def test_marcar_pelo_nome_sem_acentos(self):
+        response = self.client.post(self.url, {
+            'medico_nome': 'JOSE alvares', 'especialidade_nome': 'clinica geral',
+            'data_hora': self.data_hora.isoformat(),
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        consulta = Consulta.objects.get(pk=response.data['id'])
+        self.assertEqual(consulta.medico, self.user_medico)
+        self.assertEqual(consulta.clinica, self.clinica)
+        self.assertTrue(Pagamento.objects.filter(consulta=consulta).exists())
+
+    def test_marcar_pelo_id(self):
+        response = self.client.post(self.url, {
+            'medico': self.user_medico.pk, 'data_hora': self.data_hora.isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_busca_pelo_nome_usa_o_indice(self):
+        with CaptureQueriesContext(connection) as queries:
+            list(Medico.objects.por_nome('José Álvares', 'CLINICA_GERAL'))
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"nome_normalizado" = ', queries[0]['sql'])
+
+    def test_nome_ambiguo_pede_o_id(self):
+        homonimo = User.objects.create_user(
+            cpf='77777777777', email='homonimo@email.com', first_name='Jose', last_name='Alvares', user_type='MEDICO'
+        )
+        Medico.objects.create(user=homonimo, crm='55555-TO', clinicas=[self.clinica])
+
+        response = self.client.post(self.url, {
+            'medico_nome': 'José Álvares', 'especialidade_nome': 'Clínica Geral',
+            'data_hora': self.data_hora.isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_medico_inexistente(self):
+        response = self.client.post(self.url, {
+            'medico_nome': 'Fulano', 'especialidade_nome': 'Cardiologia',
+            'data_hora': self.data_hora.isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RecepcaoTests(BaseAPITestCase):
+    """Check-in, chamada, início/fim do atendimento e fila de espera do médico."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        hoje = datetime.combine(timezone.now().date(), time(8, 0))
+        self.consultas = [
+            Consulta.objects.create(
+                paciente=self.paciente, medico=self.user_medico, clinica=self.clinica,
+                data_hora=hoje + timezone.timedelta(hours=i), valor=Decimal('200.00')
+            )
+            for i in range(3)
+        ]
+        self.url_fila = reverse('agendamentos-fila', kwargs={'medico_id': self.user_medico.pk})
+
+    def _acao(self, nome, consulta, usuario=None):
+        self.client.force_authenticate(user=usuario or self.user_secretaria)
+        return self.client.post(reverse(f'agendamentos-{nome}', kwargs={'pk': consulta.pk}))
+
+    def test_fila_por_ordem_de_chegada(self):
+        primeira, segunda, _ = self.consultas
+        self.assertEqual(self._acao('check-in', segunda).data['status_atual'], 'EM_ESPERA')
+        self._acao('check-in', primeira)
+
+        response = self.client.get(self.url_fila, {'consulta': primeira.pk})
+        self.assertEqual(response.data['proximo'], segunda.pk)
+        self.assertEqual([item['consulta'] for item in response.data['fila']], [segunda.pk, primeira.pk])
+        self.assertEqual(response.data['posicao'], 2)
+        # Sem histórico, cada atendimento conta como JANELA_CONFLITO
+        self.assertEqual(response.data['espera_estimada_minutos'], 30)
+
+        # A fila fica em cache até mudar (só o vínculo da secretária com o médico é lido)
+        with self.assertNumQueries(1):
+            self.client.get(self.url_fila, {'consulta': primeira.pk})
+
+        self._acao('chamar', segunda)
+        self.assertEqual(self.client.get(self.url_fila, {'consulta': primeira.pk}).data['posicao'], 1)
+
+    def test_atendimento_completo_atualiza_duracao_media(self):
+        consulta = self.consultas[0]
+        self._acao('check-in', consulta)
+        response = self._acao('iniciar', consulta, self.user_medico)
+        self.assertEqual(response.data['status_atual'], 'EM_ATENDIMENTO')
+        self.assertIsNotNone(response.data['chamada'])
+
+        self.client.post(reverse('agendamentos-finalizar', kwargs={'pk': consulta.pk}), {'conteudo': 'ok'})
+        atendimento = AtendimentoConsulta.objects.get(consulta=consulta)
+        self.assertIsNotNone(atendimento.fim)
+        self.assertEqual(TempoAtendimentoMedico.objects.get(medico=self.user_medico).atendimentos, 1)
+        self.assertIsNone(self.client.get(self.url_fila).data['em_atendimento_desde'])
+
+    def test_transicoes_invalidas(self):
+        consulta = self.consultas[0]
+        self.assertEqual(self._acao('iniciar', consulta).status_code, status.HTTP_400_BAD_REQUEST)
+        self._acao('check-in', consulta)
+        self.assertEqual(self._acao('check-in', consulta).status_code, status.HTTP_400_BAD_REQUEST)
+        # Consulta de outro dia
+        self.assertEqual(self._acao('check-in', self.consulta).status_code, status.HTTP_400_BAD_REQUEST)
+        # Médico só age nas próprias consultas
+        response = self._acao('chamar', consulta, self.user_medico_2)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_acesso_restrito_a_clinica_e_ao_proprio_medico(self):
+        consulta = self.consultas[0]
+        outra_clinica = Clinica.objects.create(
+            nome_fantasia="Outra Clínica", cidade=self.clinica.cidade,
+            tipo_clinica=self.clinica.tipo_clinica, cnpj="11222333000199"
+        )
+        self.secretaria.clinica = outra_clinica
+        self.secretaria.save()
+        self.user_secretaria.refresh_from_db()
+
+        # Secretária de outra clínica não age na consulta nem vê a fila
+        self.assertEqual(self._acao('check-in', consulta).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(self.url_fila).status_code, status.HTTP_404_NOT_FOUND)
+
+        # Médico só vê a própria fila
+        self.client.force_authenticate(user=self.user_medico_2)
+        self.assertEqual(self.client.get(self.url_fila).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.user_medico)
+        self.assertEqual(self.client.get(self.url_fila).status_code, status.HTTP_200_OK)
+
+    def test_cancelamento_tira_da_fila(self):
+        primeira, segunda, terceira = self.consultas
+        for consulta in self.consultas:
+            self._acao('check-in', consulta)
+        self.assertEqual(self.client.get(self.url_fila).data['proximo'], primeira.pk)
+
+        self.client.patch(reverse('cancelar-consulta', kwargs={'pk': primeira.pk}), {}, format='json')
+        self.assertFalse(AtendimentoConsulta.objects.filter(consulta=primeira).exists())
+        self.assertEqual(self.client.get(self.url_fila).data['proximo'], segunda.pk)
+
+        self.client.patch(
+            reverse('cancelar-consultas-lote'), {'ids': [segunda.pk]}, format='json'
+        )
+        self.client.force_authenticate(user=self.user_medico)
+        self.client.delete(reverse('agendamentos-detail-delete', kwargs={'pk': terceira.pk}))
+        self.assertEqual(self.client.get(self.url_fila).data['fila'], [])
+
+    def test_secretaria_nao_confirma_nem_cancela_consulta_em_andamento(self):
+        em_espera, em_atendimento, _ = self.consultas
+        self._acao('check-in', em_espera)
+        self._acao('check-in', em_atendimento)
+        self._acao('iniciar', em_atendimento)
+
+        response = self.client.patch(
+            reverse('confirmar-consultas-lote'), {'ids': [em_espera.pk, em_atendimento.pk]}, format='json'
+        )
+        self.assertEqual(response.data['atualizadas'], [])
+        response = self.client.patch(reverse('confirmar-consulta', kwargs={'pk': em_espera.pk}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(reverse('cancelar-consulta', kwargs={'pk': em_atendimento.pk}), {})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Os status da recepção não são definidos diretamente
+        response = self.client.put(
+            reverse('agendamentos-status-update', kwargs={'pk': self.consultas[2].pk}),
+            {'status_atual': 'EM_ESPERA'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url_fila).data['proximo'], em_espera.pk)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import ConsultaAPIView, ConsultaStatusUpdateView, PagamentoUpdateView, AnotacaoConsultaView, FinalizarConsultaAPIView, PacienteMarcarConsultaView, PacienteRemarcarConsultaView
+from .views import ConsultaAPIView, ConsultaStatusUpdateView, PagamentoUpdateView, AnotacaoConsultaView, FinalizarConsultaAPIView, PacienteMarcarConsultaView, PacienteRemarcarConsultaView, DisponibilidadeAPIView, ConsultaLoteAPIView, SerieConsultaAPIView, ListaEsperaAPIView, CheckInConsultaView, ChamarPacienteView, IniciarAtendimentoView, FilaMedicoAPIView
 
 urlpatterns = [
     # Listar/criar consultas
@@ -15,6 +15,24 @@ urlpatterns = [
     # Finalizar consulta
     path('<int:pk>/finalizar/', FinalizarConsultaAPIView.as_view(), name='agendamentos-finalizar'),
 
+    # Recepção: check-in, chamada e início do atendimento
+    path('<int:pk>/check-in/', CheckInConsultaView.as_view(), name='agendamentos-check-in'),
+    path('<int:pk>/chamar/', ChamarPacienteView.as_view(), name='agendamentos-chamar'),
+    path('<int:pk>/iniciar/', IniciarAtendimentoView.as_view(), name='agendamentos-iniciar'),
+    # Fila de espera do médico no dia
+    path('fila/<int:medico_id>/', FilaMedicoAPIView.as_view(), name='agendamentos-fila'),
+
+    # Criação de consultas em lote
+    path('lote/', ConsultaLoteAPIView.as_view(), name='agendamentos-lote'),
+    # Séries recorrentes
+    path('series/', SerieConsultaAPIView.as_view(), name='agendamentos-series'),
+    path('series/<int:pk>/', SerieConsultaAPIView.as_view(), name='agendamentos-series-detail'),
+    # Lista de espera
+    path('lista-espera/', ListaEsperaAPIView.as_view(), name='agendamentos-lista-espera'),
+    path('lista-espera/<int:pk>/', ListaEsperaAPIView.as_view(), name='agendamentos-lista-espera-detail'),
+    # Horários livres por médico/especialidade
+    path('disponibilidade/', DisponibilidadeAPIView.as_view(), name='agendamentos-disponibilidade'),
+
     path('paciente-marcar/', PacienteMarcarConsultaView.as_view(), name='paciente-marcar-consulta' ),
     path('<int:pk>/paciente-remarcar/', PacienteRemarcarConsultaView.as_view(), name='paciente-remarcar-consulta'),
 ]
\ No newline at end of file
@@ -3,18 +3,65 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import transaction
+from django.conf import settings
+from django.db import transaction, IntegrityError
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from datetime import timedelta, datetime
+from decimal import Decimal
 from rest_framework.permissions import IsAuthenticated
 
-from .models import Consulta, Pagamento, ConsultaStatusLog, AnotacaoConsulta
-from .serializers import ConsultaSerializer, AnotacaoConsultaSerializer
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Consulta, Pagamento, ConsultaStatusLog, AnotacaoConsulta, BloqueioAgenda, SerieConsulta, ListaEspera
+from .serializers import (
+    ConsultaSerializer, AnotacaoConsultaSerializer, ConsultaLoteItemSerializer, SerieConsultaSerializer,
+    ListaEsperaSerializer,
+)
+from .disponibilidade import horarios_livres
+from .paginacao import paginar_por_cursor, ler_limite
+from .conflitos import MapaOcupacao
+from .signals import consultas_alteradas
+from .idempotencia import idempotente
+from .recepcao import (
+    fazer_check_in, chamar_paciente, iniciar_atendimento, encerrar_atendimento,
+    fila, proximo_paciente, posicao_na_fila, espera_estimada,
+)
+from medicos.models import Medico, MedicoClinica, especialidade_por_nome
+from pacientes.models import Paciente
+from clinicas.models import Clinica
+from users.models import User
 from users.permissions import IsMedicoOrSecretaria
-from .consts import STATUS_CONSULTA_CONCLUIDA, STATUS_CONSULTA_CHOICES
+from .consts import (
+    STATUS_CONSULTA_CONCLUIDA, STATUS_CONSULTA_CHOICES, STATUS_CONSULTA_PENDENTE, STATUS_PAGAMENTO_PENDENTE,
+    DISPONIBILIDADE_MAX_DIAS, LOTE_MAXIMO, STATUS_ESPERA_AGUARDANDO, STATUS_ESPERA_CANCELADA,
+    STATUS_CONSULTA_EM_ESPERA, STATUS_CONSULTA_EM_ATENDIMENTO,
+)
 from users.permissions import IsMedicoUser, HasRole
 
+
+def gravar_consultas(consultas, pessoa):
+    """
+    Grava as consultas já verificadas com seus pagamentos e logs iniciais,
+    usando um bulk_create por tabela. Deve ser chamada dentro da transação
+    que obteve o bloqueio da agenda.
+    """
+    consultas = Consulta.objects.bulk_create(consultas)
+    Pagamento.objects.bulk_create([
+        Pagamento(consulta=consulta, status=STATUS_PAGAMENTO_PENDENTE, valor_pago=consulta.valor)
+        for consulta in consultas
+    ])
+    ConsultaStatusLog.objects.bulk_create([
+        ConsultaStatusLog(consulta=consulta, status_novo=consulta.status_atual, pessoa=pessoa)
+        for consulta in consultas
+    ])
+    # bulk_create não dispara post_save: avisa caches e contadores explicitamente
+    consultas_alteradas.send(
+        sender=Consulta, alteracoes=[(None, consulta.estado_agenda()) for consulta in consultas]
+    )
+    return consultas
+
+
 class ConsultaAPIView(APIView):
     """
     API para gerenciar o CRUD completo de agendamentos.
@@ -31,8 +78,8 @@ class ConsultaAPIView(APIView):
         # Secretária: filtra APENAS pela clínica associada
         if getattr(user, 'user_type', None) == 'SECRETARIA':
             try:
-                clinica = user.perfil_secretaria.clinica
-                return Consulta.objects.filter(clinica=clinica).order_by('data_hora')
+                clinica_id = user.perfil_secretaria.clinica_id
+                return Consulta.objects.filter(clinica_id=clinica_id).order_by('data_hora')
             except AttributeError:
                 return Consulta.objects.none()
         
@@ -54,16 +101,70 @@ class ConsultaAPIView(APIView):
         # fallback: nada
         return Consulta.objects.none()
 
+    def filtrar(self, queryset, params):
+        """
+        Aplica os filtros opcionais da listagem: data_inicio/data_fim
+        (AAAA-MM-DD ou data/hora ISO), medico, paciente e status_atual.
+        """
+        data_inicio = params.get('data_inicio')
+        if data_inicio:
+            dia = parse_date(data_inicio)
+            inicio = datetime.combine(dia, datetime.min.time()) if dia else parse_datetime(data_inicio)
+            if inicio is None:
+                raise ValueError("O parâmetro 'data_inicio' deve estar no formato AAAA-MM-DD.")
+            queryset = queryset.filter(data_hora__gte=inicio)
+
+        data_fim = params.get('data_fim')
+        if data_fim:
+            dia = parse_date(data_fim)
+            # Data sem hora: inclui o dia inteiro
+            fim = datetime.combine(dia + timedelta(days=1), datetime.min.time()) if dia else parse_datetime(data_fim)
+            if fim is None:
+                raise ValueError("O parâmetro 'data_fim' deve estar no formato AAAA-MM-DD.")
+            queryset = queryset.filter(data_hora__lt=fim)
+
+        for campo in ('medico', 'paciente'):
+            valor = params.get(campo)
+            if valor:
+                if not valor.isdigit():
+                    raise ValueError(f"O parâmetro '{campo}' deve ser um número.")
+                queryset = queryset.filter(**{f'{campo}_id': int(valor)})
+
+        status_atual = params.get('status_atual')
+        if status_atual:
+            if status_atual not in [choice[0] for choice in STATUS_CONSULTA_CHOICES]:
+                raise ValueError(f"Status '{status_atual}' inválido.")
+            queryset = queryset.filter(status_atual=status_atual)
+
+        return queryset
+
     def get(self, request, pk=None):
         if pk:
-            consulta = get_object_or_404(self.get_queryset(), pk=pk)
+            consulta = get_object_or_404(self.get_queryset().com_detalhes(), pk=pk)
             serializer = ConsultaSerializer(consulta)
             return Response(serializer.data)
-        
-        consultas = self.get_queryset()
+
+        params = request.query_params
+        try:
+            consultas = self.filtrar(self.get_queryset(), params).com_detalhes()
+
+            # Paginação por cursor quando o cliente pede 'limite' ou 'cursor';
+            # sem eles a resposta continua sendo a lista completa (compatibilidade).
+            if 'cursor' in params or 'limite' in params:
+                pagina, proximo_cursor = paginar_por_cursor(
+                    consultas, cursor=params.get('cursor'), limite=ler_limite(params.get('limite'))
+                )
+                return Response({
+                    'resultados': ConsultaSerializer(pagina, many=True).data,
+                    'proximo_cursor': proximo_cursor,
+                })
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         serializer = ConsultaSerializer(consultas, many=True)
         return Response(serializer.data)
 
+    @idempotente
     def post(self, request):
         serializer = ConsultaSerializer(data=request.data)
         if serializer.is_valid(raise_exception=True):
@@ -71,37 +172,26 @@ class ConsultaAPIView(APIView):
             medico = serializer.validated_data['medico']
             paciente = serializer.validated_data['paciente']
 
-            # --- JANELA MÍNIMA DE 30 MINUTOS ---
-            janela_inicio = data_hora - timedelta(minutes=30)
-            janela_fim = data_hora + timedelta(minutes=30)
-
-            # Conflito por médico (qualquer consulta no intervalo)
-            conflito_medico = Consulta.objects.filter(
-                medico=medico,
-                data_hora__gte=janela_inicio,
-                data_hora__lt=janela_fim,
-            ).exists()
-            if conflito_medico:
-                return Response(
-                    {"error": "O médico já possui consulta em uma janela de 30 minutos neste horário."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            # Conflito por paciente (qualquer consulta no intervalo)
-            conflito_paciente = Consulta.objects.filter(
-                paciente=paciente,
-                data_hora__gte=janela_inicio,
-                data_hora__lt=janela_fim,
-            ).exists()
-            if conflito_paciente:
-                return Response(
-                    {"error": "O paciente já possui consulta em uma janela de 30 minutos neste horário."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            # ...existing code (criar consulta, pagamento e log)...
             try:
                 with transaction.atomic():
+                    # Serializa apenas as marcações do mesmo médico/dia: a verificação
+                    # de conflito e a inserção acontecem sob o mesmo bloqueio.
+                    BloqueioAgenda.objects.bloquear_horarios(medico.pk, [data_hora])
+
+                    # --- JANELA MÍNIMA DE 30 MINUTOS ---
+                    # Conflitos de médico e de paciente em uma única consulta indexada
+                    conflitos = Consulta.objects.conflitos(data_hora, medico=medico, paciente=paciente)
+                    if conflitos['medico']:
+                        return Response(
+                            {"error": "O médico já possui consulta em uma janela de 30 minutos neste horário."},
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+                    if conflitos['paciente']:
+                        return Response(
+                            {"error": "O paciente já possui consulta em uma janela de 30 minutos neste horário."},
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+
                     consulta = serializer.save()
                     Pagamento.objects.create(
                         consulta=consulta,
@@ -113,6 +203,12 @@ class ConsultaAPIView(APIView):
                         status_novo=consulta.status_atual,
                         pessoa=self.request.user
                     )
+            except IntegrityError:
+                # Restrição de sobreposição do PostgreSQL (quando habilitada)
+                return Response(
+                    {"error": "Já existe consulta em uma janela de 30 minutos neste horário."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             except Exception as e:
                 return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -132,37 +228,26 @@ class ConsultaAPIView(APIView):
             medico = serializer.validated_data.get('medico', consulta.medico)
             paciente = serializer.validated_data.get('paciente', consulta.paciente)
 
-            # --- JANELA MÍNIMA DE 30 MINUTOS PARA REMARCAÇÃO ---
-            janela_inicio = data_hora_nova - timedelta(minutes=30)
-            janela_fim = data_hora_nova + timedelta(minutes=30)
-
-            # Conflito por médico (exclui a própria consulta)
-            conflito_medico = Consulta.objects.filter(
-                medico=medico,
-                data_hora__gte=janela_inicio,
-                data_hora__lt=janela_fim,
-            ).exclude(pk=pk).exists()
-            if conflito_medico:
-                return Response(
-                    {"error": "O médico já possui consulta em uma janela de 30 minutos neste novo horário."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            # Conflito por paciente (exclui a própria consulta)
-            conflito_paciente = Consulta.objects.filter(
-                paciente=paciente,
-                data_hora__gte=janela_inicio,
-                data_hora__lt=janela_fim,
-            ).exclude(pk=pk).exists()
-            if conflito_paciente:
-                return Response(
-                    {"error": "O paciente já possui consulta em uma janela de 30 minutos neste novo horário."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            # ...existing code (salvar atualização e log se status mudar)...
             try:
                 with transaction.atomic():
+                    BloqueioAgenda.objects.bloquear_horarios(medico.pk, [data_hora_nova])
+
+                    # --- JANELA MÍNIMA DE 30 MINUTOS PARA REMARCAÇÃO ---
+                    # Conflitos de médico e de paciente (exceto a própria consulta) em uma única consulta
+                    conflitos = Consulta.objects.conflitos(
+                        data_hora_nova, medico=medico, paciente=paciente, excluir_pk=consulta.pk
+                    )
+                    if conflitos['medico']:
+                        return Response(
+                            {"error": "O médico já possui consulta em uma janela de 30 minutos neste novo horário."},
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+                    if conflitos['paciente']:
+                        return Response(
+                            {"error": "O paciente já possui consulta em uma janela de 30 minutos neste novo horário."},
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+
                     status_anterior = consulta.status_atual
                     consulta_atualizada = serializer.save()
 
@@ -172,6 +257,11 @@ class ConsultaAPIView(APIView):
                             status_novo=consulta_atualizada.status_atual,
                             pessoa=self.request.user
                         )
+            except IntegrityError:
+                return Response(
+                    {"error": "Já existe consulta em uma janela de 30 minutos neste novo horário."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             except Exception as e:
                 return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -216,7 +306,13 @@ class ConsultaStatusUpdateView(APIView):
                 {"error": "O campo 'status_atual' com um valor válido é obrigatório."},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
+        if novo_status in (STATUS_CONSULTA_EM_ESPERA, STATUS_CONSULTA_EM_ATENDIMENTO):
+            # Esses status registram os marcos do atendimento (ver agendamentos.recepcao)
+            return Response(
+                {"error": "Use os endpoints de check-in e de início do atendimento para este status."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         try:
             with transaction.atomic():
                 status_anterior = consulta.status_atual
@@ -241,6 +337,7 @@ class PagamentoUpdateView(APIView):
     permission_classes = [HasRole]
     required_roles = ['SECRETARIA']
 
+    @idempotente
     def put(self, request, pk):
         consulta = get_object_or_404(Consulta.objects.all(), pk=pk)
         pagamento = get_object_or_404(Pagamento.objects.all(), consulta=consulta)
@@ -306,13 +403,16 @@ class FinalizarConsultaAPIView(APIView):
                     defaults={'conteudo': conteudo_anotacao}
                 )
 
-                # 2. Atualiza o status da consulta
+                # 2. Fecha o atendimento da recepção (fim e duração média), se houve
+                encerrar_atendimento(consulta)
+
+                # 3. Atualiza o status da consulta
                 if consulta.status_atual != STATUS_CONSULTA_CONCLUIDA:
                     status_anterior = consulta.status_atual
                     consulta.status_atual = STATUS_CONSULTA_CONCLUIDA
                     consulta.save()
 
-                    # 3. Cria um log da mudança de status
+                    # 4. Cria um log da mudança de status
                     ConsultaStatusLog.objects.create(
                         consulta=consulta,
                         status_novo=STATUS_CONSULTA_CONCLUIDA,
@@ -328,6 +428,115 @@ class FinalizarConsultaAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class EtapaAtendimentoAPIView(APIView):
+    """
+    Base das ações da recepção sobre uma consulta (ver agendamentos.recepcao).
+    Cada subclasse define a `etapa`. Médicos só agem nas próprias consultas e
+    secretárias, nas consultas da própria clínica.
+    """
+    permission_classes = [IsMedicoOrSecretaria]
+    etapa = None
+
+    def get_queryset(self):
+        user = self.request.user
+        consultas = Consulta.objects.all()
+        if user.is_superuser:
+            return consultas
+        if user.user_type == 'MEDICO':
+            return consultas.filter(medico=user)
+        perfil = getattr(user, 'perfil_secretaria', None)
+        if perfil is None or perfil.clinica_id is None:
+            return consultas.none()
+        return consultas.filter(clinica_id=perfil.clinica_id)
+
+    def post(self, request, pk):
+        consultas = self.get_queryset()
+        try:
+            with transaction.atomic():
+                consulta = get_object_or_404(consultas.select_for_update(), pk=pk)
+                atendimento = self.etapa(consulta, request.user)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'consulta': consulta.pk,
+            'status_atual': consulta.status_atual,
+            'check_in': atendimento.check_in,
+            'chamada': atendimento.chamada,
+            'inicio': atendimento.inicio,
+        }, status=status.HTTP_200_OK)
+
+
+class CheckInConsultaView(EtapaAtendimentoAPIView):
+    etapa = staticmethod(fazer_check_in)
+
+
+class ChamarPacienteView(EtapaAtendimentoAPIView):
+    etapa = staticmethod(chamar_paciente)
+
+
+class IniciarAtendimentoView(EtapaAtendimentoAPIView):
+    etapa = staticmethod(iniciar_atendimento)
+
+
+class FilaMedicoAPIView(APIView):
+    """
+    Fila de espera do médico hoje, para a tela da sala de espera e a do médico.
+    GET /api/agendamentos/fila/<medico_id>/[?consulta=<id>]
+    Com 'consulta', devolve também a posição e a espera estimada dessa consulta.
+    Médicos veem só a própria fila; secretárias, a dos médicos vinculados à
+    clínica delas (`MedicoClinica`).
+    """
+    permission_classes = [IsMedicoOrSecretaria]
+
+    def get(self, request, medico_id):
+        user = request.user
+        if not user.is_superuser:
+            if user.user_type == 'MEDICO':
+                if medico_id != user.pk:
+                    return Response(
+                        {"error": "Você só pode ver a sua própria fila."}, status=status.HTTP_403_FORBIDDEN
+                    )
+            else:
+                perfil = getattr(user, 'perfil_secretaria', None)
+                vinculado = perfil is not None and MedicoClinica.objects.filter(
+                    medico_id=medico_id, clinica_id=perfil.clinica_id
+                ).exists()
+                if not vinculado:
+                    return Response(
+                        {"error": "Médico não encontrado na sua clínica."}, status=status.HTTP_404_NOT_FOUND
+                    )
+
+        dados = fila(medico_id)
+        agora = timezone.now()
+        resposta = {
+            'medico': medico_id,
+            'proximo': proximo_paciente(medico_id),
+            'em_atendimento_desde': dados['em_atendimento_desde'],
+            'duracao_media_minutos': round(dados['duracao_media'] / 60, 1),
+            'fila': [
+                {
+                    'consulta': consulta_id,
+                    'posicao': posicao,
+                    'check_in': check_in,
+                    'espera_estimada_minutos': round(espera_estimada(dados, posicao, agora).total_seconds() / 60),
+                }
+                for posicao, (consulta_id, check_in) in enumerate(dados['fila'], start=1)
+            ],
+        }
+
+        consulta_id = request.query_params.get('consulta')
+        if consulta_id:
+            if not consulta_id.isdigit():
+                return Response({"error": "O parâmetro 'consulta' deve ser um número."}, status=status.HTTP_400_BAD_REQUEST)
+            posicao = posicao_na_fila(medico_id, int(consulta_id))
+            resposta['posicao'] = posicao
+            resposta['espera_estimada_minutos'] = (
+                round(espera_estimada(dados, posicao, agora).total_seconds() / 60) if posicao else None
+            )
+        return Response(resposta)
+
+
 class PacienteMarcarConsultaView(APIView):
     """
     Endpoint para o PACIENTE logado marcar uma nova consulta.
@@ -335,6 +544,7 @@ class PacienteMarcarConsultaView(APIView):
     """
     permission_classes = [IsAuthenticated]
 
+    @idempotente
     def post(self, request, *args, **kwargs):
         # 1. Validação do Paciente
         if not request.user.user_type == 'PACIENTE':
@@ -345,64 +555,100 @@ class PacienteMarcarConsultaView(APIView):
         except Paciente.DoesNotExist:
             return Response({"error": "Perfil de paciente não encontrado."}, status=status.HTTP_404_NOT_FOUND)
 
-        # 2. Obter dados da request (conforme api_service.dart)
+        # 2. Obter dados da request (conforme api_service.dart). O médico pode vir
+        # pelo id ('medico') ou pelo nome + especialidade ('medico_nome', 'especialidade_nome').
+        medico_id = request.data.get('medico')
         medico_nome = request.data.get('medico_nome')
         especialidade_nome = request.data.get('especialidade_nome')
         data_hora_str = request.data.get('data_hora')
 
-        if not all([medico_nome, especialidade_nome, data_hora_str]):
-            return Response({"error": "Campos 'medico_nome', 'especialidade_nome' e 'data_hora' são obrigatórios."}, status=status.HTTP_400_BAD_REQUEST)
+        if not data_hora_str or not (medico_id or (medico_nome and especialidade_nome)):
+            return Response(
+                {"error": "Informe 'data_hora' e 'medico' (id) ou 'medico_nome' e 'especialidade_nome'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        try:
-            # 3. Encontrar o médico pelo nome e especialidade
-            # Isso é frágil, pois depende dos nomes exatos do frontend
-            
-            # Converte o nome da especialidade (Ex: "Cardiologia") para a chave (Ex: "CARDIOLOGIA")
-            especialidade_key = None
-            for key, value in Medico.EspecialidadeChoices.choices:
-                if value.lower() == especialidade_nome.lower():
-                    especialidade_key = key
-                    break
-            
+        data_hora = parse_datetime(str(data_hora_str))
+        if data_hora is None:
+            return Response({"error": "O campo 'data_hora' deve estar no formato ISO 8601."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if settings.USE_TZ and timezone.is_naive(data_hora):
+            data_hora = timezone.make_aware(data_hora)
+        elif not settings.USE_TZ and timezone.is_aware(data_hora):
+            data_hora = timezone.make_naive(data_hora)
+        if data_hora <= timezone.now():
+            return Response({"error": "Não é possível marcar consultas no passado."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # 3. Encontrar o médico: pelo id ou por uma busca exata no índice
+        # (especialidade, nome_normalizado), sem percorrer os médicos da especialidade
+        if medico_id:
+            if not str(medico_id).isdigit():
+                return Response({"error": "O campo 'medico' deve ser um número."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            medicos = list(Medico.objects.filter(pk=int(medico_id))[:1])
+        else:
+            especialidade_key = especialidade_por_nome(especialidade_nome)
             if not especialidade_key:
                 return Response({"error": f"Especialidade '{especialidade_nome}' não encontrada."}, status=status.HTTP_404_NOT_FOUND)
+            medicos = list(Medico.objects.por_nome(medico_nome, especialidade_key)[:2])
 
-            # Busca Médicos pelo perfil e tipo de usuário
-            medicos_possiveis = User.objects.filter(
-                user_type='MEDICO',
-                perfil_medico__especialidade=especialidade_key
+        if not medicos:
+            return Response({"error": "Médico não encontrado para esta especialidade."}, status=status.HTTP_404_NOT_FOUND)
+        if len(medicos) > 1:
+            return Response(
+                {"error": f"Há mais de um médico chamado '{medico_nome}'. Informe o campo 'medico' com o id."},
+                status=status.HTTP_400_BAD_REQUEST
             )
+        medico = medicos[0]
+
+        # 4. Obter a clínica do médico (PARA A SECRETÁRIA VER): a informada, se o
+        # médico atender nela, ou a primeira clínica do médico
+        clinicas = medico.clinicas.order_by('id')
+        clinica_pedida = request.data.get('clinica')
+        if clinica_pedida:
+            clinicas = clinicas.filter(pk=clinica_pedida) if str(clinica_pedida).isdigit() else clinicas.none()
+        clinica_id = clinicas.values_list('id', flat=True).first()
+        if clinica_id is None:
+            mensagem = "Médico não atende nesta clínica." if clinica_pedida else "Médico não está associado a nenhuma clínica."
+            return Response({"error": mensagem}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Tenta encontrar o nome exato na lista
-            medico_user = None
-            for m in medicos_possiveis:
-                if m.get_full_name().lower() == medico_nome.lower():
-                    medico_user = m
-                    break
-            
-            if not medico_user:
-                 return Response({"error": f"Médico '{medico_nome}' não encontrado para esta especialidade."}, status=status.HTTP_404_NOT_FOUND)
-
-            # 4. Obter a clínica do médico (PARA A SECRETÁRIA VER)
-            perfil = medico_user.perfil_medico
-            if not perfil or not perfil.clinica:
-                return Response({"error": "Médico não está associado a nenhuma clínica."}, status=status.HTTP_400_BAD_REQUEST)
-
-            # 5. Criar a consulta
-            Consulta.objects.create(
-                paciente=paciente,
-                medico=medico_user,
-                clinica=clinica,
-                data_hora=data_hora_str,
-                status_atual=STATUS_CONSULTA_PENDENTE, # Importado de consts.py
-                valor=0.00 # Paciente não define valor, pode ser 0 ou um valor padrão
-            )
-            
-            return Response({"message": "Consulta marcada com sucesso!"}, status=status.HTTP_201_CREATED)
+        try:
+            with transaction.atomic():
+                BloqueioAgenda.objects.bloquear_horarios(medico.pk, [data_hora])
+                conflitos = Consulta.objects.conflitos(data_hora, medico=medico.pk, paciente=paciente)
+                if conflitos['medico']:
+                    return Response(
+                        {"error": "O médico já possui consulta em uma janela de 30 minutos neste horário."},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                if conflitos['paciente']:
+                    return Response(
+                        {"error": "Você já possui consulta em uma janela de 30 minutos neste horário."},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
 
+                # 5. Criar a consulta
+                consulta = Consulta.objects.create(
+                    paciente=paciente,
+                    medico_id=medico.pk,
+                    clinica_id=clinica_id,
+                    data_hora=data_hora,
+                    status_atual=STATUS_CONSULTA_PENDENTE, # Importado de consts.py
+                    valor=Decimal('0.00') # Paciente não define valor, pode ser 0 ou um valor padrão
+                )
+                Pagamento.objects.create(consulta=consulta, status=STATUS_PAGAMENTO_PENDENTE, valor_pago=consulta.valor)
+                ConsultaStatusLog.objects.create(consulta=consulta, status_novo=consulta.status_atual, pessoa=request.user)
+        except IntegrityError:
+            return Response(
+                {"error": "Já existe consulta em uma janela de 30 minutos neste horário."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             return Response({"error": f"Erro ao processar a marcação: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        return Response({"message": "Consulta marcada com sucesso!", "id": consulta.pk}, status=status.HTTP_201_CREATED)
+
 
 class PacienteRemarcarConsultaView(APIView):
     """
@@ -481,3 +727,343 @@ class PacienteRemarcarConsultaView(APIView):
                 {"error": f"Erro interno ao salvar a remarcação: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class DisponibilidadeAPIView(APIView):
+    """
+    Lista os horários livres de um médico, ou de todos os médicos de uma
+    especialidade, dentro de um intervalo de datas.
+    Recebe GET em /api/agendamentos/disponibilidade/?medico=<id> (ou especialidade=<nome>)
+    &clinica=<id>&data_inicio=AAAA-MM-DD&data_fim=AAAA-MM-DD
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        medico_id = params.get('medico')
+        especialidade = params.get('especialidade')
+        clinica_id = params.get('clinica')
+
+        if not medico_id and not especialidade:
+            return Response(
+                {"error": "Informe o parâmetro 'medico' ou 'especialidade'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        data_inicio = parse_date(params.get('data_inicio') or '')
+        data_fim = parse_date(params.get('data_fim') or '') if params.get('data_fim') else data_inicio
+        if not data_inicio or not data_fim or data_fim < data_inicio:
+            return Response(
+                {"error": "Os parâmetros 'data_inicio' e 'data_fim' devem estar no formato AAAA-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        total_dias = (data_fim - data_inicio).days + 1
+        if total_dias > DISPONIBILIDADE_MAX_DIAS:
+            return Response(
+                {"error": f"O intervalo máximo é de {DISPONIBILIDADE_MAX_DIAS} dias."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        medicos = Medico.objects.select_related('user')
+        try:
+            if medico_id:
+                medicos = medicos.filter(user_id=int(medico_id))
+            if clinica_id:
+                medicos = medicos.filter(clinicas=int(clinica_id))
+        except ValueError:
+            return Response(
+                {"error": "Os parâmetros 'medico' e 'clinica' devem ser números."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if especialidade:
+            # Aceita a chave (CARDIOLOGIA) ou o nome exibido (Cardiologia)
+            chave = especialidade_por_nome(especialidade)
+            if chave is None:
+                return Response(
+                    {"error": f"Especialidade '{especialidade}' não encontrada."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            medicos = medicos.filter(especialidade=chave)
+
+        medicos = list(medicos)
+        dias = [data_inicio + timedelta(days=i) for i in range(total_dias)]
+        livres = horarios_livres([m.user_id for m in medicos], dias)
+
+        # Horários que já passaram não são oferecidos
+        agora = timezone.now()
+        hoje, hora_atual = agora.date(), agora.strftime('%H:%M')
+
+        resultado = []
+        for medico in medicos:
+            horarios = {}
+            for dia in dias:
+                if dia < hoje:
+                    continue
+                horarios_dia = livres[medico.user_id][dia]
+                if dia == hoje:
+                    horarios_dia = [h for h in horarios_dia if h > hora_atual]
+                horarios[dia.isoformat()] = horarios_dia
+            resultado.append({
+                'id': medico.user_id,
+                'nome_completo': medico.user.get_full_name(),
+                'especialidade': medico.get_especialidade_display(),
+                'horarios': horarios,
+            })
+
+        return Response({
+            'data_inicio': data_inicio.isoformat(),
+            'data_fim': data_fim.isoformat(),
+            'medicos': resultado,
+        }, status=status.HTTP_200_OK)
+
+
+class ConsultaLoteAPIView(APIView):
+    """
+    Cria muitas consultas numa única requisição (importações, agendas em bloco).
+    Recebe POST em /api/agendamentos/lote/ com {"consultas": [{paciente, medico,
+    clinica, data_hora, valor}, ...]} e devolve o resultado de cada item.
+
+    Os conflitos são verificados de uma vez, contra o banco e dentro do próprio
+    lote; Consulta, Pagamento e ConsultaStatusLog são gravados com bulk_create
+    numa única transação. Itens inválidos ou em conflito são ignorados.
+    """
+    permission_classes = [IsMedicoOrSecretaria]
+
+    MENSAGENS_CONFLITO = {
+        'medico': "O médico já possui consulta em uma janela de 30 minutos neste horário.",
+        'paciente': "O paciente já possui consulta em uma janela de 30 minutos neste horário.",
+    }
+
+    def post(self, request):
+        itens = request.data.get('consultas') if isinstance(request.data, dict) else request.data
+        if not isinstance(itens, list) or not itens:
+            return Response(
+                {"error": "Envie uma lista não vazia em 'consultas'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(itens) > LOTE_MAXIMO:
+            return Response(
+                {"error": f"O lote pode ter no máximo {LOTE_MAXIMO} consultas."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        resultados = [None] * len(itens)
+        validos = []
+        for indice, item in enumerate(itens):
+            serializer = ConsultaLoteItemSerializer(data=item)
+            if serializer.is_valid():
+                validos.append((indice, serializer.validated_data))
+            else:
+                resultados[indice] = {'indice': indice, 'status': 'erro', 'erros': serializer.errors}
+
+        # Relacionamentos: uma consulta por modelo para o lote inteiro
+        medicos = set(User.objects.filter(
+            user_type='MEDICO', id__in={dados['medico'] for _, dados in validos}
+        ).values_list('id', flat=True))
+        pacientes = set(Paciente.objects.filter(
+            pk__in={dados['paciente'] for _, dados in validos}
+        ).values_list('pk', flat=True))
+        clinicas = set(Clinica.objects.filter(
+            pk__in={dados['clinica'] for _, dados in validos}
+        ).values_list('pk', flat=True))
+
+        candidatos = []
+        for indice, dados in validos:
+            for campo, existentes, nome in (
+                ('medico', medicos, 'Médico'), ('paciente', pacientes, 'Paciente'), ('clinica', clinicas, 'Clínica'),
+            ):
+                if dados[campo] not in existentes:
+                    resultados[indice] = {
+                        'indice': indice, 'status': 'erro', 'erros': {campo: [f"{nome} não encontrado(a)."]}
+                    }
+                    break
+            else:
+                candidatos.append((indice, dados))
+        # Em ordem cronológica, cada horário só precisa ser comparado aos vizinhos
+        candidatos.sort(key=lambda par: par[1]['data_hora'])
+
+        novas = []
+        try:
+            with transaction.atomic():
+                if candidatos:
+                    BloqueioAgenda.objects.bloquear_marcacoes(
+                        (dados['medico'], dados['data_hora']) for _, dados in candidatos
+                    )
+                    mapa = MapaOcupacao(
+                        {dados['medico'] for _, dados in candidatos},
+                        {dados['paciente'] for _, dados in candidatos},
+                        candidatos[0][1]['data_hora'],
+                        candidatos[-1][1]['data_hora'],
+                    )
+
+                for indice, dados in candidatos:
+                    conflito = mapa.conflito(dados['medico'], dados['paciente'], dados['data_hora'])
+                    if conflito:
+                        resultados[indice] = {
+                            'indice': indice, 'status': 'conflito', 'error': self.MENSAGENS_CONFLITO[conflito]
+                        }
+                        continue
+                    mapa.reservar(dados['medico'], dados['paciente'], dados['data_hora'])
+                    novas.append((indice, Consulta(
+                        paciente_id=dados['paciente'],
+                        medico_id=dados['medico'],
+                        clinica_id=dados['clinica'],
+                        data_hora=dados['data_hora'],
+                        valor=dados['valor'],
+                        status_atual=dados['status_atual'],
+                    )))
+
+                gravar_consultas([consulta for _, consulta in novas], request.user)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        for indice, consulta in novas:
+            resultados[indice] = {'indice': indice, 'status': 'criada', 'id': consulta.pk}
+
+        return Response({
+            'criadas': len(novas),
+            'rejeitadas': len(itens) - len(novas),
+            'resultados': resultados,
+        }, status=status.HTTP_200_OK)
+
+
+class SerieConsultaAPIView(APIView):
+    """
+    Séries de consultas recorrentes (ex.: sessões semanais de terapia).
+    POST em /api/agendamentos/series/ com {paciente, medico, clinica, data_inicio,
+    intervalo_semanas, ocorrencias, valor} cria a série e todas as suas consultas.
+
+    Todas as ocorrências são verificadas numa única passada: uma consulta ao
+    banco carrega a agenda do médico e do paciente no período da série e cada
+    ocorrência é comparada em memória. Com "pular_conflitos": true as
+    ocorrências em conflito são omitidas; caso contrário nada é criado.
+    """
+    permission_classes = [IsMedicoOrSecretaria]
+
+    MENSAGENS_CONFLITO = ConsultaLoteAPIView.MENSAGENS_CONFLITO
+
+    def get_queryset(self):
+        user = self.request.user
+        series = SerieConsulta.objects.prefetch_related('consultas')
+        if user.is_staff or user.is_superuser:
+            return series
+        if user.user_type == 'SECRETARIA':
+            perfil = getattr(user, 'perfil_secretaria', None)
+            return series.filter(clinica_id=perfil.clinica_id) if perfil else series.none()
+        return series.filter(medico=user)
+
+    def get(self, request, pk=None):
+        if pk:
+            serie = get_object_or_404(self.get_queryset(), pk=pk)
+            return Response(SerieConsultaSerializer(serie).data)
+        return Response(SerieConsultaSerializer(self.get_queryset(), many=True).data)
+
+    def post(self, request):
+        serializer = SerieConsultaSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        pular_conflitos = str(request.data.get('pular_conflitos', '')).lower() in ('true', '1')
+
+        serie = SerieConsulta(**serializer.validated_data, criado_por=request.user)
+        horarios = serie.horarios()
+        medico_id, paciente_id = serie.medico_id, serie.paciente_id
+
+        conflitos = []
+        try:
+            with transaction.atomic():
+                BloqueioAgenda.objects.bloquear_horarios(medico_id, horarios)
+                mapa = MapaOcupacao({medico_id}, {paciente_id}, horarios[0], horarios[-1])
+
+                livres = []
+                for data_hora in horarios:
+                    conflito = mapa.conflito(medico_id, paciente_id, data_hora)
+                    if conflito:
+                        conflitos.append({'data_hora': data_hora, 'error': self.MENSAGENS_CONFLITO[conflito]})
+                    else:
+                        livres.append(data_hora)
+
+                if conflitos and (not pular_conflitos or not livres):
+                    return Response(
+                        {"error": "A série possui ocorrências em conflito.", "conflitos": conflitos},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+                serie.save()
+                gravar_consultas([
+                    Consulta(
+                        paciente_id=paciente_id, medico_id=medico_id, clinica_id=serie.clinica_id,
+                        data_hora=data_hora, valor=serie.valor, serie=serie,
+                    )
+                    for data_hora in livres
+                ], request.user)
+        except IntegrityError:
+            # Restrição de sobreposição do PostgreSQL (quando habilitada)
+            return Response(
+                {"error": "Já existe consulta em uma janela de 30 minutos em um dos horários da série."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        dados = SerieConsultaSerializer(serie).data
+        dados['conflitos'] = conflitos
+        return Response(dados, status=status.HTTP_201_CREATED)
+
+
+class ListaEsperaAPIView(APIView):
+    """
+    Lista de espera por médico ou especialidade numa clínica.
+    GET lista as entradas visíveis ao usuário, POST inclui um paciente na fila
+    e DELETE em /api/agendamentos/lista-espera/{id}/ retira a entrada.
+    Quando uma consulta é cancelada, a vaga é agendada automaticamente para a
+    primeira entrada elegível (ver `agendamentos.lista_espera`).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        entradas = ListaEspera.objects.all()
+        if user.is_staff or user.is_superuser:
+            return entradas
+        if user.user_type == 'SECRETARIA':
+            perfil = getattr(user, 'perfil_secretaria', None)
+            return entradas.filter(clinica_id=perfil.clinica_id) if perfil else entradas.none()
+        if user.user_type == 'MEDICO':
+            return entradas.filter(medico=user)
+        return entradas.filter(paciente_id=user.pk)
+
+    def get(self, request):
+        entradas = self.get_queryset()
+        status_espera = request.query_params.get('status', STATUS_ESPERA_AGUARDANDO)
+        if status_espera:
+            entradas = entradas.filter(status=status_espera)
+        return Response(ListaEsperaSerializer(entradas, many=True).data)
+
+    def post(self, request):
+        dados = request.data.copy()
+        user = request.user
+        if user.user_type == 'PACIENTE':
+            # O paciente só entra na fila por si mesmo e sem prioridade
+            dados['paciente'] = user.pk
+            dados['prioridade'] = 0
+        elif user.user_type == 'SECRETARIA':
+            perfil = getattr(user, 'perfil_secretaria', None)
+            if perfil is None:
+                return Response({"error": "Secretária sem clínica associada."}, status=status.HTTP_403_FORBIDDEN)
+            dados['clinica'] = perfil.clinica_id
+        elif not (user.is_staff or user.is_superuser):
+            return Response({"error": "Apenas pacientes e secretárias podem usar a lista de espera."},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        serializer = ListaEsperaSerializer(data=dados)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def delete(self, request, pk=None):
+        if pk is None:
+            return Response({"error": "A chave primária (pk) é necessária para esta operação."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        entrada = get_object_or_404(self.get_queryset(), pk=pk, status=STATUS_ESPERA_AGUARDANDO)
+        entrada.status = STATUS_ESPERA_CANCELADA
+        entrada.save(update_fields=['status'])
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,6 +1,6 @@
 # clinicas/admin.py
 from django.contrib import admin
-from .models import Clinica, Cidade, Estado, TipoClinica
+from .models import Clinica, Cidade, Estado, TipoClinica, ContadorDiarioClinica
 
 @admin.register(Estado)
 class EstadoAdmin(admin.ModelAdmin):
@@ -30,4 +30,10 @@ class ClinicaAdmin(admin.ModelAdmin):
     # --- A SOLUÇÃO ESTÁ AQUI ---
     # Esta linha otimiza a consulta ao banco de dados, buscando os objetos
     # relacionados (cidade, tipo_clinica e responsavel) em uma única query.
-    list_select_related = ('cidade', 'tipo_clinica', 'responsavel')
\ No newline at end of file
+    list_select_related = ('cidade', 'tipo_clinica', 'responsavel')
+
+@admin.register(ContadorDiarioClinica)
+class ContadorDiarioClinicaAdmin(admin.ModelAdmin):
+    list_display = ('clinica', 'dia', 'status', 'total')
+    list_filter = ('status',)
+    raw_id_fields = ('clinica',)
@@ -0,0 +1,68 @@
+# clinicas/contadores.py
+"""
+Contadores diários de consultas por clínica e status (`ContadorDiarioClinica`).
+
+Todos os caminhos de escrita de consultas (marcação, mudança de status,
+remarcação, remoção, ações da secretária, lotes) enviam `consultas_alteradas`
+de dentro da própria transação; `registrar_alteracoes` aplica ali mesmo a
+diferença entre o antes e o depois. Se a escrita for desfeita, o ajuste
+também é.
+
+O comando `recalcular_contadores_clinica` reconstrói a tabela a partir das
+consultas, para corrigir divergências.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ContadorDiarioClinica
+
+
+def dia_da_consulta(data_hora):
+    return (timezone.localtime(data_hora) if timezone.is_aware(data_hora) else data_hora).date()
+
+
+def contabilizar(saldos, estado, sinal=1):
+    """Soma (ou subtrai, com sinal=-1) a consulta `estado` nos saldos por (clinica_id, dia, status)."""
+    if estado is None or estado.data_hora is None:
+        return
+    saldos[(estado.clinica_id, dia_da_consulta(estado.data_hora), estado.status_atual)] += sinal
+
+
+def registrar_alteracoes(alteracoes):
+    """Aplica aos contadores as alterações (antes, depois) de `consultas_alteradas`."""
+    saldos = defaultdict(int)
+    for antes, depois in alteracoes:
+        contabilizar(saldos, antes, -1)
+        contabilizar(saldos, depois)
+    saldos = {chave: saldo for chave, saldo in saldos.items() if saldo}
+    if not saldos:
+        return
+
+    with transaction.atomic():
+        # Garante as linhas (concorrentes podem criá-las ao mesmo tempo) e as bloqueia
+        ContadorDiarioClinica.objects.bulk_create([
+            ContadorDiarioClinica(clinica_id=clinica_id, dia=dia, status=status)
+            for clinica_id, dia, status in saldos
+        ], ignore_conflicts=True)
+        linhas = ContadorDiarioClinica.objects.select_for_update().filter(
+            clinica_id__in={chave[0] for chave in saldos},
+            dia__in={chave[1] for chave in saldos},
+            status__in={chave[2] for chave in saldos},
+        )
+        alteradas = []
+        for linha in linhas:
+            saldo = saldos.get((linha.clinica_id, linha.dia, linha.status))
+            if saldo:
+                linha.total += saldo
+                alteradas.append(linha)
+        ContadorDiarioClinica.objects.bulk_update(alteradas, ['total'])
+
+
+def totais(clinica_id, inicio, fim):
+    """{(dia, status): total} da clínica entre `inicio` e `fim` (datas, `fim` exclusivo)."""
+    linhas = ContadorDiarioClinica.objects.filter(
+        clinica_id=clinica_id, dia__gte=inicio, dia__lt=fim
+    ).values_list('dia', 'status', 'total')
+    return {(dia, status): total for dia, status, total in linhas}
@@ -0,0 +1,53 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from agendamentos.models import Consulta, EstadoAgenda
+from clinicas.contadores import contabilizar
+from clinicas.models import Clinica, ContadorDiarioClinica
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstrói os contadores diários das clínicas (ContadorDiarioClinica) a partir '
+        'das consultas, um lote de clínicas por transação. Use na implantação ou para '
+        'corrigir divergências; no dia a dia a tabela é mantida pelas escritas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=20, help='Quantidade de clínicas reconstruídas por transação.')
+        parser.add_argument('--clinica', type=int, action='append', help='Reconstrói apenas as clínicas informadas.')
+
+    def handle(self, *args, **options):
+        lote = max(1, options['lote'])
+        clinica_ids = options['clinica'] or list(
+            Clinica.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        total = 0
+        for i in range(0, len(clinica_ids), lote):
+            total += self._reconstruir(clinica_ids[i:i + lote])
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} contador(es) diário(s) reconstruído(s) para {len(clinica_ids)} clínica(s).'
+        ))
+
+    def _reconstruir(self, clinica_ids):
+        saldos = defaultdict(int)
+        with transaction.atomic():
+            # Bloqueia as linhas atuais: escritas concorrentes dessas clínicas aguardam a reconstrução
+            list(ContadorDiarioClinica.objects.select_for_update().filter(clinica_id__in=clinica_ids).values_list('pk'))
+            consultas = (
+                Consulta.objects.filter(clinica_id__in=clinica_ids)
+                .values_list('pk', 'medico_id', 'paciente_id', 'clinica_id', 'data_hora', 'status_atual')
+                .iterator(chunk_size=2_000)
+            )
+            for linha in consultas:
+                contabilizar(saldos, EstadoAgenda(*linha))
+
+            ContadorDiarioClinica.objects.filter(clinica_id__in=clinica_ids).delete()
+            ContadorDiarioClinica.objects.bulk_create([
+                ContadorDiarioClinica(clinica_id=clinica_id, dia=dia, status=status, total=saldo)
+                for (clinica_id, dia, status), saldo in saldos.items()
+                if saldo
+            ], batch_size=1_000)
+        return sum(1 for saldo in saldos.values() if saldo)
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinicas', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorDiarioClinica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('status', models.CharField(max_length=50)),
+                ('total', models.IntegerField(default=0)),
+                ('clinica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contadores_diarios', to='clinicas.clinica')),
+            ],
+            options={
+                'verbose_name': 'Contador Diário da Clínica',
+                'verbose_name_plural': 'Contadores Diários das Clínicas',
+                'constraints': [models.UniqueConstraint(fields=('clinica', 'dia', 'status'), name='contador_clinica_dia_status_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def preencher_contadores(apps, schema_editor):
+    # Sem este preenchimento os contadores começam zerados e os ajustes das
+    # escritas em consultas já existentes os deixariam negativos.
+    Consulta = apps.get_model('agendamentos', 'Consulta')
+    ContadorDiarioClinica = apps.get_model('clinicas', 'ContadorDiarioClinica')
+
+    totais = (
+        Consulta.objects.annotate(dia=TruncDate('data_hora'))
+        .values('clinica_id', 'dia', 'status_atual')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    ContadorDiarioClinica.objects.all().delete()
+    ContadorDiarioClinica.objects.bulk_create(
+        [
+            ContadorDiarioClinica(
+                clinica_id=linha['clinica_id'], dia=linha['dia'], status=linha['status_atual'], total=linha['total']
+            )
+            for linha in totais.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0009_atendimento_recepcao'),
+        ('clinicas', '0003_contadordiarioclinica'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
@@ -78,3 +78,22 @@ class Clinica(models.Model):
 
     def __str__(self):
         return self.nome_fantasia
+
+
+class ContadorDiarioClinica(models.Model):
+    """
+    Quantidade de consultas da clínica por dia e status, ajustada na mesma
+    transação de cada escrita de consulta (ver clinicas.contadores). Dashboards
+    e relatórios leem poucas linhas por dia em vez de varrer as consultas.
+    """
+    clinica = models.ForeignKey(Clinica, on_delete=models.CASCADE, related_name='contadores_diarios')
+    dia = models.DateField()
+    status = models.CharField(max_length=50)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = _("Contador Diário da Clínica")
+        verbose_name_plural = _("Contadores Diários das Clínicas")
+        constraints = [
+            models.UniqueConstraint(fields=['clinica', 'dia', 'status'], name='contador_clinica_dia_status_unico'),
+        ]
@@ -0,0 +1,11 @@
+# clinicas/signals.py
+from django.dispatch import receiver
+
+from agendamentos.signals import consultas_alteradas
+from .contadores import registrar_alteracoes
+
+
+@receiver(consultas_alteradas)
+def atualizar_contadores_diarios(sender, alteracoes, **kwargs):
+    """Ajusta os contadores diários das clínicas afetadas, na transação da escrita."""
+    registrar_alteracoes(alteracoes)
@@ -1,5 +1,15 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
-from .models import Estado, Cidade, TipoClinica, Clinica
+from .models import Estado, Cidade, TipoClinica, Clinica, ContadorDiarioClinica
+from agendamentos.models import Consulta
+from pacientes.models import Paciente
+
+User = get_user_model()
 
 class EstadoModelTest(TestCase):
     """Testes para o modelo Estado."""
@@ -62,3 +72,59 @@ class ClinicaModelTest(TestCase):
             tipo_clinica=self.tipo_clinica
         )
         self.assertEqual(clinica.logradouro, None)
+
+
+class ContadorDiarioClinicaTest(TestCase):
+    """Testes dos contadores diários de consultas por clínica e status."""
+    def setUp(self):
+        estado = Estado.objects.create(nome='Paraná', uf='PR')
+        cidade = Cidade.objects.create(nome='Curitiba', estado=estado)
+        tipo_clinica = TipoClinica.objects.create(descricao='Geral')
+        self.clinica = Clinica.objects.create(
+            nome_fantasia='Clínica Contadores', cidade=cidade, tipo_clinica=tipo_clinica, cnpj='11222333000153'
+        )
+        self.medico = User.objects.create_user(
+            cpf='70000000001', email='medico.contador@email.com', password='senha',
+            first_name='Dr.', last_name='Contador', user_type='MEDICO'
+        )
+        user_paciente = User.objects.create_user(
+            cpf='70000000002', email='paciente.contador@email.com', password='senha',
+            first_name='Paciente', last_name='Contador', user_type='PACIENTE'
+        )
+        self.paciente = Paciente.objects.create(user=user_paciente)
+        self.dia = datetime(2030, 3, 4, 9, 0)
+
+    def _contadores(self):
+        return {
+            (linha.dia.isoformat(), linha.status): linha.total
+            for linha in ContadorDiarioClinica.objects.exclude(total=0)
+        }
+
+    def _criar(self, data_hora):
+        return Consulta.objects.create(
+            paciente=self.paciente, medico=self.medico, clinica=self.clinica,
+            data_hora=data_hora, valor=Decimal('100.00')
+        )
+
+    def test_contadores_acompanham_as_consultas(self):
+        consulta = self._criar(self.dia)
+        self._criar(self.dia + timedelta(hours=1))
+        self.assertEqual(self._contadores(), {('2030-03-04', 'PENDENTE'): 2})
+
+        consulta.status_atual = 'CONFIRMADA'
+        consulta.data_hora = self.dia + timedelta(days=1)
+        consulta.save()
+        self.assertEqual(self._contadores(), {('2030-03-04', 'PENDENTE'): 1, ('2030-03-05', 'CONFIRMADA'): 1})
+
+        consulta.delete()
+        self.assertEqual(self._contadores(), {('2030-03-04', 'PENDENTE'): 1})
+
+    def test_comando_corrige_divergencias(self):
+        self._criar(self.dia)
+        ContadorDiarioClinica.objects.update(total=42)
+        ContadorDiarioClinica.objects.create(clinica=self.clinica, dia=self.dia.date(), status='CANCELADA', total=3)
+
+        saida = StringIO()
+        call_command('recalcular_contadores_clinica', '--lote', '1', stdout=saida)
+        self.assertEqual(self._contadores(), {('2030-03-04', 'PENDENTE'): 1})
+        self.assertIn('1 contador(es)', saida.getvalue())
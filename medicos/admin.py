@@ -1,7 +1,7 @@
 # medicos/admin.py (NOVA VERSÃO)
 
 from django.contrib import admin
-from .models import Medico, MedicoUser
+from .models import Medico, MedicoUser, HorarioTrabalho, AusenciaMedico
 from users.models import User
 
 class MedicoProfileInline(admin.StackedInline):
@@ -20,4 +20,15 @@ class MedicoUserAdmin(admin.ModelAdmin):
 
     inlines = [MedicoProfileInline]
     list_display = ('email', 'get_full_name', 'is_active')
-    fields = ('first_name', 'last_name', 'cpf', 'email', 'password')
\ No newline at end of file
+    fields = ('first_name', 'last_name', 'cpf', 'email', 'password')
+
+@admin.register(HorarioTrabalho)
+class HorarioTrabalhoAdmin(admin.ModelAdmin):
+    list_display = ('medico', 'clinica', 'dia_semana', 'hora_inicio', 'hora_fim')
+    list_filter = ('dia_semana', 'clinica')
+
+
+@admin.register(AusenciaMedico)
+class AusenciaMedicoAdmin(admin.ModelAdmin):
+    list_display = ('medico', 'clinica', 'inicio', 'fim', 'motivo')
+    list_filter = ('clinica',)
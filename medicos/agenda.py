@@ -0,0 +1,72 @@
+# medicos/agenda.py
+"""
+Agenda mensal do médico, agrupada por dia para o calendário.
+
+O mês vira um intervalo semiaberto [primeiro dia, primeiro dia do mês seguinte),
+que usa o índice (medico, data_hora). O resultado agrupado e o seu ETag ficam em
+cache por médico/mês até que alguma consulta daquele médico/mês mude
+(ver `medicos.signals`).
+"""
+import hashlib
+import json
+from datetime import date, time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from agendamentos.disponibilidade import combinar
+from agendamentos.models import Consulta
+
+AGENDA_CACHE_TTL = 60 * 60
+
+
+def _chave(medico_id, ano, mes):
+    return f'agenda_medico:{medico_id}:{ano}-{mes:02d}'
+
+
+def intervalo_do_mes(ano, mes):
+    """Retorna (inicio, fim) do mês, com `fim` exclusivo."""
+    inicio = date(ano, mes, 1)
+    fim = date(ano + 1, 1, 1) if mes == 12 else date(ano, mes + 1, 1)
+    return combinar(inicio, time.min), combinar(fim, time.min)
+
+
+def agenda_do_mes(medico_id, ano, mes):
+    """
+    Retorna (agenda, etag), onde agenda é {'AAAA-MM-DD': [{id, horario, paciente}, ...]}.
+    """
+    chave = _chave(medico_id, ano, mes)
+    em_cache = cache.get(chave)
+    if em_cache is not None:
+        return em_cache['agenda'], em_cache['etag']
+
+    inicio, fim = intervalo_do_mes(ano, mes)
+    consultas = (
+        Consulta.objects
+        .filter(medico_id=medico_id, data_hora__gte=inicio, data_hora__lt=fim)
+        .select_related('paciente__user')
+        .order_by('data_hora')
+    )
+
+    agenda = {}
+    for consulta in consultas:
+        agenda.setdefault(consulta.data_hora.strftime('%Y-%m-%d'), []).append({
+            'id': consulta.id,
+            'horario': consulta.data_hora.strftime('%H:%M'),
+            'paciente': consulta.paciente.nome_completo,
+        })
+
+    etag = hashlib.md5(json.dumps(agenda, sort_keys=True).encode()).hexdigest()
+    cache.set(chave, {'agenda': agenda, 'etag': etag}, AGENDA_CACHE_TTL)
+    return agenda, etag
+
+
+def invalidar_agenda(meses):
+    """Descarta do cache as agendas dos trios (medico_id, ano, mes) informados."""
+    chaves = [_chave(*mes) for mes in meses]
+    if not chaves:
+        return
+    cache.delete_many(chaves)
+    # Repete após o commit: uma leitura concorrente pode ter recalculado o cache
+    # antes de a transação que alterou a agenda ser confirmada.
+    transaction.on_commit(lambda: cache.delete_many(chaves))
@@ -0,0 +1,75 @@
+# medicos/busca.py
+"""
+Busca no diretório de médicos por nome, CRM, especialidade, clínica e cidade.
+
+Cada médico guarda em `documento_busca` esses campos já normalizados (ver
+`atualizar_documentos`). O índice usado depende do banco (migração 0004):
+
+- SQLite: tabela FTS5 `medicos_medico_fts`, de conteúdo externo e mantida por
+  triggers, com índices de prefixo; ranking por bm25.
+- PostgreSQL: índice GIN `gin_trgm_ops` (extensão pg_trgm) sobre o documento;
+  ranking por similaridade de trigramas.
+- Demais bancos: `contains` sobre o documento, ordenado por nome.
+
+Atenção: em SQLite, migrações que recriam a tabela medicos_medico (ex.: alterar
+uma coluna) apagam os triggers; recrie-os como na migração 0004.
+"""
+from django.db import connection
+
+from .models import Medico, normalizar_nome
+
+TABELA_FTS = 'medicos_medico_fts'
+
+
+def montar_documento(medico, clinicas):
+    """Texto normalizado com tudo o que pode ser buscado de um médico."""
+    partes = [medico.user.get_full_name(), medico.crm, medico.especialidade, medico.get_especialidade_display()]
+    for clinica in clinicas:
+        partes += [clinica.nome_fantasia, clinica.cidade.nome, clinica.cidade.estado.uf]
+    return normalizar_nome(' '.join(str(parte) for parte in partes if parte))
+
+
+def atualizar_documentos(medico_ids):
+    """Recalcula nome_normalizado e documento_busca dos médicos informados, em lote."""
+    medicos = list(
+        Medico.objects.filter(pk__in=set(medico_ids))
+        .select_related('user')
+        .prefetch_related('clinicas__cidade__estado')
+    )
+    for medico in medicos:
+        medico.nome_normalizado = normalizar_nome(medico.user.get_full_name())
+        medico.documento_busca = montar_documento(medico, medico.clinicas.all())
+    Medico.objects.bulk_update(medicos, ['nome_normalizado', 'documento_busca'], batch_size=1000)
+
+
+def buscar(texto, queryset=None):
+    """
+    Filtra e ordena `queryset` (padrão: todos os médicos) pelos termos de
+    `texto`. Todos os termos precisam aparecer (como prefixo, no SQLite).
+    """
+    if queryset is None:
+        queryset = Medico.objects.all()
+    termos = normalizar_nome(texto.replace('"', ' ')).split()
+    if not termos:
+        return queryset.none()
+
+    if connection.vendor == 'sqlite':
+        consulta_fts = ' '.join(f'"{termo}"*' for termo in termos)
+        # extra(): o JOIN com a tabela FTS5 e o bm25 não têm equivalente no ORM
+        return queryset.extra(
+            tables=[TABELA_FTS],
+            where=[f'{TABELA_FTS}.rowid = medicos_medico.user_id', f'{TABELA_FTS} MATCH %s'],
+            params=[consulta_fts],
+            select={'relevancia': f'bm25({TABELA_FTS})'},
+        ).order_by('relevancia', 'nome_normalizado')
+
+    for termo in termos:
+        queryset = queryset.filter(documento_busca__contains=termo)
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        return queryset.annotate(
+            relevancia=TrigramWordSimilarity(' '.join(termos), 'documento_busca')
+        ).order_by('-relevancia', 'nome_normalizado')
+
+    return queryset.order_by('nome_normalizado')
@@ -0,0 +1,137 @@
+# medicos/calendario.py
+"""
+Feed iCalendar (.ics) da agenda do médico, para Google Agenda, Outlook etc.
+
+Esses clientes consultam o feed a cada poucos minutos. A versão do feed
+(ETag e Last-Modified) sai de um único agregado, max(data_atualizacao) e
+count, sobre a janela indexada (medico, data_hora); se nada mudou, a resposta
+é 304 sem montar nenhum evento. Quando muda, os eventos são gerados em
+streaming, direto do cursor.
+
+No modo de sincronização (`?sync=<token>`), só vêm os eventos alterados
+depois do token recebido na resposta anterior (cabeçalho `X-Sync-Token`).
+Cancelamentos chegam como STATUS:CANCELLED; consultas removidas só somem do
+feed completo.
+"""
+import hashlib
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from agendamentos.consts import JANELA_CONFLITO, STATUS_CONSULTA_CANCELADA, STATUS_CONSULTA_CONFIRMADA
+from agendamentos.models import Consulta
+
+# Janela publicada: um mês para trás e seis para frente
+CALENDARIO_DIAS_ANTES = 30
+CALENDARIO_DIAS_DEPOIS = 180
+
+CAMPOS_EVENTO = (
+    'id', 'data_hora', 'status_atual', 'data_atualizacao',
+    'paciente__user__first_name', 'paciente__user__last_name',
+    'clinica__nome_fantasia', 'clinica__logradouro', 'clinica__numero',
+)
+
+
+def janela(hoje=None):
+    """(inicio, fim) da janela publicada, com `fim` exclusivo."""
+    hoje = hoje or timezone.now().date()
+    inicio = datetime.combine(hoje - timedelta(days=CALENDARIO_DIAS_ANTES), time.min)
+    fim = datetime.combine(hoje + timedelta(days=CALENDARIO_DIAS_DEPOIS + 1), time.min)
+    if settings.USE_TZ:
+        return timezone.make_aware(inicio), timezone.make_aware(fim)
+    return inicio, fim
+
+
+def consultas_do_feed(medico_id, desde=None):
+    """Consultas do médico na janela (e alteradas depois de `desde`, no modo de sincronização)."""
+    inicio, fim = janela()
+    consultas = Consulta.objects.filter(medico_id=medico_id, data_hora__gte=inicio, data_hora__lt=fim)
+    if desde is not None:
+        consultas = consultas.filter(data_atualizacao__gt=desde)
+    return consultas
+
+
+def versao(consultas, *partes):
+    """
+    Retorna (etag, ultima_alteracao) das consultas com um único agregado.
+    O count faz o ETag mudar também quando uma consulta sai da janela.
+    """
+    resumo = consultas.aggregate(ultima=Max('data_atualizacao'), total=Count('id'))
+    bruto = '|'.join(str(parte) for parte in (*partes, resumo['ultima'], resumo['total']))
+    return hashlib.md5(bruto.encode()).hexdigest(), resumo['ultima']
+
+
+def _utc(valor):
+    if not timezone.is_aware(valor):
+        valor = timezone.make_aware(valor)
+    return valor.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _local(valor):
+    if timezone.is_aware(valor):
+        valor = timezone.localtime(valor)
+    return valor.strftime('%Y%m%dT%H%M%S')
+
+
+def _texto(valor):
+    """Escapa um valor de texto (RFC 5545, 3.3.11)."""
+    return (valor or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _linha(conteudo):
+    """Linha terminada em CRLF, dobrada a cada 75 octetos (RFC 5545, 3.1)."""
+    bruto = conteudo.encode()
+    if len(bruto) <= 75:
+        return conteudo + '\r\n'
+    partes, atual = [], b''
+    for caractere in conteudo:
+        codificado = caractere.encode()
+        if len(atual) + len(codificado) > (75 if not partes else 74):
+            partes.append(atual.decode())
+            atual = b''
+        atual += codificado
+    partes.append(atual.decode())
+    return '\r\n '.join(partes) + '\r\n'
+
+
+def _evento(linha):
+    (consulta_id, data_hora, status_atual, data_atualizacao,
+     nome, sobrenome, clinica, logradouro, numero) = linha
+    if status_atual == STATUS_CONSULTA_CANCELADA:
+        situacao = 'CANCELLED'
+    elif status_atual == STATUS_CONSULTA_CONFIRMADA:
+        situacao = 'CONFIRMED'
+    else:
+        situacao = 'TENTATIVE'
+    local = ', '.join(parte for parte in (clinica, logradouro, numero) if parte)
+    return ''.join(_linha(conteudo) for conteudo in (
+        'BEGIN:VEVENT',
+        f'UID:consulta-{consulta_id}@medlink',
+        f'DTSTAMP:{_utc(data_atualizacao)}',
+        f'LAST-MODIFIED:{_utc(data_atualizacao)}',
+        f'DTSTART;TZID={settings.TIME_ZONE}:{_local(data_hora)}',
+        f'DTEND;TZID={settings.TIME_ZONE}:{_local(data_hora + JANELA_CONFLITO)}',
+        f'SUMMARY:{_texto(f"Consulta - {nome} {sobrenome}".strip())}',
+        f'LOCATION:{_texto(local)}',
+        f'STATUS:{situacao}',
+        'END:VEVENT',
+    ))
+
+
+def gerar_ics(consultas, nome_calendario):
+    """Gera o .ics em pedaços, lendo as consultas do cursor em lotes."""
+    yield ''.join(_linha(conteudo) for conteudo in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//MedLink//Agenda do Medico//PT',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_texto(nome_calendario)}',
+        f'X-WR-TIMEZONE:{settings.TIME_ZONE}',
+    ))
+    linhas = consultas.order_by('data_hora').values_list(*CAMPOS_EVENTO).iterator(chunk_size=500)
+    for linha in linhas:
+        yield _evento(linha)
+    yield _linha('END:VCALENDAR')
@@ -0,0 +1,52 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from agendamentos.models import Consulta, EstadoAgenda
+from medicos.models import Medico, UtilizacaoSemanal
+from medicos.utilizacao import contabilizar, saldo_zerado
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstrói os consolidados semanais de utilização (UtilizacaoSemanal) a partir '
+        'das consultas, um lote de médicos por transação. Use na implantação ou para '
+        'corrigir divergências; no dia a dia a tabela é mantida pelas escritas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=50, help='Quantidade de médicos reconstruídos por transação.')
+        parser.add_argument('--medico', type=int, action='append', help='Reconstrói apenas os médicos informados.')
+
+    def handle(self, *args, **options):
+        lote = max(1, options['lote'])
+        medico_ids = options['medico'] or list(
+            Medico.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        total = 0
+        for i in range(0, len(medico_ids), lote):
+            total += self._reconstruir(medico_ids[i:i + lote])
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} semana(s) de utilização reconstruída(s) para {len(medico_ids)} médico(s).'
+        ))
+
+    def _reconstruir(self, medico_ids):
+        saldos = defaultdict(saldo_zerado)
+        with transaction.atomic():
+            # Bloqueia as linhas atuais: escritas concorrentes desses médicos aguardam a reconstrução
+            list(UtilizacaoSemanal.objects.select_for_update().filter(medico_id__in=medico_ids).values_list('pk'))
+            consultas = (
+                Consulta.objects.filter(medico_id__in=medico_ids)
+                .values_list('pk', 'medico_id', 'paciente_id', 'clinica_id', 'data_hora', 'status_atual')
+                .iterator(chunk_size=2_000)
+            )
+            for linha in consultas:
+                contabilizar(saldos, EstadoAgenda(*linha))
+
+            UtilizacaoSemanal.objects.filter(medico_id__in=medico_ids).delete()
+            UtilizacaoSemanal.objects.bulk_create([
+                UtilizacaoSemanal(medico_id=medico_id, clinica_id=clinica_id, semana=semana, **saldo)
+                for (medico_id, clinica_id, semana), saldo in saldos.items()
+            ], batch_size=1_000)
+        return len(saldos)
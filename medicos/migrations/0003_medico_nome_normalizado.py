@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:17
+
+from django.conf import settings
+from django.db import migrations, models
+import unicodedata
+
+
+def preencher_nome_normalizado(apps, schema_editor):
+    # Cópia de medicos.models.normalizar_nome: migrações não devem depender do código atual
+    def normalizar(texto):
+        decomposto = unicodedata.normalize('NFKD', texto or '')
+        sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+        return ' '.join(sem_acentos.lower().split())
+
+    Medico = apps.get_model('medicos', 'Medico')
+    medicos = list(Medico.objects.select_related('user'))
+    for medico in medicos:
+        medico.nome_normalizado = normalizar(f"{medico.user.first_name} {medico.user.last_name}")
+    Medico.objects.bulk_update(medicos, ['nome_normalizado'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinicas', '0002_initial'),
+        ('medicos', '0002_remove_medico_clinica_medico_clinicas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medico',
+            name='nome_normalizado',
+            field=models.CharField(blank=True, default='', editable=False, max_length=300),
+        ),
+        migrations.RunPython(preencher_nome_normalizado, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='medico',
+            index=models.Index(fields=['especialidade', 'nome_normalizado'], name='medico_especialidade_nome_idx'),
+        ),
+    ]
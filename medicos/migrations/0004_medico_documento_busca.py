@@ -0,0 +1,88 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:20
+# Documento de busca dos médicos e o índice textual de cada banco (ver medicos/busca.py).
+
+import unicodedata
+
+from django.db import migrations, models
+
+TABELA_FTS = 'medicos_medico_fts'
+
+
+def _normalizar(texto):
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.lower().split())
+
+
+def preencher_documentos(apps, schema_editor):
+    Medico = apps.get_model('medicos', 'Medico')
+    medicos = list(Medico.objects.select_related('user').prefetch_related('clinicas__cidade__estado'))
+    for medico in medicos:
+        partes = [
+            medico.user.first_name, medico.user.last_name, medico.crm,
+            medico.especialidade, medico.get_especialidade_display(),
+        ]
+        for clinica in medico.clinicas.all():
+            partes += [clinica.nome_fantasia, clinica.cidade.nome, clinica.cidade.estado.uf]
+        medico.documento_busca = _normalizar(' '.join(str(parte) for parte in partes if parte))
+    Medico.objects.bulk_update(medicos, ['documento_busca'], batch_size=1000)
+
+
+def criar_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        # Conteúdo externo: o texto fica só em medicos_medico; os triggers mantêm o índice
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {TABELA_FTS} USING fts5("
+            "documento_busca, content='medicos_medico', content_rowid='user_id', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {TABELA_FTS}_ai AFTER INSERT ON medicos_medico BEGIN "
+            f"INSERT INTO {TABELA_FTS}(rowid, documento_busca) VALUES (new.user_id, new.documento_busca); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {TABELA_FTS}_ad AFTER DELETE ON medicos_medico BEGIN "
+            f"INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, documento_busca) "
+            f"VALUES ('delete', old.user_id, old.documento_busca); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {TABELA_FTS}_au AFTER UPDATE ON medicos_medico BEGIN "
+            f"INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, documento_busca) "
+            f"VALUES ('delete', old.user_id, old.documento_busca); "
+            f"INSERT INTO {TABELA_FTS}(rowid, documento_busca) VALUES (new.user_id, new.documento_busca); END"
+        )
+        schema_editor.execute(f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('rebuild')")
+    elif vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            'CREATE INDEX medico_documento_trgm_idx ON medicos_medico '
+            'USING gin (documento_busca gin_trgm_ops)'
+        )
+
+
+def remover_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for sufixo in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {TABELA_FTS}_{sufixo}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABELA_FTS}')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS medico_documento_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicos', '0003_medico_nome_normalizado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medico',
+            name='documento_busca',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(preencher_documentos, migrations.RunPython.noop),
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinicas', '0002_initial'),
+        ('medicos', '0004_medico_documento_busca'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AusenciaMedico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField(verbose_name='Início')),
+                ('fim', models.DateTimeField(verbose_name='Fim')),
+                ('motivo', models.CharField(blank=True, max_length=255, verbose_name='Motivo')),
+                ('clinica', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clinicas.clinica')),
+                ('medico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ausencias', to='medicos.medico')),
+            ],
+            options={
+                'verbose_name': 'Ausência do Médico',
+                'verbose_name_plural': 'Ausências dos Médicos',
+                'ordering': ['inicio'],
+                'indexes': [models.Index(fields=['medico', 'inicio'], name='ausencia_medico_inicio_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('inicio__lt', models.F('fim'))), name='ausencia_intervalo_valido')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HorarioTrabalho',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.PositiveSmallIntegerField(choices=[(0, 'Segunda-feira'), (1, 'Terça-feira'), (2, 'Quarta-feira'), (3, 'Quinta-feira'), (4, 'Sexta-feira'), (5, 'Sábado'), (6, 'Domingo')], verbose_name='Dia da Semana')),
+                ('hora_inicio', models.TimeField(verbose_name='Início')),
+                ('hora_fim', models.TimeField(verbose_name='Fim')),
+                ('clinica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horarios_trabalho', to='clinicas.clinica')),
+                ('medico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horarios_trabalho', to='medicos.medico')),
+            ],
+            options={
+                'verbose_name': 'Horário de Trabalho',
+                'verbose_name_plural': 'Horários de Trabalho',
+                'ordering': ['dia_semana', 'hora_inicio'],
+                'constraints': [models.CheckConstraint(condition=models.Q(('hora_inicio__lt', models.F('hora_fim'))), name='horario_trabalho_intervalo_valido')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OcupacaoDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('disponivel', models.BinaryField(max_length=36)),
+                ('ocupado', models.BinaryField(max_length=36)),
+                ('medico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocupacao', to='medicos.medico')),
+            ],
+            options={
+                'verbose_name': 'Ocupação do Dia',
+                'verbose_name_plural': 'Ocupação dos Dias',
+                'constraints': [models.UniqueConstraint(fields=('medico', 'dia'), name='ocupacao_medico_dia_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinicas', '0002_initial'),
+        ('medicos', '0005_horarios_ausencias_ocupacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UtilizacaoSemanal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semana', models.DateField()),
+                ('agendadas', models.IntegerField(default=0)),
+                ('concluidas', models.IntegerField(default=0)),
+                ('canceladas', models.IntegerField(default=0)),
+                ('consultas_por_dia', models.JSONField(default=list)),
+                ('clinica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clinicas.clinica')),
+                ('medico', models.ForeignKey(limit_choices_to={'user_type': 'MEDICO'}, on_delete=django.db.models.deletion.CASCADE, related_name='utilizacao_semanal', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Utilização Semanal',
+                'verbose_name_plural': 'Utilização Semanal',
+                'indexes': [models.Index(fields=['clinica', 'semana'], name='utilizacao_clinica_semana_idx')],
+                'constraints': [models.UniqueConstraint(fields=('medico', 'clinica', 'semana'), name='utilizacao_medico_clinica_semana_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_vinculos(apps, schema_editor):
+    Medico = apps.get_model('medicos', 'Medico')
+    Consulta = apps.get_model('agendamentos', 'Consulta')
+    MedicoClinica = apps.get_model('medicos', 'MedicoClinica')
+
+    atribuidos = Medico.clinicas.through.objects.values_list('medico_id', 'clinica_id')
+    com_consultas = Consulta.objects.values_list('medico_id', 'clinica_id').distinct()
+    MedicoClinica.objects.bulk_create(
+        [MedicoClinica(medico_id=m, clinica_id=c, origem='ATRIBUIDO') for m, c in atribuidos]
+        + [MedicoClinica(medico_id=m, clinica_id=c, origem='CONSULTAS') for m, c in com_consultas],
+        batch_size=1000, ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0008_chaveidempotencia'),
+        ('clinicas', '0002_initial'),
+        ('medicos', '0006_utilizacaosemanal'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicoClinica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origem', models.CharField(choices=[('ATRIBUIDO', 'Atribuído'), ('CONSULTAS', 'Possui consultas')], max_length=20)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('clinica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vinculos_medicos', to='clinicas.clinica')),
+                ('medico', models.ForeignKey(limit_choices_to={'user_type': 'MEDICO'}, on_delete=django.db.models.deletion.CASCADE, related_name='vinculos_clinica', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Vínculo Médico-Clínica',
+                'verbose_name_plural': 'Vínculos Médico-Clínica',
+                'constraints': [models.UniqueConstraint(fields=('clinica', 'medico', 'origem'), name='medico_clinica_origem_unico')],
+            },
+        ),
+        migrations.RunPython(preencher_vinculos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:33
+
+import django.db.models.deletion
+import medicos.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicos', '0007_medicoclinica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarioMedico',
+            fields=[
+                ('medico', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='calendario', serialize=False, to='medicos.medico')),
+                ('token', models.CharField(default=medicos.models.gerar_token_calendario, max_length=64, unique=True)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Calendário do Médico',
+                'verbose_name_plural': 'Calendários dos Médicos',
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def preencher_utilizacao(apps, schema_editor):
+    # Sem este preenchimento os consolidados começam zerados e os ajustes das
+    # escritas em consultas já existentes os deixariam negativos.
+    Consulta = apps.get_model('agendamentos', 'Consulta')
+    UtilizacaoSemanal = apps.get_model('medicos', 'UtilizacaoSemanal')
+
+    totais = (
+        Consulta.objects.annotate(dia=TruncDate('data_hora'))
+        .values('medico_id', 'clinica_id', 'dia', 'status_atual')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    saldos = defaultdict(
+        lambda: {'agendadas': 0, 'concluidas': 0, 'canceladas': 0, 'consultas_por_dia': [0] * 7}
+    )
+    for linha in totais.iterator():
+        dia, total = linha['dia'], linha['total']
+        saldo = saldos[(linha['medico_id'], linha['clinica_id'], dia - timedelta(days=dia.weekday()))]
+        if linha['status_atual'] == 'CANCELADA':
+            saldo['canceladas'] += total
+            continue
+        saldo['agendadas'] += total
+        saldo['consultas_por_dia'][dia.weekday()] += total
+        if linha['status_atual'] == 'CONCLUIDA':
+            saldo['concluidas'] += total
+
+    UtilizacaoSemanal.objects.all().delete()
+    UtilizacaoSemanal.objects.bulk_create(
+        [
+            UtilizacaoSemanal(medico_id=medico_id, clinica_id=clinica_id, semana=semana, **saldo)
+            for (medico_id, clinica_id, semana), saldo in saldos.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0009_atendimento_recepcao'),
+        ('medicos', '0008_calendariomedico'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_utilizacao, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,17 @@ from django.conf import settings
 from clinicas.models import Clinica
 from users.models import User
 from django.utils.translation import gettext_lazy as _
+import functools
+import secrets
+import unicodedata
+
+
+def normalizar_nome(texto):
+    """Minúsculas, sem acentos e com espaços simples: 'José  Álvares' -> 'jose alvares'."""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.lower().split())
+
 
 class MedicoManager(models.Manager):
     """Normaliza clinica/clinicas/clinica_id/clinicaId e aplica no M2M após criar."""
@@ -32,6 +43,16 @@ class MedicoManager(models.Manager):
             instance.clinicas.set(Clinica.objects.filter(id__in=collected))
         return instance
 
+    def por_nome(self, nome, especialidade=None):
+        """
+        Médicos cujo nome completo normalizado é exatamente `nome` (acentos e
+        maiúsculas não importam). Usa o índice (especialidade, nome_normalizado).
+        """
+        filtro = {'nome_normalizado': normalizar_nome(nome)}
+        if especialidade is not None:
+            filtro['especialidade'] = especialidade
+        return self.filter(**filtro)
+
 class Medico(models.Model):
     """
     Modelo de Perfil para o Médico, ligado ao modelo User principal.
@@ -74,20 +95,210 @@ class Medico(models.Model):
     # Campo para data de nascimento, opcional.
     data_nascimento = models.DateField(_("Data de Nascimento"), null=True, blank=True)
 
+    # Nome completo do usuário normalizado (ver normalizar_nome), mantido no
+    # save() e quando o User muda (medicos.signals). Indexado com a especialidade
+    # para a busca do médico pelo nome na marcação feita pelo paciente.
+    nome_normalizado = models.CharField(max_length=300, blank=True, editable=False, default='')
+    # Nome, CRM, especialidade, clínicas e cidades normalizados, para a busca
+    # do diretório (medicos.busca). Mantido pelos sinais de medicos.signals.
+    documento_busca = models.TextField(blank=True, editable=False, default='')
+
     objects = MedicoManager()  # <<< usa o manager que normaliza clinicas
 
     class Meta:
         verbose_name = "Médico"
         verbose_name_plural = "Médicos"
         ordering = ['user__first_name', 'user__last_name']
+        indexes = [
+            models.Index(fields=['especialidade', 'nome_normalizado'], name='medico_especialidade_nome_idx'),
+        ]
 
     def __str__(self):
         return f"Dr(a). {self.user.get_full_name()} (CRM: {self.crm})"
+
+    def save(self, *args, **kwargs):
+        self.nome_normalizado = normalizar_nome(self.user.get_full_name())
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'nome_normalizado' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'nome_normalizado']
+        super().save(*args, **kwargs)
     
 
+@functools.lru_cache(maxsize=None)
+def _especialidades_por_nome():
+    # Montado na primeira chamada: os rótulos traduzíveis não podem ser lidos na importação
+    return {
+        normalizar_nome(str(nome)): chave
+        for chave, rotulo in Medico.EspecialidadeChoices.choices
+        for nome in (chave, rotulo)
+    }
+
+
+def especialidade_por_nome(texto):
+    """Converte 'Cardiologia', 'cardiologia' ou 'CARDIOLOGIA' na chave da especialidade (ou None)."""
+    return _especialidades_por_nome().get(normalizar_nome(texto))
+
+
 class MedicoUser(User):
     """Modelo Proxy para tratar utilizadores do tipo Médico no admin."""
     class Meta:
         proxy = True
         verbose_name = 'Médico (Utilizador)'
-        verbose_name_plural = 'Médicos (Utilizadores)'
\ No newline at end of file
+        verbose_name_plural = 'Médicos (Utilizadores)'
+
+class HorarioTrabalho(models.Model):
+    """
+    Faixa semanal de atendimento do médico numa clínica (ex.: segundas, 08:00 às 12:00).
+    Médicos sem nenhuma faixa cadastrada seguem o expediente padrão da agenda.
+    """
+    class DiaSemana(models.IntegerChoices):
+        SEGUNDA = 0, _('Segunda-feira')
+        TERCA = 1, _('Terça-feira')
+        QUARTA = 2, _('Quarta-feira')
+        QUINTA = 3, _('Quinta-feira')
+        SEXTA = 4, _('Sexta-feira')
+        SABADO = 5, _('Sábado')
+        DOMINGO = 6, _('Domingo')
+
+    medico = models.ForeignKey(Medico, on_delete=models.CASCADE, related_name='horarios_trabalho')
+    clinica = models.ForeignKey(Clinica, on_delete=models.CASCADE, related_name='horarios_trabalho')
+    dia_semana = models.PositiveSmallIntegerField(_("Dia da Semana"), choices=DiaSemana.choices)
+    hora_inicio = models.TimeField(_("Início"))
+    hora_fim = models.TimeField(_("Fim"))
+
+    class Meta:
+        verbose_name = "Horário de Trabalho"
+        verbose_name_plural = "Horários de Trabalho"
+        ordering = ['dia_semana', 'hora_inicio']
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(hora_inicio__lt=models.F('hora_fim')), name='horario_trabalho_intervalo_valido'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_dia_semana_display()} {self.hora_inicio:%H:%M}-{self.hora_fim:%H:%M} ({self.medico_id})"
+
+
+class AusenciaMedico(models.Model):
+    """
+    Período em que o médico não atende (férias, congresso...). Sem clínica, vale para todas.
+    """
+    medico = models.ForeignKey(Medico, on_delete=models.CASCADE, related_name='ausencias')
+    clinica = models.ForeignKey(Clinica, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    inicio = models.DateTimeField(_("Início"))
+    fim = models.DateTimeField(_("Fim"))
+    motivo = models.CharField(_("Motivo"), max_length=255, blank=True)
+
+    class Meta:
+        verbose_name = "Ausência do Médico"
+        verbose_name_plural = "Ausências dos Médicos"
+        ordering = ['inicio']
+        indexes = [
+            models.Index(fields=['medico', 'inicio'], name='ausencia_medico_inicio_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(inicio__lt=models.F('fim')), name='ausencia_intervalo_valido'),
+        ]
+
+    def __str__(self):
+        return f"Ausência de {self.medico_id}: {self.inicio:%d/%m/%Y %H:%M} a {self.fim:%d/%m/%Y %H:%M}"
+
+
+class OcupacaoDia(models.Model):
+    """
+    Mapas de bits de um dia da agenda do médico, em fatias de 5 minutos
+    (ver medicos.ocupacao). Montado na primeira leitura do dia e mantido a
+    cada alteração de consulta.
+    """
+    medico = models.ForeignKey(Medico, on_delete=models.CASCADE, related_name='ocupacao')
+    dia = models.DateField()
+    # Fatias em que o médico atende (horário de trabalho menos ausências)
+    disponivel = models.BinaryField(max_length=36)
+    # Fatias cobertas por consultas ativas
+    ocupado = models.BinaryField(max_length=36)
+
+    class Meta:
+        verbose_name = "Ocupação do Dia"
+        verbose_name_plural = "Ocupação dos Dias"
+        constraints = [
+            models.UniqueConstraint(fields=['medico', 'dia'], name='ocupacao_medico_dia_unica'),
+        ]
+
+
+class UtilizacaoSemanal(models.Model):
+    """
+    Consolidado semanal da agenda de um médico numa clínica, mantido a cada
+    alteração de consulta (ver medicos.utilizacao). Os indicadores do painel
+    leem uma linha por semana em vez de varrer as consultas.
+    """
+    medico = models.ForeignKey(
+        User, on_delete=models.CASCADE, limit_choices_to={'user_type': 'MEDICO'}, related_name='utilizacao_semanal'
+    )
+    clinica = models.ForeignKey(Clinica, on_delete=models.CASCADE, related_name='+')
+    # Segunda-feira da semana ISO
+    semana = models.DateField()
+    # Consultas não canceladas (inclui as concluídas)
+    agendadas = models.IntegerField(default=0)
+    concluidas = models.IntegerField(default=0)
+    canceladas = models.IntegerField(default=0)
+    # Consultas não canceladas por dia da semana, de segunda (0) a domingo (6)
+    consultas_por_dia = models.JSONField(default=list)
+
+    class Meta:
+        verbose_name = "Utilização Semanal"
+        verbose_name_plural = "Utilização Semanal"
+        constraints = [
+            models.UniqueConstraint(fields=['medico', 'clinica', 'semana'], name='utilizacao_medico_clinica_semana_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['clinica', 'semana'], name='utilizacao_clinica_semana_idx'),
+        ]
+
+
+class MedicoClinica(models.Model):
+    """
+    Vínculo materializado entre médico e clínica, com a origem: atribuído
+    pelo cadastro (M2M `Medico.clinicas`) ou por ter consultas na clínica.
+    Mantido pelos sinais de medicos.signals; a listagem de médicos da clínica
+    lê só o índice (clinica, medico).
+    """
+    class Origem(models.TextChoices):
+        ATRIBUIDO = 'ATRIBUIDO', _('Atribuído')
+        CONSULTAS = 'CONSULTAS', _('Possui consultas')
+
+    medico = models.ForeignKey(
+        User, on_delete=models.CASCADE, limit_choices_to={'user_type': 'MEDICO'}, related_name='vinculos_clinica'
+    )
+    clinica = models.ForeignKey(Clinica, on_delete=models.CASCADE, related_name='vinculos_medicos')
+    origem = models.CharField(max_length=20, choices=Origem.choices)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Vínculo Médico-Clínica"
+        verbose_name_plural = "Vínculos Médico-Clínica"
+        constraints = [
+            models.UniqueConstraint(fields=['clinica', 'medico', 'origem'], name='medico_clinica_origem_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.medico_id} @ {self.clinica_id} ({self.origem})"
+
+
+def gerar_token_calendario():
+    return secrets.token_urlsafe(32)
+
+
+class CalendarioMedico(models.Model):
+    """
+    Token secreto da URL do feed .ics do médico (ver medicos.calendario). Os
+    clientes de calendário não enviam credenciais: quem tem a URL lê a agenda,
+    por isso o médico pode gerar um novo token a qualquer momento.
+    """
+    medico = models.OneToOneField(Medico, on_delete=models.CASCADE, primary_key=True, related_name='calendario')
+    token = models.CharField(max_length=64, unique=True, default=gerar_token_calendario)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Calendário do Médico"
+        verbose_name_plural = "Calendários dos Médicos"
@@ -0,0 +1,298 @@
+# medicos/ocupacao.py
+"""
+Mapas de bits da agenda de cada médico/dia.
+
+O dia é dividido em fatias de 5 minutos (288 bits, 36 bytes). `OcupacaoDia`
+guarda dois mapas:
+
+- disponivel: fatias dentro do horário de trabalho (`HorarioTrabalho`), menos
+  as ausências (`AusenciaMedico`). Médicos sem nenhuma faixa cadastrada usam o
+  expediente padrão (HORARIO_EXPEDIENTE_INICIO a HORARIO_EXPEDIENTE_FIM).
+- ocupado: fatias cobertas por consultas ativas (cada uma ocupa JANELA_CONFLITO).
+
+As linhas são montadas na primeira leitura do dia (ou na primeira escrita que
+o afeta) e, a partir daí, mantidas incrementalmente a cada consulta criada,
+remarcada ou cancelada (ver `medicos.signals`). Mudanças de horário de trabalho ou de ausência descartam as
+linhas afetadas, que são remontadas na leitura seguinte.
+
+"Este horário está livre?" e "primeiro horário livre" viram operações de bits.
+A verificação de conflito da marcação continua no banco, sob o bloqueio da
+agenda: os mapas atendem às leituras.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from agendamentos.consts import (
+    JANELA_CONFLITO, INTERVALO_HORARIOS, STATUS_CONSULTA_CANCELADA,
+    HORARIO_EXPEDIENTE_INICIO, HORARIO_EXPEDIENTE_FIM, DISPONIBILIDADE_MAX_DIAS,
+)
+from agendamentos.models import Consulta
+from .models import Medico, HorarioTrabalho, AusenciaMedico, OcupacaoDia
+
+FATIA = timedelta(minutes=5)
+FATIAS_POR_DIA = timedelta(days=1) // FATIA
+BYTES_POR_DIA = FATIAS_POR_DIA // 8
+FATIAS_CONSULTA = -(-JANELA_CONFLITO // FATIA)
+FATIAS_INTERVALO = INTERVALO_HORARIOS // FATIA
+
+
+def para_bits(valor):
+    # BinaryField pode vir como memoryview (PostgreSQL)
+    return int.from_bytes(bytes(valor or b''), 'little')
+
+
+def para_bytes(bits):
+    return bits.to_bytes(BYTES_POR_DIA, 'little')
+
+
+def _mascara(inicio, fim):
+    """Bits das fatias [inicio, fim)."""
+    if fim <= inicio:
+        return 0
+    return ((1 << (fim - inicio)) - 1) << inicio
+
+
+def _local(data_hora):
+    """Data/hora local sem fuso, para o cálculo das fatias."""
+    if timezone.is_aware(data_hora):
+        return timezone.localtime(data_hora).replace(tzinfo=None)
+    return data_hora
+
+
+def _limite(dia):
+    """Início do dia, no formato usado nas consultas ao banco."""
+    valor = datetime.combine(dia, time.min)
+    return timezone.make_aware(valor) if settings.USE_TZ else valor
+
+
+def _fatia(momento, dia, arredondar_para_cima=False):
+    """Índice da fatia de `momento` (naive) contado a partir do início de `dia`."""
+    fatias, resto = divmod(momento - datetime.combine(dia, time.min), FATIA)
+    return fatias + (1 if arredondar_para_cima and resto else 0)
+
+
+def mascara_periodo(dia, inicio, fim):
+    """Fatias de `dia` tocadas pelo período [inicio, fim)."""
+    inicio = max(_fatia(_local(inicio), dia), 0)
+    fim = min(_fatia(_local(fim), dia, arredondar_para_cima=True), FATIAS_POR_DIA)
+    return _mascara(inicio, fim)
+
+
+def fatias_da_consulta(data_hora):
+    """Pares (dia, máscara) ocupados por uma consulta; perto da meia-noite, ocupa também o dia seguinte."""
+    data_hora = _local(data_hora)
+    dia = data_hora.date()
+    inicio = _fatia(data_hora, dia)
+    fim = _fatia(data_hora + JANELA_CONFLITO, dia, arredondar_para_cima=True)
+    yield dia, _mascara(inicio, min(fim, FATIAS_POR_DIA))
+    if fim > FATIAS_POR_DIA:
+        yield dia + timedelta(days=1), _mascara(0, fim - FATIAS_POR_DIA)
+
+
+def mascara_disponivel(dia, horarios, ausencias):
+    """
+    Fatias em que o médico atende no dia: as faixas do dia da semana (ou o
+    expediente padrão, se `horarios` estiver vazio) menos as ausências da
+    própria clínica ou de todas.
+    """
+    if horarios:
+        faixas = [
+            (h.clinica_id, h.hora_inicio, h.hora_fim) for h in horarios if h.dia_semana == dia.weekday()
+        ]
+    else:
+        faixas = [(None, HORARIO_EXPEDIENTE_INICIO, HORARIO_EXPEDIENTE_FIM)]
+
+    bits = 0
+    for clinica_id, hora_inicio, hora_fim in faixas:
+        mascara = mascara_periodo(dia, datetime.combine(dia, hora_inicio), datetime.combine(dia, hora_fim))
+        for ausencia in ausencias:
+            if ausencia.clinica_id is None or clinica_id is None or ausencia.clinica_id == clinica_id:
+                mascara &= ~mascara_periodo(dia, ausencia.inicio, ausencia.fim)
+        bits |= mascara
+    return bits
+
+
+def _montar(pares):
+    """Monta os mapas dos pares (medico_id, dia) com três consultas, qualquer que seja a quantidade."""
+    medico_ids = {medico_id for medico_id, _ in pares}
+    dias = {dia for _, dia in pares}
+    inicio, fim = _limite(min(dias)), _limite(max(dias) + timedelta(days=1))
+
+    horarios, ausencias = defaultdict(list), defaultdict(list)
+    for horario in HorarioTrabalho.objects.filter(medico_id__in=medico_ids):
+        horarios[horario.medico_id].append(horario)
+    for ausencia in AusenciaMedico.objects.filter(medico_id__in=medico_ids, inicio__lt=fim, fim__gt=inicio):
+        ausencias[ausencia.medico_id].append(ausencia)
+
+    ocupado = defaultdict(int)
+    consultas = (
+        Consulta.objects.ativas()
+        .filter(medico_id__in=medico_ids, data_hora__gt=inicio - JANELA_CONFLITO, data_hora__lt=fim)
+        .values_list('medico_id', 'data_hora')
+    )
+    for medico_id, data_hora in consultas:
+        for dia, mascara in fatias_da_consulta(data_hora):
+            ocupado[(medico_id, dia)] |= mascara
+
+    return {
+        (medico_id, dia): (
+            mascara_disponivel(dia, horarios[medico_id], ausencias[medico_id]),
+            ocupado[(medico_id, dia)],
+        )
+        for medico_id, dia in pares
+    }
+
+
+def ocupacoes(pares):
+    """
+    Retorna {(medico_id, dia): (disponivel, ocupado)}, com os mapas como inteiros.
+    Os dias ainda não montados são montados juntos e gravados.
+    """
+    pares = set(pares)
+    if not pares:
+        return {}
+    linhas = OcupacaoDia.objects.filter(
+        medico_id__in={medico_id for medico_id, _ in pares}, dia__in={dia for _, dia in pares}
+    ).values_list('medico_id', 'dia', 'disponivel', 'ocupado')
+    resultado = {
+        (medico_id, dia): (para_bits(disponivel), para_bits(ocupado))
+        for medico_id, dia, disponivel, ocupado in linhas
+        if (medico_id, dia) in pares
+    }
+
+    faltantes = pares - resultado.keys()
+    if faltantes:
+        novos = _montar(faltantes)
+        # Outra leitura pode ter montado o mesmo dia ao mesmo tempo
+        OcupacaoDia.objects.bulk_create([
+            OcupacaoDia(medico_id=medico_id, dia=dia, disponivel=para_bytes(disponivel), ocupado=para_bytes(ocupado))
+            for (medico_id, dia), (disponivel, ocupado) in novos.items()
+        ], ignore_conflicts=True)
+        resultado.update(novos)
+    return resultado
+
+
+def livres(disponivel, ocupado):
+    """Fatias em que uma consulta pode começar: as JANELA_CONFLITO seguintes estão disponíveis e sem ocupação."""
+    bits = disponivel & ~ocupado
+    # Desloca e combina: sobra o bit i só se as fatias i .. i+FATIAS_CONSULTA-1 estiverem livres
+    inicio = bits
+    for deslocamento in range(1, FATIAS_CONSULTA):
+        inicio &= bits >> deslocamento
+    return inicio
+
+
+def horarios_do_dia(dia, disponivel, ocupado):
+    """Horários de início livres no dia, de INTERVALO_HORARIOS em INTERVALO_HORARIOS."""
+    bits = livres(disponivel, ocupado)
+    return [
+        datetime.combine(dia, time.min) + fatia * FATIA
+        for fatia in range(0, FATIAS_POR_DIA, FATIAS_INTERVALO)
+        if bits >> fatia & 1
+    ]
+
+
+def horario_livre(medico_id, data_hora):
+    """True se uma consulta pode começar em `data_hora` pelos mapas do médico."""
+    data_hora = _local(data_hora)
+    dia = data_hora.date()
+    fatia, resto = divmod(data_hora - datetime.combine(dia, time.min), FATIA)
+    if resto:
+        return False
+    disponivel, ocupado = ocupacoes([(medico_id, dia)])[(medico_id, dia)]
+    return bool(livres(disponivel, ocupado) >> fatia & 1)
+
+
+def primeiro_horario_livre(medico_id, a_partir_de, dias=DISPONIBILIDADE_MAX_DIAS):
+    """
+    Primeiro horário livre (na grade de INTERVALO_HORARIOS) a partir de
+    `a_partir_de`, procurando nos `dias` seguintes; None se não houver.
+    """
+    a_partir_de = _local(a_partir_de)
+    primeiro_dia = a_partir_de.date()
+    todos = [primeiro_dia + timedelta(days=i) for i in range(dias)]
+    mapas = ocupacoes((medico_id, dia) for dia in todos)
+    for dia in todos:
+        for horario in horarios_do_dia(dia, *mapas[(medico_id, dia)]):
+            if horario >= a_partir_de:
+                return timezone.make_aware(horario) if settings.USE_TZ else horario
+    return None
+
+
+def _ocupa(estado):
+    return estado is not None and estado.data_hora is not None and estado.status_atual != STATUS_CONSULTA_CANCELADA
+
+
+def aplicar_alteracoes(alteracoes):
+    """
+    Atualiza os mapas com as alterações (antes, depois) de `consultas_alteradas`,
+    dentro da transação da escrita. Dias ainda não montados são montados aqui
+    mesmo: uma leitura concorrente poderia gravá-los a partir de um retrato
+    anterior à escrita, e a linha ficaria desatualizada.
+    """
+    limpar, marcar = defaultdict(int), defaultdict(int)
+    for antes, depois in alteracoes:
+        if _ocupa(antes) and _ocupa(depois) and (antes.medico_id, antes.data_hora) == (depois.medico_id, depois.data_hora):
+            continue  # ex.: confirmação; o horário ocupado não muda
+        if _ocupa(antes):
+            for dia, mascara in fatias_da_consulta(antes.data_hora):
+                limpar[(antes.medico_id, dia)] |= mascara
+        if _ocupa(depois):
+            for dia, mascara in fatias_da_consulta(depois.data_hora):
+                marcar[(depois.medico_id, dia)] |= mascara
+
+    pares = limpar.keys() | marcar.keys()
+    if not pares:
+        return
+    with transaction.atomic():
+        linhas = _bloquear(pares)
+        faltantes = pares - {(linha.medico_id, linha.dia) for linha in linhas}
+        if faltantes:
+            # Só médicos com perfil têm mapas
+            com_perfil = set(
+                Medico.objects.filter(pk__in={medico_id for medico_id, _ in faltantes}).values_list('pk', flat=True)
+            )
+            faltantes = {par for par in faltantes if par[0] in com_perfil}
+        if faltantes:
+            # Montados já com a escrita; se uma leitura gravou o dia antes,
+            # a linha dela é mantida e recebe os ajustes abaixo.
+            OcupacaoDia.objects.bulk_create([
+                OcupacaoDia(medico_id=medico_id, dia=dia, disponivel=para_bytes(disponivel), ocupado=para_bytes(ocupado))
+                for (medico_id, dia), (disponivel, ocupado) in _montar(faltantes).items()
+            ], ignore_conflicts=True)
+            linhas += _bloquear(faltantes)
+
+        alteradas = []
+        for linha in linhas:
+            par = (linha.medico_id, linha.dia)
+            atual = para_bits(linha.ocupado)
+            novo = (atual & ~limpar[par]) | marcar[par]
+            if novo != atual:
+                linha.ocupado = para_bytes(novo)
+                alteradas.append(linha)
+        OcupacaoDia.objects.bulk_update(alteradas, ['ocupado'])
+
+
+def _bloquear(pares):
+    """Linhas existentes dos pares (medico_id, dia), bloqueadas até o fim da transação."""
+    linhas = OcupacaoDia.objects.select_for_update().filter(
+        medico_id__in={medico_id for medico_id, _ in pares}, dia__in={dia for _, dia in pares}
+    )
+    return [linha for linha in linhas if (linha.medico_id, linha.dia) in pares]
+
+
+def descartar(medico_id, inicio=None, fim=None):
+    """
+    Remove as linhas do médico (todas, ou só as dos dias entre `inicio` e
+    `fim`) para que sejam remontadas. Retorna os pares (medico_id, dia) removidos.
+    """
+    linhas = OcupacaoDia.objects.filter(medico_id=medico_id)
+    if inicio is not None:
+        linhas = linhas.filter(dia__gte=_local(inicio).date(), dia__lte=_local(fim).date())
+    dias = list(linhas.values_list('dia', flat=True))
+    linhas.delete()
+    return [(medico_id, dia) for dia in dias]
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from users.models import User
 from clinicas.models import Clinica
-from .models import Medico
+from .models import Medico, HorarioTrabalho, AusenciaMedico
 
 # Serializer auxiliar para os dados do usuário
 class UserForDoctorSerializer(serializers.ModelSerializer):
@@ -61,4 +61,40 @@ class MedicoSerializer(serializers.ModelSerializer):
         instance = super().update(instance, validated_data)
         if clinica_ids:
             instance.clinicas.set(Clinica.objects.filter(id__in=clinica_ids))
-        return instance
\ No newline at end of file
+        return instance
+
+class MedicoBuscaSerializer(MedicoSerializer):
+    """Resultado da busca do diretório: dados do médico e onde ele atende."""
+    clinicas = serializers.SerializerMethodField()
+
+    class Meta(MedicoSerializer.Meta):
+        fields = MedicoSerializer.Meta.fields + ['clinicas']
+
+    def get_clinicas(self, obj):
+        # Usa o prefetch de clinicas__cidade feito pela view
+        return [
+            {'id': clinica.id, 'nome': clinica.nome_fantasia, 'cidade': clinica.cidade.nome}
+            for clinica in obj.clinicas.all()
+        ]
+
+
+class HorarioTrabalhoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = HorarioTrabalho
+        fields = ['id', 'clinica', 'dia_semana', 'hora_inicio', 'hora_fim']
+
+    def validate(self, data):
+        if data['hora_inicio'] >= data['hora_fim']:
+            raise serializers.ValidationError("O horário de início deve ser anterior ao de fim.")
+        return data
+
+
+class AusenciaMedicoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AusenciaMedico
+        fields = ['id', 'clinica', 'inicio', 'fim', 'motivo']
+
+    def validate(self, data):
+        if data['inicio'] >= data['fim']:
+            raise serializers.ValidationError("O início da ausência deve ser anterior ao fim.")
+        return data
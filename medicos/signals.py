@@ -0,0 +1,162 @@
+# medicos/signals.py
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from agendamentos.disponibilidade import invalidar_disponibilidade
+from agendamentos.models import Consulta
+from agendamentos.signals import consultas_alteradas
+from clinicas.models import Clinica
+from users.models import User
+from .agenda import invalidar_agenda
+from .busca import atualizar_documentos
+from .models import Medico, HorarioTrabalho, AusenciaMedico, MedicoClinica
+from .ocupacao import aplicar_alteracoes, descartar
+from .utilizacao import registrar_alteracoes
+
+
+@receiver(consultas_alteradas)
+def invalidar_agenda_mensal(sender, alteracoes, **kwargs):
+    """Descarta as agendas mensais em cache dos médicos/meses afetados."""
+    afetados = set()
+    for antes, depois in alteracoes:
+        for estado in (antes, depois):
+            if estado is not None and estado.data_hora is not None:
+                afetados.add((estado.medico_id, estado.data_hora.year, estado.data_hora.month))
+    invalidar_agenda(afetados)
+
+
+@receiver(consultas_alteradas)
+def atualizar_mapas_ocupacao(sender, alteracoes, **kwargs):
+    """Aplica as consultas criadas, remarcadas ou canceladas aos mapas de bits já montados."""
+    aplicar_alteracoes(alteracoes)
+
+
+@receiver(consultas_alteradas)
+def atualizar_utilizacao_semanal(sender, alteracoes, **kwargs):
+    """Ajusta os consolidados semanais de utilização dos médicos afetados."""
+    registrar_alteracoes(alteracoes)
+
+
+@receiver([post_save, post_delete], sender=HorarioTrabalho)
+def descartar_ocupacao_horario(sender, instance, **kwargs):
+    """O horário de trabalho vale para todas as semanas: remonta todos os dias do médico."""
+    invalidar_disponibilidade(descartar(instance.medico_id))
+
+
+@receiver(post_init, sender=AusenciaMedico)
+def guardar_periodo_ausencia(sender, instance, **kwargs):
+    instance._periodo_original = (instance.inicio, instance.fim) if instance.pk else None
+
+
+@receiver([post_save, post_delete], sender=AusenciaMedico)
+def descartar_ocupacao_ausencia(sender, instance, **kwargs):
+    """Remonta só os dias cobertos pela ausência (antes e depois de editada)."""
+    for periodo in filter(None, [(instance.inicio, instance.fim), instance._periodo_original]):
+        invalidar_disponibilidade(descartar(instance.medico_id, *periodo))
+    instance._periodo_original = (instance.inicio, instance.fim)
+
+
+@receiver(post_save, sender=User)
+def atualizar_nome_normalizado(sender, instance, update_fields=None, **kwargs):
+    """Mantém nome_normalizado e documento_busca em dia quando o nome do usuário muda."""
+    if instance.user_type != 'MEDICO':
+        return
+    if update_fields is not None and not {'first_name', 'last_name'} & set(update_fields):
+        return  # ex.: login, que só grava last_login
+    atualizar_documentos([instance.pk])
+
+
+@receiver(post_save, sender=Medico)
+def atualizar_documento_medico(sender, instance, raw=False, **kwargs):
+    if not raw:
+        atualizar_documentos([instance.pk])
+
+
+@receiver(m2m_changed, sender=Medico.clinicas.through)
+def atualizar_documento_clinicas_medico(sender, instance, action, reverse, pk_set, **kwargs):
+    """Vínculos médico-clínica mudaram, por qualquer um dos lados do M2M."""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            atualizar_documentos([instance.pk])
+        return
+    # clinica.medicos.clear() não informa pk_set: guarda os médicos antes de limpar
+    if action == 'pre_clear':
+        instance._medicos_antes_de_limpar = list(instance.medicos.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        atualizar_documentos(getattr(instance, '_medicos_antes_de_limpar', []))
+    elif action in ('post_add', 'post_remove'):
+        atualizar_documentos(pk_set or [])
+
+
+@receiver(m2m_changed, sender=Medico.clinicas.through)
+def sincronizar_vinculos_atribuidos(sender, instance, action, reverse, pk_set, **kwargs):
+    """Espelha o M2M `Medico.clinicas` nos vínculos de origem ATRIBUIDO."""
+    atribuidos = MedicoClinica.objects.filter(origem=MedicoClinica.Origem.ATRIBUIDO)
+    if action == 'post_clear':
+        atribuidos.filter(**{'clinica_id' if reverse else 'medico_id': instance.pk}).delete()
+        return
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    pares = [(medico_id, instance.pk) for medico_id in pk_set] if reverse else [(instance.pk, c) for c in pk_set]
+    if action == 'post_add':
+        MedicoClinica.objects.bulk_create([
+            MedicoClinica(medico_id=medico_id, clinica_id=clinica_id, origem=MedicoClinica.Origem.ATRIBUIDO)
+            for medico_id, clinica_id in pares
+        ], ignore_conflicts=True)
+    else:
+        atribuidos.filter(
+            medico_id__in={medico_id for medico_id, _ in pares}, clinica_id__in={c for _, c in pares}
+        ).delete()
+
+
+@receiver(consultas_alteradas)
+def sincronizar_vinculos_pelas_consultas(sender, alteracoes, **kwargs):
+    """
+    Mantém os vínculos de origem CONSULTAS: a primeira consulta do médico numa
+    clínica cria o vínculo, e ele sai quando a última é removida ou levada
+    para outra clínica (ou outro médico).
+    """
+    entradas, saidas = set(), set()
+    for antes, depois in alteracoes:
+        par_antes = (antes.medico_id, antes.clinica_id) if antes is not None else None
+        par_depois = (depois.medico_id, depois.clinica_id) if depois is not None else None
+        if par_antes == par_depois:
+            continue
+        if par_depois is not None:
+            entradas.add(par_depois)
+        if par_antes is not None:
+            saidas.add(par_antes)
+    saidas -= entradas
+    pares = entradas | saidas
+    if not pares:
+        return
+
+    vinculos = MedicoClinica.objects.filter(origem=MedicoClinica.Origem.CONSULTAS)
+    with transaction.atomic():
+        # Bloqueia os vínculos dos pares: marcações e remoções do mesmo par
+        # passam uma de cada vez, e a verificação abaixo vê a outra já confirmada.
+        existentes = {
+            par for par in vinculos.select_for_update().filter(
+                medico_id__in={medico_id for medico_id, _ in pares}, clinica_id__in={c for _, c in pares}
+            ).values_list('medico_id', 'clinica_id')
+            if par in pares
+        }
+        if entradas - existentes:
+            MedicoClinica.objects.bulk_create([
+                MedicoClinica(medico_id=medico_id, clinica_id=clinica_id, origem=MedicoClinica.Origem.CONSULTAS)
+                for medico_id, clinica_id in entradas - existentes
+            ], ignore_conflicts=True)
+        vazios = [
+            (medico_id, clinica_id) for medico_id, clinica_id in saidas & existentes
+            if not Consulta.objects.filter(medico_id=medico_id, clinica_id=clinica_id).exists()
+        ]
+        for medico_id, clinica_id in vazios:
+            vinculos.filter(medico_id=medico_id, clinica_id=clinica_id).delete()
+
+
+@receiver(post_save, sender=Clinica)
+def atualizar_documento_medicos_da_clinica(sender, instance, created, raw=False, **kwargs):
+    """Nome fantasia ou cidade da clínica fazem parte do documento dos seus médicos."""
+    if not created and not raw:
+        atualizar_documentos(instance.medicos.values_list('pk', flat=True))
@@ -7,14 +7,25 @@ from rest_framework import status
 from django.urls import reverse
 from django.utils import timezone
 from decimal import Decimal
+from datetime import datetime, time, timedelta
+from django.core.cache import cache
+from django.core.management import call_command
+from io import StringIO
 
 # Importa os modelos e serializers que vamos testar
-from .models import Medico
+from .models import (
+    Medico, MedicoClinica, HorarioTrabalho, AusenciaMedico, OcupacaoDia, UtilizacaoSemanal, CalendarioMedico,
+)
+from .ocupacao import ocupacoes, horarios_do_dia, horario_livre, primeiro_horario_livre
 from .serializers import MedicoSerializer
 from pacientes.models import Paciente
+from secretarias.models import Secretaria
 from agendamentos.models import Consulta, ConsultaStatusLog
 from clinicas.models import Clinica, Cidade, Estado, TipoClinica
-from agendamentos.consts import STATUS_CONSULTA_REAGENDAMENTO_SOLICITADO
+from agendamentos.consts import (
+    STATUS_CONSULTA_REAGENDAMENTO_SOLICITADO, STATUS_CONSULTA_CANCELADA, STATUS_CONSULTA_CONFIRMADA,
+    STATUS_CONSULTA_CONCLUIDA,
+)
 
 # Pega o modelo de User customizado (definido em settings.py)
 User = get_user_model()
@@ -313,4 +324,524 @@ class MedicoAPIsTest(APITestCase):
         response = self.client.patch(url)
         
         # A permissão IsMedicoUser barra a entrada antes da lógica da view
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class MedicoAgendaCacheTests(APITestCase):
+    """
+    Testes da agenda mensal (MedicoAgendaAPIView): intervalo do mês, cache e ETag.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user_paciente = User.objects.create_user(
+            cpf='11122233344', email='paciente.agenda@email.com', password='password123',
+            first_name='Paciente', last_name='Agenda', user_type='PACIENTE'
+        )
+        self.paciente = Paciente.objects.create(user=self.user_paciente)
+        self.user_medico = User.objects.create_user(
+            cpf='55566677788', email='medico.agenda@email.com', password='password123',
+            first_name='Dr.', last_name='Agenda', user_type='MEDICO'
+        )
+        Medico.objects.create(user=self.user_medico, crm='22222-TO')
+        estado = Estado.objects.create(nome="Tocantins", uf="TO")
+        cidade = Cidade.objects.create(nome="Palmas", estado=estado)
+        tipo_clinica = TipoClinica.objects.create(descricao="Geral")
+        self.clinica = Clinica.objects.create(
+            nome_fantasia="MedLink Testes", cidade=cidade, tipo_clinica=tipo_clinica, cnpj="11222333000144"
+        )
+        # Limites do mês: último horário de outubro e primeiro de novembro
+        for data_hora in (datetime(2025, 10, 31, 23, 30), datetime(2025, 11, 1, 0, 0)):
+            self._consulta(data_hora)
+
+        self.client.force_authenticate(user=self.user_medico)
+        self.url = reverse('medico-agenda') + '?year=2025&month=10'
+
+    def _consulta(self, data_hora):
+        return Consulta.objects.create(
+            paciente=self.paciente, medico=self.user_medico, clinica=self.clinica,
+            data_hora=data_hora, valor=Decimal('100.00')
+        )
+
+    def test_agenda_usa_intervalo_do_mes(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data.keys()), ['2025-10-31'])
+        self.assertEqual(response.data['2025-10-31'][0]['horario'], '23:30')
+
+    def test_etag_devolve_304_sem_consultar_o_banco(self):
+        primeira = self.client.get(self.url)
+        etag = primeira['ETag']
+
+        with self.assertNumQueries(0):
+            segunda = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(segunda.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(segunda['ETag'], etag)
+
+    def test_alteracao_invalida_o_cache(self):
+        etag = self.client.get(self.url)['ETag']
+        self._consulta(datetime(2025, 10, 10, 9, 0))
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data), 2)
+
+    def test_mes_invalido(self):
+        response = self.client.get(reverse('medico-agenda') + '?year=2025&month=13')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MedicoBuscaTests(APITestCase):
+    """
+    Testes da busca do diretório de médicos (MedicoBuscaView).
+    """
+
+    def setUp(self):
+        estado = Estado.objects.create(nome="Tocantins", uf="TO")
+        self.palmas = Cidade.objects.create(nome="Palmas", estado=estado)
+        araguaina = Cidade.objects.create(nome="Araguaína", estado=estado)
+        tipo_clinica = TipoClinica.objects.create(descricao="Geral")
+        self.clinica_palmas = Clinica.objects.create(
+            nome_fantasia="Clínica Coração", cidade=self.palmas, tipo_clinica=tipo_clinica, cnpj="11222333000144"
+        )
+        self.clinica_araguaina = Clinica.objects.create(
+            nome_fantasia="Saúde Norte", cidade=araguaina, tipo_clinica=tipo_clinica, cnpj="11222333000145"
+        )
+        self.joao = self._medico('10000000001', 'João', 'Silva', '12345-TO', 'CARDIOLOGIA', self.clinica_palmas)
+        self.joana = self._medico('10000000002', 'Joana', 'Souza', '54321-TO', 'PEDIATRIA', self.clinica_araguaina)
+        self.sergio = self._medico('10000000003', 'Sérgio', 'Joaquim', '99999-TO', 'CARDIOLOGIA', self.clinica_araguaina)
+
+        paciente = User.objects.create_user(
+            cpf='10000000009', email='paciente.busca@email.com', password='password123',
+            first_name='Paciente', last_name='Busca', user_type='PACIENTE'
+        )
+        self.client.force_authenticate(user=paciente)
+        self.url = reverse('medico-busca')
+
+    def _medico(self, cpf, nome, sobrenome, crm, especialidade, clinica):
+        user = User.objects.create_user(
+            cpf=cpf, email=f'{cpf}@email.com', password='password123',
+            first_name=nome, last_name=sobrenome, user_type='MEDICO'
+        )
+        medico = Medico.objects.create(user=user, crm=crm, especialidade=especialidade)
+        medico.clinicas.add(clinica)
+        return medico
+
+    def _ids(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [medico['id'] for medico in response.data['resultados']]
+
+    def test_busca_por_prefixo_sem_acentos(self):
+        self.assertEqual(self._ids(q='joao sil'), [self.joao.pk])
+        self.assertEqual(self._ids(q='SERG'), [self.sergio.pk])
+
+    def test_busca_por_crm_cidade_e_especialidade(self):
+        self.assertEqual(self._ids(q='54321'), [self.joana.pk])
+        self.assertCountEqual(self._ids(q='araguaina'), [self.joana.pk, self.sergio.pk])
+        self.assertEqual(self._ids(q='cardio', clinica=self.clinica_palmas.pk), [self.joao.pk])
+        self.assertEqual(self._ids(q='jo', especialidade='Pediatria'), [self.joana.pk])
+
+    def test_documento_acompanha_nome_e_clinicas(self):
+        self.joana.user.first_name = 'Mariana'
+        self.joana.user.save()
+        self.joana.clinicas.add(self.clinica_palmas)
+        self.clinica_palmas.nome_fantasia = 'Instituto Vida'
+        self.clinica_palmas.save()
+
+        self.assertEqual(self._ids(q='mariana'), [self.joana.pk])
+        self.assertCountEqual(self._ids(q='instituto vida'), [self.joao.pk, self.joana.pk])
+        self.clinica_palmas.medicos.clear()
+        self.assertEqual(self._ids(q='instituto'), [])
+
+    def test_paginacao(self):
+        primeira = self.client.get(self.url, {'q': 'to', 'limite': 2})
+        self.assertEqual(len(primeira.data['resultados']), 2)
+        self.assertEqual(primeira.data['proximo_offset'], 2)
+
+        segunda = self.client.get(self.url, {'q': 'to', 'limite': 2, 'offset': 2})
+        self.assertEqual(len(segunda.data['resultados']), 1)
+        self.assertIsNone(segunda.data['proximo_offset'])
+
+    def test_busca_sem_texto(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OcupacaoTests(APITestCase):
+    """
+    Testes dos horários de trabalho, ausências e mapas de ocupação (medicos.ocupacao).
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user_paciente = User.objects.create_user(
+            cpf='20000000001', email='paciente.ocupacao@email.com', password='password123',
+            first_name='Paciente', last_name='Ocupação', user_type='PACIENTE'
+        )
+        self.paciente = Paciente.objects.create(user=self.user_paciente)
+        self.user_medico = User.objects.create_user(
+            cpf='20000000002', email='medico.ocupacao@email.com', password='password123',
+            first_name='Dr.', last_name='Ocupação', user_type='MEDICO'
+        )
+        self.medico = Medico.objects.create(user=self.user_medico, crm='33333-TO')
+        estado = Estado.objects.create(nome="Tocantins", uf="TO")
+        cidade = Cidade.objects.create(nome="Palmas", estado=estado)
+        tipo_clinica = TipoClinica.objects.create(descricao="Geral")
+        self.clinica = Clinica.objects.create(
+            nome_fantasia="MedLink Ocupação", cidade=cidade, tipo_clinica=tipo_clinica, cnpj="11222333000146"
+        )
+        self.medico.clinicas.add(self.clinica)
+        # Uma segunda-feira futura
+        hoje = timezone.now().date()
+        self.dia = hoje + timedelta(days=7 - hoje.weekday() + 7)
+
+    def _horarios(self):
+        disponivel, ocupado = ocupacoes([(self.medico.pk, self.dia)])[(self.medico.pk, self.dia)]
+        return [h.strftime('%H:%M') for h in horarios_do_dia(self.dia, disponivel, ocupado)]
+
+    def _consulta(self, hora, minuto=0):
+        return Consulta.objects.create(
+            paciente=self.paciente, medico=self.user_medico, clinica=self.clinica,
+            data_hora=datetime.combine(self.dia, time(hora, minuto)), valor=Decimal('100.00')
+        )
+
+    def test_sem_horario_cadastrado_usa_expediente_padrao(self):
+        horarios = self._horarios()
+        self.assertEqual((horarios[0], horarios[-1]), ('08:00', '17:30'))
+
+    def test_horario_de_trabalho_e_ausencia(self):
+        HorarioTrabalho.objects.create(
+            medico=self.medico, clinica=self.clinica, dia_semana=0, hora_inicio=time(13, 0), hora_fim=time(16, 0)
+        )
+        AusenciaMedico.objects.create(
+            medico=self.medico, inicio=datetime.combine(self.dia, time(14, 0)),
+            fim=datetime.combine(self.dia, time(14, 45))
+        )
+        self.assertEqual(self._horarios(), ['13:00', '13:30', '15:00', '15:30'])
+        # Terça-feira: sem faixa cadastrada, o médico não atende
+        terca = self.dia + timedelta(days=1)
+        self.assertEqual(horarios_do_dia(terca, *ocupacoes([(self.medico.pk, terca)])[(self.medico.pk, terca)]), [])
+
+    def test_mapa_atualizado_a_cada_consulta(self):
+        self._horarios()  # monta o dia
+        consulta = self._consulta(9, 15)
+
+        with self.assertNumQueries(1):
+            horarios = self._horarios()
+        self.assertNotIn('09:00', horarios)
+        self.assertNotIn('09:30', horarios)
+        self.assertFalse(horario_livre(self.medico.pk, datetime.combine(self.dia, time(9, 15))))
+
+        consulta.status_atual = STATUS_CONSULTA_CANCELADA
+        consulta.save()
+        self.assertIn('09:00', self._horarios())
+        self.assertEqual(OcupacaoDia.objects.count(), 1)
+
+    def test_escrita_monta_o_dia_ainda_sem_mapa(self):
+        self._consulta(9, 0)
+        self.assertEqual(OcupacaoDia.objects.count(), 1)
+
+        # Leitura concorrente gravando o dia a partir de um retrato anterior à
+        # marcação: a linha montada pela escrita prevalece
+        OcupacaoDia.objects.bulk_create([
+            OcupacaoDia(medico=self.medico, dia=self.dia, disponivel=b'\xff' * 36, ocupado=bytes(36))
+        ], ignore_conflicts=True)
+        self.assertNotIn('09:00', self._horarios())
+
+    def test_primeiro_horario_livre(self):
+        self._consulta(8, 0)
+        self._consulta(8, 30)
+        inicio = datetime.combine(self.dia, time(7, 0))
+        self.assertEqual(primeiro_horario_livre(self.medico.pk, inicio), datetime.combine(self.dia, time(9, 0)))
+
+    def test_cadastro_de_horario_remonta_o_dia(self):
+        self._horarios()
+        self.client.force_authenticate(user=self.user_medico)
+        response = self.client.post(reverse('medico-horarios'), {
+            'clinica': self.clinica.pk, 'dia_semana': 0, 'hora_inicio': '10:00', 'hora_fim': '11:00',
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._horarios(), ['10:00', '10:30'])
+
+    def test_horario_invalido(self):
+        self.client.force_authenticate(user=self.user_medico)
+        response = self.client.post(reverse('medico-horarios'), {
+            'clinica': self.clinica.pk, 'dia_semana': 0, 'hora_inicio': '11:00', 'hora_fim': '10:00',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class UtilizacaoSemanalTests(APITestCase):
+    """
+    Testes dos consolidados semanais de utilização (medicos.utilizacao).
+    """
+
+    def setUp(self):
+        self.user_paciente = User.objects.create_user(
+            cpf='30000000001', email='paciente.utilizacao@email.com', password='password123',
+            first_name='Paciente', last_name='Utilização', user_type='PACIENTE'
+        )
+        self.paciente = Paciente.objects.create(user=self.user_paciente)
+        self.user_medico = User.objects.create_user(
+            cpf='30000000002', email='medico.utilizacao@email.com', password='password123',
+            first_name='Dr.', last_name='Utilização', user_type='MEDICO'
+        )
+        self.medico = Medico.objects.create(user=self.user_medico, crm='44444-TO')
+        estado = Estado.objects.create(nome="Tocantins", uf="TO")
+        cidade = Cidade.objects.create(nome="Palmas", estado=estado)
+        tipo_clinica = TipoClinica.objects.create(descricao="Geral")
+        self.clinica = Clinica.objects.create(
+            nome_fantasia="MedLink Utilização", cidade=cidade, tipo_clinica=tipo_clinica, cnpj="11222333000147"
+        )
+        # Segundas, das 08:00 às 12:00: 240 minutos por semana
+        HorarioTrabalho.objects.create(
+            medico=self.medico, clinica=self.clinica, dia_semana=0, hora_inicio=time(8, 0), hora_fim=time(12, 0)
+        )
+        hoje = timezone.now().date()
+        self.segunda = hoje - timedelta(days=hoje.weekday()) - timedelta(weeks=2)
+        self.admin = User.objects.create_superuser(
+            cpf='30000000009', email='admin.utilizacao@email.com', password='password123',
+            first_name='Admin', last_name='Utilização'
+        )
+
+    def _consulta(self, hora, status_atual):
+        consulta = Consulta.objects.create(
+            paciente=self.paciente, medico=self.user_medico, clinica=self.clinica,
+            data_hora=datetime.combine(self.segunda, time(hora, 0)), valor=Decimal('100.00')
+        )
+        consulta.status_atual = status_atual
+        consulta.save()
+        return consulta
+
+    def _semana(self):
+        return UtilizacaoSemanal.objects.get(medico=self.user_medico, clinica=self.clinica, semana=self.segunda)
+
+    def test_contadores_acompanham_as_escritas(self):
+        self._consulta(8, STATUS_CONSULTA_CONCLUIDA)
+        self._consulta(9, STATUS_CONSULTA_CONFIRMADA)
+        self._consulta(10, STATUS_CONSULTA_CANCELADA)
+
+        semana = self._semana()
+        self.assertEqual((semana.agendadas, semana.concluidas, semana.canceladas), (2, 1, 1))
+        self.assertEqual(semana.consultas_por_dia, [2, 0, 0, 0, 0, 0, 0])
+
+    def test_recalculo_reconstroi_a_tabela(self):
+        self._consulta(8, STATUS_CONSULTA_CONCLUIDA)
+        self._consulta(9, STATUS_CONSULTA_CANCELADA)
+        UtilizacaoSemanal.objects.update(agendadas=99)
+
+        call_command('recalcular_utilizacao', '--lote', '1', stdout=StringIO())
+
+        semana = self._semana()
+        self.assertEqual((semana.agendadas, semana.concluidas, semana.canceladas), (1, 1, 1))
+
+    def test_indicadores_do_painel(self):
+        self._consulta(8, STATUS_CONSULTA_CONCLUIDA)
+        self._consulta(9, STATUS_CONSULTA_CONFIRMADA)
+        self.client.force_authenticate(user=self.admin)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('admin-utilizacao-medicos'), {
+                'clinica': self.clinica.pk, 'semanas': 4, 'ate': self.segunda.isoformat(),
+            })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        [semana] = response.data['resultados']
+        self.assertEqual(semana['minutos_disponiveis'], 240)
+        self.assertEqual(semana['taxa_ocupacao'], 0.25)
+        self.assertEqual(semana['taxa_faltas'], 0.5)
+        self.assertEqual(semana['carga_media_diaria'], 2)
+
+
+class MedicoClinicaTests(APITestCase):
+    """
+    Testes dos vínculos materializados médico-clínica e da listagem da secretária.
+    """
+
+    def setUp(self):
+        estado = Estado.objects.create(nome="Tocantins", uf="TO")
+        cidade = Cidade.objects.create(nome="Palmas", estado=estado)
+        tipo_clinica = TipoClinica.objects.create(descricao="Geral")
+        self.clinica = Clinica.objects.create(
+            nome_fantasia="MedLink Vínculos", cidade=cidade, tipo_clinica=tipo_clinica, cnpj="11222333000148"
+        )
+        self.outra_clinica = Clinica.objects.create(
+            nome_fantasia="Outra Clínica", cidade=cidade, tipo_clinica=tipo_clinica, cnpj="11222333000149"
+        )
+        self.medicos = []
+        for i in range(3):
+            user = User.objects.create_user(
+                cpf=f'4000000000{i}', email=f'medico.vinculo{i}@email.com', password='password123',
+                first_name=f'Dr. {i}', last_name='Vínculo', user_type='MEDICO'
+            )
+            self.medicos.append(Medico.objects.create(user=user, crm=f'5555{i}-TO'))
+        user_paciente = User.objects.create_user(
+            cpf='40000000009', email='paciente.vinculo@email.com', password='password123',
+            first_name='Paciente', last_name='Vínculo', user_type='PACIENTE'
+        )
+        self.paciente = Paciente.objects.create(user=user_paciente)
+        self.user_secretaria = User.objects.create_user(
+            cpf='40000000008', email='secretaria.vinculo@email.com', password='password123',
+            first_name='Secretária', last_name='Vínculo', user_type='SECRETARIA'
+        )
+        Secretaria.objects.create(user=self.user_secretaria, clinica=self.clinica)
+
+    def _vinculos(self):
+        return set(MedicoClinica.objects.values_list('medico_id', 'clinica_id', 'origem'))
+
+    def test_vinculos_acompanham_o_m2m_e_as_consultas(self):
+        atribuido, com_consulta, _ = self.medicos
+        atribuido.clinicas.add(self.clinica)
+        Consulta.objects.create(
+            paciente=self.paciente, medico=com_consulta.user, clinica=self.clinica,
+            data_hora=datetime(2030, 1, 7, 9, 0), valor=Decimal('100.00')
+        )
+        self.assertEqual(self._vinculos(), {
+            (atribuido.pk, self.clinica.pk, 'ATRIBUIDO'),
+            (com_consulta.pk, self.clinica.pk, 'CONSULTAS'),
+        })
+
+        self.clinica.medicos.remove(atribuido)
+        self.assertEqual(self._vinculos(), {(com_consulta.pk, self.clinica.pk, 'CONSULTAS')})
+
+    def test_vinculo_sai_com_a_ultima_consulta_da_clinica(self):
+        medico = self.medicos[0]
+        primeira, segunda = [
+            Consulta.objects.create(
+                paciente=self.paciente, medico=medico.user, clinica=self.clinica,
+                data_hora=datetime(2030, 1, 7, 9 + i, 0), valor=Decimal('100.00')
+            )
+            for i in range(2)
+        ]
+
+        # Ainda resta uma consulta na clínica
+        primeira.delete()
+        self.assertEqual(self._vinculos(), {(medico.pk, self.clinica.pk, 'CONSULTAS')})
+
+        segunda.clinica = self.outra_clinica
+        segunda.save()
+        self.assertEqual(self._vinculos(), {(medico.pk, self.outra_clinica.pk, 'CONSULTAS')})
+
+        segunda.delete()
+        self.assertEqual(self._vinculos(), set())
+
+    def test_listagem_da_secretaria_sem_varrer_consultas(self):
+        atribuido, com_consulta, de_fora = self.medicos
+        atribuido.clinicas.add(self.clinica)
+        com_consulta.clinicas.add(self.clinica)
+        de_fora.clinicas.add(self.outra_clinica)
+        Consulta.objects.create(
+            paciente=self.paciente, medico=com_consulta.user, clinica=self.clinica,
+            data_hora=datetime(2030, 1, 7, 9, 0), valor=Decimal('100.00')
+        )
+        self.client.force_authenticate(user=self.user_secretaria)
+
+        # Só os médicos vinculados (o perfil da secretária já está em cache no usuário)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('medico-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([m['id'] for m in response.data], [atribuido.pk, com_consulta.pk])
+
+
+class CalendarioFeedTests(APITestCase):
+    """
+    Testes do feed .ics do médico: token, 304 por ETag e modo de sincronização.
+    """
+
+    def setUp(self):
+        estado = Estado.objects.create(nome="Acre", uf="AC")
+        cidade = Cidade.objects.create(nome="Rio Branco", estado=estado)
+        tipo_clinica = TipoClinica.objects.create(descricao="Geral")
+        self.clinica = Clinica.objects.create(
+            nome_fantasia="MedLink Agenda", cidade=cidade, tipo_clinica=tipo_clinica, cnpj="11222333000150"
+        )
+        self.user_medico = User.objects.create_user(
+            cpf='50000000001', email='medico.ics@email.com', password='password123',
+            first_name='Dr. Agenda', last_name='Externa', user_type='MEDICO'
+        )
+        self.medico = Medico.objects.create(user=self.user_medico, crm='66666-AC')
+        user_paciente = User.objects.create_user(
+            cpf='50000000002', email='paciente.ics@email.com', password='password123',
+            first_name='Paciente', last_name='Calendário', user_type='PACIENTE'
+        )
+        self.paciente = Paciente.objects.create(user=user_paciente)
+        amanha = datetime.combine(timezone.now().date() + timedelta(days=1), time(9, 0))
+        self.consultas = [
+            Consulta.objects.create(
+                paciente=self.paciente, medico=self.user_medico, clinica=self.clinica,
+                data_hora=amanha + timedelta(hours=i), valor=Decimal('100.00')
+            )
+            for i in range(2)
+        ]
+        # Fora da janela publicada
+        Consulta.objects.create(
+            paciente=self.paciente, medico=self.user_medico, clinica=self.clinica,
+            data_hora=amanha + timedelta(days=365), valor=Decimal('100.00')
+        )
+        self.calendario = CalendarioMedico.objects.create(medico=self.medico)
+        self.url = reverse('medico-calendario-feed', kwargs={'token': self.calendario.token})
+
+    def _ler(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_feed_completo_e_304_sem_gerar_eventos(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/calendar'))
+        corpo = self._ler(response)
+        self.assertTrue(corpo.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertEqual(corpo.count('BEGIN:VEVENT'), 2)
+        self.assertIn(f'UID:consulta-{self.consultas[0].pk}@medlink', corpo)
+        self.assertIn('Last-Modified', response)
+
+        # Token + agregado, e nada mais
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_alteracao_muda_o_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        consulta = self.consultas[0]
+        consulta.status_atual = STATUS_CONSULTA_CANCELADA
+        consulta.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('STATUS:CANCELLED', self._ler(response))
+
+    def test_sincronizacao_devolve_so_o_que_mudou(self):
+        Consulta.objects.filter(pk__in=[c.pk for c in self.consultas]).update(
+            data_atualizacao=datetime(2020, 1, 1, 12, 0)
+        )
+        sync = self.client.get(self.url)['X-Sync-Token']
+        consulta = self.consultas[1]
+        consulta.status_atual = STATUS_CONSULTA_CONFIRMADA
+        consulta.save()
+
+        response = self.client.get(self.url, {'sync': sync})
+        corpo = self._ler(response)
+        self.assertEqual(corpo.count('BEGIN:VEVENT'), 1)
+        self.assertIn(f'UID:consulta-{consulta.pk}@medlink', corpo)
+        self.assertIn('STATUS:CONFIRMED', corpo)
+        self.assertGreater(response['X-Sync-Token'], sync)
+
+        response = self.client.get(self.url, {'sync': 'ontem'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_novo_token_invalida_a_url_anterior(self):
+        self.client.force_authenticate(user=self.user_medico)
+        response = self.client.post(reverse('medico-calendario'))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(response.data['token'], self.calendario.token)
+        self.assertTrue(response.data['url'].endswith(f"{response.data['token']}.ics"))
+
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+        novo = reverse('medico-calendario-feed', kwargs={'token': response.data['token']})
+        self.assertEqual(self.client.get(novo).status_code, status.HTTP_200_OK)
@@ -1,7 +1,11 @@
 # medicos/urls.py (VERSÃO ATUALIZADA)
 
 from django.urls import path
-from .views import MedicoAgendaAPIView, SolicitarReagendamentoAPIView, MedicoListView
+from .views import (
+    MedicoAgendaAPIView, SolicitarReagendamentoAPIView, MedicoListView, MedicoBuscaView,
+    HorarioTrabalhoAPIView, AusenciaMedicoAPIView, ProximoHorarioLivreView,
+    CalendarioMedicoAPIView, CalendarioFeedView,
+)
 
 urlpatterns = [
     # 👇 ROTA NOVA ADICIONADA AQUI 👇
@@ -9,5 +13,13 @@ urlpatterns = [
 
     # Suas rotas existentes
     path('consultas/<int:pk>/solicitar-reagendamento/', SolicitarReagendamentoAPIView.as_view(), name='solicitar-reagendamento'),
+    path('horarios/', HorarioTrabalhoAPIView.as_view(), name='medico-horarios'),
+    path('horarios/<int:pk>/', HorarioTrabalhoAPIView.as_view(), name='medico-horarios-detail'),
+    path('ausencias/', AusenciaMedicoAPIView.as_view(), name='medico-ausencias'),
+    path('ausencias/<int:pk>/', AusenciaMedicoAPIView.as_view(), name='medico-ausencias-detail'),
+    path('<int:pk>/proximo-horario/', ProximoHorarioLivreView.as_view(), name='medico-proximo-horario'),
+    path('calendario/', CalendarioMedicoAPIView.as_view(), name='medico-calendario'),
+    path('calendario/<str:token>.ics', CalendarioFeedView.as_view(), name='medico-calendario-feed'),
+    path('busca/', MedicoBuscaView.as_view(), name='medico-busca'),
     path('', MedicoListView.as_view(), name='medico-list'),
 ]
\ No newline at end of file
@@ -0,0 +1,154 @@
+# medicos/utilizacao.py
+"""
+Indicadores semanais de utilização dos médicos (taxa de ocupação, taxa de
+faltas e carga média diária) por clínica.
+
+`UtilizacaoSemanal` guarda, por (médico, clínica, semana ISO), contadores que
+são ajustados a cada alteração de consulta: todos os caminhos de escrita
+(marcação, mudança de status, finalização, ações da secretária, lotes) enviam
+`consultas_alteradas`, e `registrar_alteracoes` aplica a diferença entre o
+antes e o depois. A leitura do painel custa uma linha por semana exibida.
+
+O comando `recalcular_utilizacao` reconstrói a tabela a partir das consultas.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from agendamentos.consts import JANELA_CONFLITO, STATUS_CONSULTA_CANCELADA, STATUS_CONSULTA_CONCLUIDA
+from .models import HorarioTrabalho, AusenciaMedico, UtilizacaoSemanal
+from .ocupacao import FATIA, mascara_disponivel
+
+CONTADORES = ('agendadas', 'concluidas', 'canceladas')
+
+
+def semana_de(dia):
+    """Segunda-feira da semana ISO de `dia`."""
+    return dia - timedelta(days=dia.weekday())
+
+
+def saldo_zerado():
+    return {'agendadas': 0, 'concluidas': 0, 'canceladas': 0, 'consultas_por_dia': [0] * 7}
+
+
+def contabilizar(saldos, estado, sinal=1):
+    """Soma (ou subtrai, com sinal=-1) a consulta `estado` nos saldos por (medico_id, clinica_id, semana)."""
+    if estado is None or estado.data_hora is None:
+        return
+    data_hora = estado.data_hora
+    dia = (timezone.localtime(data_hora) if timezone.is_aware(data_hora) else data_hora).date()
+    saldo = saldos[(estado.medico_id, estado.clinica_id, semana_de(dia))]
+    if estado.status_atual == STATUS_CONSULTA_CANCELADA:
+        saldo['canceladas'] += sinal
+        return
+    saldo['agendadas'] += sinal
+    saldo['consultas_por_dia'][dia.weekday()] += sinal
+    if estado.status_atual == STATUS_CONSULTA_CONCLUIDA:
+        saldo['concluidas'] += sinal
+
+
+def registrar_alteracoes(alteracoes):
+    """Aplica aos consolidados as alterações (antes, depois) de `consultas_alteradas`."""
+    saldos = defaultdict(saldo_zerado)
+    for antes, depois in alteracoes:
+        contabilizar(saldos, antes, -1)
+        contabilizar(saldos, depois)
+    # Ex.: uma confirmação não muda nenhum contador
+    saldos = {
+        chave: saldo for chave, saldo in saldos.items()
+        if any(saldo[campo] for campo in CONTADORES) or any(saldo['consultas_por_dia'])
+    }
+    if not saldos:
+        return
+
+    with transaction.atomic():
+        # Garante as linhas (concorrentes podem criá-las ao mesmo tempo) e as bloqueia
+        UtilizacaoSemanal.objects.bulk_create([
+            UtilizacaoSemanal(medico_id=medico_id, clinica_id=clinica_id, semana=semana, consultas_por_dia=[0] * 7)
+            for medico_id, clinica_id, semana in saldos
+        ], ignore_conflicts=True)
+        linhas = UtilizacaoSemanal.objects.select_for_update().filter(
+            medico_id__in={chave[0] for chave in saldos},
+            clinica_id__in={chave[1] for chave in saldos},
+            semana__in={chave[2] for chave in saldos},
+        )
+        alteradas = []
+        for linha in linhas:
+            saldo = saldos.get((linha.medico_id, linha.clinica_id, linha.semana))
+            if saldo is None:
+                continue
+            for campo in CONTADORES:
+                setattr(linha, campo, getattr(linha, campo) + saldo[campo])
+            por_dia = linha.consultas_por_dia or [0] * 7
+            linha.consultas_por_dia = [atual + delta for atual, delta in zip(por_dia, saldo['consultas_por_dia'])]
+            alteradas.append(linha)
+        UtilizacaoSemanal.objects.bulk_update(alteradas, [*CONTADORES, 'consultas_por_dia'])
+
+
+def _minutos_disponiveis(semana, clinica_id, horarios, ausencias):
+    """Minutos de atendimento do médico na clínica durante a semana (ver medicos.ocupacao)."""
+    if horarios:
+        horarios = [horario for horario in horarios if horario.clinica_id == clinica_id]
+        if not horarios:
+            return 0  # o médico tem horários, mas não nesta clínica
+    fatias = sum(
+        mascara_disponivel(semana + timedelta(days=i), horarios, ausencias).bit_count() for i in range(7)
+    )
+    return fatias * FATIA // timedelta(minutes=1)
+
+
+def indicadores(linhas, hoje=None):
+    """
+    Indicadores de cada linha de `UtilizacaoSemanal` (com `medico` carregado).
+    Lê os horários e ausências dos médicos envolvidos com duas consultas.
+
+    - taxa_ocupacao: minutos de consulta / minutos de atendimento previstos.
+    - taxa_faltas: consultas passadas e não concluídas / agendadas; só para
+      semanas já encerradas (antes disso, as consultas ainda podem acontecer).
+    - carga_media_diaria: consultas por dia com atendimento.
+    """
+    linhas = list(linhas)
+    if not linhas:
+        return []
+    hoje = hoje or timezone.now().date()
+    medico_ids = {linha.medico_id for linha in linhas}
+    inicio = min(linha.semana for linha in linhas)
+    fim = max(linha.semana for linha in linhas) + timedelta(days=7)
+
+    horarios, ausencias = defaultdict(list), defaultdict(list)
+    for horario in HorarioTrabalho.objects.filter(medico_id__in=medico_ids):
+        horarios[horario.medico_id].append(horario)
+    for ausencia in AusenciaMedico.objects.filter(medico_id__in=medico_ids, inicio__lt=fim, fim__gt=inicio):
+        ausencias[ausencia.medico_id].append(ausencia)
+
+    minutos_consulta = JANELA_CONFLITO // timedelta(minutes=1)
+    resultado = []
+    for linha in linhas:
+        disponiveis = _minutos_disponiveis(
+            linha.semana, linha.clinica_id, horarios[linha.medico_id], ausencias[linha.medico_id]
+        )
+        dias_com_consulta = sum(1 for total in linha.consultas_por_dia if total > 0)
+        encerrada = linha.semana + timedelta(days=7) <= hoje
+        resultado.append({
+            'medico': linha.medico_id,
+            'medico_nome': linha.medico.get_full_name(),
+            'clinica': linha.clinica_id,
+            'semana': '{0}-W{1:02d}'.format(*linha.semana.isocalendar()[:2]),
+            'agendadas': linha.agendadas,
+            'concluidas': linha.concluidas,
+            'canceladas': linha.canceladas,
+            'minutos_disponiveis': disponiveis,
+            'taxa_ocupacao': (
+                round(linha.agendadas * minutos_consulta / disponiveis, 4) if disponiveis else None
+            ),
+            'taxa_faltas': (
+                round((linha.agendadas - linha.concluidas) / linha.agendadas, 4)
+                if encerrada and linha.agendadas else None
+            ),
+            'carga_media_diaria': (
+                round(linha.agendadas / dias_com_consulta, 2) if dias_com_consulta else 0
+            ),
+        })
+    return resultado
@@ -4,16 +4,31 @@ from rest_framework.generics import ListAPIView, UpdateAPIView
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, AllowAny
 import logging
-from django.db.models import Q, Exists, OuterRef
+from django.db.models import Q
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
 
 from agendamentos.models import Consulta, ConsultaStatusLog
 from agendamentos.serializers import ConsultaSerializer
 from agendamentos.consts import STATUS_CONSULTA_REAGENDAMENTO_SOLICITADO # <-- Importação corrigida
 from users.permissions import IsMedicoUser
-from .models import Medico
-from .serializers import MedicoSerializer
+from .models import (
+    Medico, MedicoClinica, HorarioTrabalho, AusenciaMedico, CalendarioMedico, gerar_token_calendario,
+    especialidade_por_nome,
+)
+from .serializers import (
+    MedicoSerializer, MedicoBuscaSerializer, HorarioTrabalhoSerializer, AusenciaMedicoSerializer,
+)
+from .agenda import agenda_do_mes
+from .busca import buscar
+from .ocupacao import primeiro_horario_livre
+from .calendario import consultas_do_feed, versao, gerar_ics
 
 logger = logging.getLogger(__name__)
 
@@ -38,29 +53,200 @@ class MedicoAgendaAPIView(APIView):
                 {"error": "Os parâmetros 'year' e 'month' são obrigatórios e devem ser números."},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if not (1 <= month <= 12 and 1 <= year <= 9998):
+            return Response(
+                {"error": "Os parâmetros 'year' e 'month' devem formar um mês válido."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Consultas do mês agrupadas por dia (intervalo indexado + cache por médico/mês)
+        agenda_formatada, etag = agenda_do_mes(medico.pk, year, month)
+
+        # O calendário reenvia o ETag recebido: se nada mudou, responde 304 sem corpo
+        etag = quote_etag(etag)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(agenda_formatada, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class MedicoBuscaView(APIView):
+    """
+    Busca no diretório de médicos por nome, CRM, especialidade, clínica ou cidade,
+    sem diferenciar acentos e aceitando prefixos ("card", "joa silv").
+
+    GET /api/medicos/busca/?q=<texto>&especialidade=<chave>&clinica=<id>&limite=20&offset=0
+    """
+    permission_classes = [IsAuthenticated]
+    LIMITE_PADRAO = 20
+    LIMITE_MAXIMO = 50
+
+    def get(self, request, *args, **kwargs):
+        texto = (request.query_params.get('q') or '').strip()
+        if not texto:
+            return Response({"error": "Informe o texto da busca no parâmetro 'q'."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limite = int(request.query_params.get('limite', self.LIMITE_PADRAO))
+            offset = int(request.query_params.get('offset', 0))
+            clinica_id = request.query_params.get('clinica')
+            clinica_id = int(clinica_id) if clinica_id else None
+        except ValueError:
+            return Response(
+                {"error": "Os parâmetros 'limite', 'offset' e 'clinica' devem ser números."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limite = min(max(limite, 1), self.LIMITE_MAXIMO)
+        offset = max(offset, 0)
+
+        queryset = Medico.objects.all()
+        especialidade = request.query_params.get('especialidade')
+        if especialidade:
+            queryset = queryset.filter(especialidade=especialidade_por_nome(especialidade) or especialidade)
+        if clinica_id is not None:
+            queryset = queryset.filter(clinicas=clinica_id)
+
+        # Busca um a mais para saber se há próxima página sem fazer COUNT
+        medicos = list(
+            buscar(texto, queryset)
+            .select_related('user')
+            .prefetch_related('clinicas__cidade')[offset:offset + limite + 1]
+        )
+        proximo_offset = offset + limite if len(medicos) > limite else None
+        return Response({
+            'resultados': MedicoBuscaSerializer(medicos[:limite], many=True).data,
+            'proximo_offset': proximo_offset,
+        })
+
+
+class ExpedienteMedicoAPIView(APIView):
+    """
+    Base para os cadastros do expediente do médico logado: GET lista, POST
+    cria e DELETE em .../{id}/ remove. As subclasses definem o modelo e o serializer.
+    """
+    permission_classes = [IsAuthenticated, IsMedicoUser]
+    model = None
+    serializer_class = None
+
+    def get_queryset(self):
+        return self.model.objects.filter(medico_id=self.request.user.pk)
+
+    def get(self, request):
+        return Response(self.serializer_class(self.get_queryset(), many=True).data)
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        clinica = serializer.validated_data.get('clinica')
+        if clinica is not None and not request.user.perfil_medico.clinicas.filter(pk=clinica.pk).exists():
+            return Response({"error": "O médico não atende nesta clínica."}, status=status.HTTP_400_BAD_REQUEST)
+        serializer.save(medico_id=request.user.pk)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        # Filtra as consultas do médico para o mês e ano especificados
-        consultas_do_mes = Consulta.objects.filter(
-            medico=medico,
-            data_hora__year=year,
-            data_hora__month=month
-        ).select_related('paciente__user').order_by('data_hora')
-
-        # Agrupa as consultas por dia
-        agenda_formatada = {}
-        for consulta in consultas_do_mes:
-            dia = consulta.data_hora.strftime('%Y-%m-%d')
-            if dia not in agenda_formatada:
-                agenda_formatada[dia] = []
-            
-            # Adiciona um objeto simples para cada consulta
-            agenda_formatada[dia].append({
-                'id': consulta.id,
-                'horario': consulta.data_hora.strftime('%H:%M'),
-                'paciente': consulta.paciente.nome_completo, # Acessa a property do modelo
-            })
-            
-        return Response(agenda_formatada, status=status.HTTP_200_OK)
+    def delete(self, request, pk=None):
+        if pk is None:
+            return Response({"error": "A chave primária (pk) é necessária para esta operação."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        get_object_or_404(self.get_queryset(), pk=pk).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class HorarioTrabalhoAPIView(ExpedienteMedicoAPIView):
+    """Faixas semanais de atendimento do médico logado, por clínica."""
+    model = HorarioTrabalho
+    serializer_class = HorarioTrabalhoSerializer
+
+
+class AusenciaMedicoAPIView(ExpedienteMedicoAPIView):
+    """Férias e outras ausências do médico logado."""
+    model = AusenciaMedico
+    serializer_class = AusenciaMedicoSerializer
+
+
+class ProximoHorarioLivreView(APIView):
+    """
+    Primeiro horário livre do médico a partir de agora, pelos mapas de ocupação.
+    GET /api/medicos/{id}/proximo-horario/
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        medico = get_object_or_404(Medico, pk=pk)
+        horario = primeiro_horario_livre(medico.pk, timezone.now())
+        return Response({'medico': medico.pk, 'data_hora': horario})
+
+
+class CalendarioMedicoAPIView(APIView):
+    """
+    URL secreta do feed .ics do médico logado, para assinar no Google Agenda,
+    Outlook etc. GET devolve a URL (criando-a na primeira vez); POST gera um
+    novo token e invalida a URL anterior.
+    """
+    permission_classes = [IsAuthenticated, IsMedicoUser]
+
+    def _resposta(self, request, calendario, codigo=status.HTTP_200_OK):
+        url = reverse('medico-calendario-feed', kwargs={'token': calendario.token})
+        return Response({'token': calendario.token, 'url': request.build_absolute_uri(url)}, status=codigo)
+
+    def get(self, request):
+        calendario, _ = CalendarioMedico.objects.get_or_create(medico_id=request.user.pk)
+        return self._resposta(request, calendario)
+
+    def post(self, request):
+        calendario, criado = CalendarioMedico.objects.get_or_create(medico_id=request.user.pk)
+        if not criado:
+            calendario.token = gerar_token_calendario()
+            calendario.save(update_fields=['token'])
+        return self._resposta(request, calendario, status.HTTP_201_CREATED)
+
+
+class CalendarioFeedView(APIView):
+    """
+    Feed .ics da agenda do médico (ver medicos.calendario).
+    GET /api/medicos/calendario/<token>.ics[?sync=<X-Sync-Token anterior>]
+    O token da URL é a credencial: os clientes de calendário não fazem login.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request, token):
+        calendario = get_object_or_404(CalendarioMedico.objects.select_related('medico__user'), token=token)
+        desde = None
+        if request.query_params.get('sync'):
+            desde = parse_datetime(request.query_params['sync'])
+            if desde is None:
+                return Response({"error": "O parâmetro 'sync' é inválido."}, status=status.HTTP_400_BAD_REQUEST)
+
+        consultas = consultas_do_feed(calendario.medico_id, desde)
+        etag, ultima = versao(consultas, calendario.token, desde)
+        etag = quote_etag(etag)
+
+        # Nada mudou: 304 sem gerar nenhum evento
+        if request.headers.get('If-None-Match'):
+            nao_mudou = etag in parse_etags(request.headers['If-None-Match'])
+        else:
+            desde_cliente = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+            nao_mudou = bool(ultima and desde_cliente and int(self._timestamp(ultima)) <= desde_cliente)
+        if nao_mudou:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            nome = f"MedLink - {calendario.medico.user.get_full_name()}"
+            response = StreamingHttpResponse(gerar_ics(consultas, nome), content_type='text/calendar; charset=utf-8')
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        if ultima is not None:
+            response['Last-Modified'] = http_date(self._timestamp(ultima))
+        sync = ultima or desde
+        if sync is not None:
+            response['X-Sync-Token'] = sync.isoformat()
+        return response
+
+    @staticmethod
+    def _timestamp(valor):
+        return (valor if timezone.is_aware(valor) else timezone.make_aware(valor)).timestamp()
 
 
 # --- O RESTO DO FICHEIRO CONTINUA IGUAL ---
@@ -113,26 +299,16 @@ class MedicoListView(ListAPIView):
         user = self.request.user
 
         if user.user_type == 'SECRETARIA' and hasattr(user, 'perfil_secretaria'):
-            clinica = user.perfil_secretaria.clinica
-
-            # Fallback: inclui médicos que já possuem consultas nessa clínica,
-            # mesmo que o M2M `clinicas` ainda não esteja preenchido.
-            consultas_na_clinica = Exists(
-                Consulta.objects.filter(
-                    medico=OuterRef('user'),
-                    clinica=clinica,
-                )
-            )
+            clinica_id = user.perfil_secretaria.clinica_id
 
+            # Médicos atribuídos à clínica ou que já têm consultas nela, pelos
+            # vínculos materializados (índice clinica, medico): sem varrer as
+            # consultas nem precisar de DISTINCT.
+            vinculados = MedicoClinica.objects.filter(clinica_id=clinica_id).values('medico_id')
             return (
                 Medico.objects
-                .annotate(_has_consulta_na_clinica=consultas_na_clinica)
-                .filter(
-                    Q(clinicas=clinica) | Q(_has_consulta_na_clinica=True)
-                )
+                .filter(user_id__in=vinculados)
                 .select_related('user')
-                .prefetch_related('clinicas')
-                .distinct()
                 .order_by('user__first_name', 'user__last_name')
             )
 
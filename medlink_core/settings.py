@@ -104,6 +104,36 @@ DATABASES = {
     }
 }
 
+# Cache compartilhado entre os processos. Horários livres, agendas mensais,
+# pacientes do dia, filas da recepção e versões dos eventos são invalidados
+# pelas escritas: com um cache local por processo (LocMemCache), a invalidação
+# feita num worker do gunicorn não chega aos outros. Em produção, defina
+# REDIS_URL; sem ela, o cache local só é correto com um único processo
+# (runserver, testes).
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Em PostgreSQL, cria (via migração) restrições de exclusão que impedem no
+# próprio banco consultas sobrepostas do mesmo médico ou do mesmo paciente.
+# Requer a extensão btree_gist. Ignorado nos demais bancos.
+CONSULTA_RESTRICAO_SOBREPOSICAO = config('CONSULTA_RESTRICAO_SOBREPOSICAO', default=False, cast=bool)
+
+# Quando uma consulta é cancelada, a vaga é oferecida à lista de espera numa
+# thread em segundo plano (fora da requisição). Com False, roda logo após o commit.
+LISTA_ESPERA_ASSINCRONA = config('LISTA_ESPERA_ASSINCRONA', default=True, cast=bool)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
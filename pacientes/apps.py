@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PacientesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pacientes'
+
+    def ready(self):
+        # Importa os sinais para que eles sejam conectados quando a app for carregada.
+        import pacientes.signals
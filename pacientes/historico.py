@@ -0,0 +1,70 @@
+# pacientes/historico.py
+"""
+Histórico de consultas de um paciente, paginado por cursor (mais recentes
+primeiro, keyset em (data_hora, id) sobre o índice (paciente, data_hora)).
+
+Cada item é uma projeção enxuta via `.values()`: nada de instâncias nem de
+consultas extras por linha. O texto da anotação só é lido quando pedido, e
+só aparece nas consultas do próprio médico.
+
+Quem vê o quê:
+- Médico: as próprias consultas com o paciente; com `outros_medicos`, também
+  as de outros médicos nas clínicas às quais foi atribuído (`MedicoClinica`
+  de origem ATRIBUIDO; vínculos derivados das próprias consultas não
+  contam).
+- Secretária: as consultas do paciente na clínica dela.
+- Superusuário: todas.
+"""
+from django.db.models import Q
+
+from agendamentos.models import Consulta
+from medicos.models import MedicoClinica
+
+CAMPOS_HISTORICO = (
+    'id', 'data_hora', 'status_atual', 'medico_id', 'medico__first_name', 'medico__last_name',
+    'medico__perfil_medico__especialidade', 'clinica_id', 'clinica__nome_fantasia', 'anotacao__consulta_id',
+)
+
+
+def consultas_visiveis(usuario, paciente_id, outros_medicos=False):
+    """Consultas do paciente que `usuario` pode ver no histórico."""
+    consultas = Consulta.objects.filter(paciente__user_id=paciente_id)
+    if usuario.is_superuser:
+        return consultas
+    if usuario.user_type == 'SECRETARIA':
+        perfil = getattr(usuario, 'perfil_secretaria', None)
+        if perfil is None or perfil.clinica_id is None:
+            return consultas.none()
+        return consultas.filter(clinica_id=perfil.clinica_id)
+    if outros_medicos:
+        clinicas = MedicoClinica.objects.filter(
+            medico=usuario, origem=MedicoClinica.Origem.ATRIBUIDO
+        ).values('clinica_id')
+        return consultas.filter(Q(medico=usuario) | Q(clinica_id__in=clinicas))
+    return consultas.filter(medico=usuario)
+
+
+def projetar(consultas, com_anotacoes=False):
+    """Aplica a projeção do histórico; `com_anotacoes` inclui o texto das anotações."""
+    campos = CAMPOS_HISTORICO + (('anotacao__conteudo',) if com_anotacoes else ())
+    return consultas.values(*campos)
+
+
+def item_do_historico(linha, usuario, com_anotacoes=False):
+    """Converte uma linha de `projetar` no formato da API."""
+    item = {
+        'id': linha['id'],
+        'data_hora': linha['data_hora'],
+        'status_atual': linha['status_atual'],
+        'medico': linha['medico_id'],
+        'medico_nome': f"{linha['medico__first_name']} {linha['medico__last_name']}".strip(),
+        'especialidade': linha['medico__perfil_medico__especialidade'],
+        'clinica': linha['clinica_id'],
+        'clinica_nome': linha['clinica__nome_fantasia'],
+        'tem_anotacao': linha['anotacao__consulta_id'] is not None,
+    }
+    if com_anotacoes:
+        # Anotações são do médico que atendeu
+        proprio = linha['medico_id'] == usuario.pk or usuario.is_superuser
+        item['anotacao_conteudo'] = linha['anotacao__conteudo'] if proprio else None
+    return item
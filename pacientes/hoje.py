@@ -0,0 +1,114 @@
+# pacientes/hoje.py
+"""
+"Pacientes do dia" do médico, guardados em cache com um número de versão.
+
+A versão de (médico, dia) só muda quando alguma consulta daquele médico para
+o dia é criada, alterada ou removida (ver `pacientes.signals`). A lista em
+cache carrega a versão com que foi montada; se não bater com a atual, é
+remontada na leitura seguinte.
+
+Os clientes guardam a versão recebida (cabeçalho `X-Versao`) e a enviam de
+volta em `versao`: enquanto ela for a atual, a view responde 304 sem corpo,
+lendo só o cache. Não há espera no servidor, para não prender um worker por
+tela aberta; o app repete a consulta em intervalos curtos.
+
+Alterações só no cadastro do paciente (ex.: telefone) não mudam a versão;
+valem quando a lista expira (PACIENTES_DO_DIA_TTL).
+"""
+import time
+from datetime import time as hora, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from agendamentos.disponibilidade import combinar
+from agendamentos.models import Consulta
+
+PACIENTES_DO_DIA_TTL = 5 * 60
+VERSAO_TTL = 2 * 24 * 60 * 60
+
+
+def _chave_lista(medico_id, dia):
+    return f'pacientes_do_dia:{medico_id}:{dia.isoformat()}'
+
+
+def _chave_versao(medico_id, dia):
+    return f'pacientes_do_dia_versao:{medico_id}:{dia.isoformat()}'
+
+
+def _versao_inicial():
+    # Em milissegundos: se a chave for despejada do cache, a nova versão
+    # continua maior que as que os clientes já receberam.
+    return int(time.time() * 1000)
+
+
+def versao_atual(medico_id, dia):
+    chave = _chave_versao(medico_id, dia)
+    versao = cache.get(chave)
+    if versao is None:
+        cache.add(chave, _versao_inicial(), VERSAO_TTL)
+        versao = cache.get(chave)
+    return versao
+
+
+def _montar(medico_id, dia):
+    consultas = Consulta.objects.filter(
+        medico_id=medico_id,
+        data_hora__gte=combinar(dia, hora.min),
+        data_hora__lt=combinar(dia + timedelta(days=1), hora.min),
+    ).select_related('paciente__user', 'medico__perfil_medico').order_by('data_hora')
+
+    return [
+        {
+            "id": consulta.paciente.user.id,
+            "consulta_id": consulta.id,
+            "nome_completo": consulta.paciente.nome_completo,
+            "email": consulta.paciente.user.email,
+            "telefone": consulta.paciente.telefone,
+            "cpf": consulta.paciente.user.cpf,
+            "horario": consulta.data_hora,
+            "status": consulta.status_atual,
+            "profissional": consulta.medico.get_full_name(),
+            "especialidade": consulta.medico.perfil_medico.get_especialidade_display(),
+        }
+        for consulta in consultas
+    ]
+
+
+def pacientes_do_dia(medico_id, dia=None):
+    """Retorna (pacientes, versao) do médico no dia (padrão: hoje)."""
+    dia = dia or timezone.now().date()
+    chave_lista, chave_versao = _chave_lista(medico_id, dia), _chave_versao(medico_id, dia)
+    em_cache = cache.get_many([chave_lista, chave_versao])
+    versao = em_cache.get(chave_versao)
+    if versao is None:
+        versao = versao_atual(medico_id, dia)
+
+    lista = em_cache.get(chave_lista)
+    if lista is not None and lista['versao'] == versao:
+        return lista['pacientes'], versao
+
+    pacientes = _montar(medico_id, dia)
+    cache.set(chave_lista, {'versao': versao, 'pacientes': pacientes}, PACIENTES_DO_DIA_TTL)
+    return pacientes, versao
+
+
+def _incrementar(chaves):
+    for chave in chaves:
+        try:
+            cache.incr(chave)
+        except ValueError:
+            if not cache.add(chave, _versao_inicial(), VERSAO_TTL):
+                cache.incr(chave)
+
+
+def nova_versao(pares):
+    """Avança a versão dos pares (medico_id, dia) informados."""
+    chaves = [_chave_versao(medico_id, dia) for medico_id, dia in pares]
+    if not chaves:
+        return
+    _incrementar(chaves)
+    # Repete após o commit: uma leitura concorrente pode ter montado a lista
+    # antes de a transação que alterou a agenda ser confirmada.
+    transaction.on_commit(lambda: _incrementar(chaves))
@@ -0,0 +1,22 @@
+# pacientes/signals.py
+from django.dispatch import receiver
+from django.utils import timezone
+
+from agendamentos.signals import consultas_alteradas
+from .hoje import nova_versao
+
+
+@receiver(consultas_alteradas)
+def atualizar_pacientes_do_dia(sender, alteracoes, **kwargs):
+    """Avança a versão dos "pacientes do dia" dos médicos com consultas alteradas para hoje."""
+    hoje = timezone.now().date()
+    afetados = set()
+    for antes, depois in alteracoes:
+        for estado in (antes, depois):
+            if estado is None or estado.data_hora is None:
+                continue
+            data_hora = estado.data_hora
+            dia = (timezone.localtime(data_hora) if timezone.is_aware(data_hora) else data_hora).date()
+            if dia == hoje:
+                afetados.add((estado.medico_id, dia))
+    nova_versao(afetados)
@@ -7,10 +7,13 @@ from rest_framework import status
 
 from .models import Paciente
 from .serializers import PacienteCreateSerializer, PacienteProfileSerializer
-from agendamentos.models import Consulta
+from agendamentos.models import Consulta, AnotacaoConsulta
+from medicos.models import Medico, MedicoClinica
 from clinicas.models import Clinica, Cidade, Estado, TipoClinica
 
 from decimal import Decimal
+from datetime import datetime, time, timedelta
+from django.core.cache import cache
 
 User = get_user_model()
 
@@ -216,3 +219,165 @@ class PacienteAPIViewTest(APITestCase):
         response = self.client.get(url)
         # A view deve retornar 403 Forbidden
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class HistoricoPacienteTests(APITestCase):
+    """Testes do histórico paginado do paciente."""
+
+    def setUp(self):
+        estado = Estado.objects.create(nome="Bahia", uf="BA")
+        cidade = Cidade.objects.create(nome="Salvador", estado=estado)
+        tipo_clinica = TipoClinica.objects.create(descricao="Geral")
+        self.clinica = Clinica.objects.create(
+            nome_fantasia="MedLink Histórico", cidade=cidade, tipo_clinica=tipo_clinica, cnpj="11222333000151"
+        )
+        self.medico, self.colega = [
+            User.objects.create_user(
+                cpf=f'6000000000{i}', email=f'medico.historico{i}@email.com', password='password123',
+                first_name=f'Dr. {i}', last_name='Histórico', user_type='MEDICO'
+            )
+            for i in range(2)
+        ]
+        for i, user in enumerate((self.medico, self.colega)):
+            Medico.objects.create(user=user, crm=f'7777{i}-BA').clinicas.add(self.clinica)
+        user_paciente = User.objects.create_user(
+            cpf='60000000009', email='paciente.historico@email.com', password='password123',
+            first_name='Paciente', last_name='Antigo', user_type='PACIENTE'
+        )
+        self.paciente = Paciente.objects.create(user=user_paciente)
+
+        inicio = datetime(2025, 1, 6, 9, 0)
+        self.proprias = [
+            Consulta.objects.create(
+                paciente=self.paciente, medico=self.medico, clinica=self.clinica,
+                data_hora=inicio + timedelta(weeks=i), valor=Decimal('100.00')
+            )
+            for i in range(5)
+        ]
+        self.do_colega = Consulta.objects.create(
+            paciente=self.paciente, medico=self.colega, clinica=self.clinica,
+            data_hora=inicio + timedelta(days=1), valor=Decimal('100.00')
+        )
+        AnotacaoConsulta.objects.create(consulta=self.proprias[0], conteudo="Nota do médico")
+        AnotacaoConsulta.objects.create(consulta=self.do_colega, conteudo="Nota do colega")
+        self.url = reverse('paciente-historico', kwargs={'pk': user_paciente.pk})
+        self.client.force_authenticate(user=self.medico)
+
+    def test_paginas_das_mais_recentes_para_as_antigas(self):
+        ids, cursor = [], None
+        while True:
+            params = {'limite': 2, **({'cursor': cursor} if cursor else {})}
+            with self.assertNumQueries(1):
+                response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [item['id'] for item in response.data['resultados']]
+            self.assertNotIn('anotacao_conteudo', response.data['resultados'][0])
+            cursor = response.data['proximo_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(ids, [consulta.pk for consulta in reversed(self.proprias)])
+
+    def test_outros_medicos_sem_as_anotacoes_deles(self):
+        response = self.client.get(self.url, {'limite': 10, 'outros_medicos': 1, 'anotacoes': 1})
+        itens = {item['id']: item for item in response.data['resultados']}
+
+        self.assertEqual(len(itens), 6)
+        self.assertEqual(itens[self.proprias[0].pk]['anotacao_conteudo'], "Nota do médico")
+        self.assertTrue(itens[self.do_colega.pk]['tem_anotacao'])
+        self.assertIsNone(itens[self.do_colega.pk]['anotacao_conteudo'])
+
+    def test_outros_medicos_ignora_vinculo_vindo_de_consultas(self):
+        # Médico sem vínculo atribuído: a consulta na clínica só cria o vínculo
+        # de origem CONSULTAS, que não dá acesso às consultas dos colegas.
+        avulso = User.objects.create_user(
+            cpf='60000000008', email='medico.avulso@email.com', password='password123',
+            first_name='Dr. Avulso', last_name='Histórico', user_type='MEDICO'
+        )
+        Medico.objects.create(user=avulso, crm='77779-BA')
+        propria = Consulta.objects.create(
+            paciente=self.paciente, medico=avulso, clinica=self.clinica,
+            data_hora=datetime(2025, 3, 3, 9, 0), valor=Decimal('100.00')
+        )
+        self.assertTrue(MedicoClinica.objects.filter(
+            medico=avulso, clinica=self.clinica, origem=MedicoClinica.Origem.CONSULTAS
+        ).exists())
+
+        self.client.force_authenticate(user=avulso)
+        response = self.client.get(self.url, {'limite': 10, 'outros_medicos': 1})
+        self.assertEqual([item['id'] for item in response.data['resultados']], [propria.pk])
+
+    def test_cursor_invalido(self):
+        response = self.client.get(self.url, {'cursor': 'xyz'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PacientesDoDiaTests(APITestCase):
+    """Testes dos pacientes do dia em cache, com versão para polling condicional."""
+
+    def setUp(self):
+        cache.clear()
+        estado = Estado.objects.create(nome="Ceará", uf="CE")
+        cidade = Cidade.objects.create(nome="Fortaleza", estado=estado)
+        tipo_clinica = TipoClinica.objects.create(descricao="Geral")
+        self.clinica = Clinica.objects.create(
+            nome_fantasia="MedLink Hoje", cidade=cidade, tipo_clinica=tipo_clinica, cnpj="11222333000152"
+        )
+        self.user_medico = User.objects.create_user(
+            cpf='61000000001', email='medico.hoje@email.com', password='password123',
+            first_name='Dr. Hoje', last_name='Silva', user_type='MEDICO'
+        )
+        Medico.objects.create(user=self.user_medico, crm='88888-CE')
+        user_paciente = User.objects.create_user(
+            cpf='61000000002', email='paciente.hoje@email.com', password='password123',
+            first_name='Paciente', last_name='Hoje', user_type='PACIENTE'
+        )
+        self.paciente = Paciente.objects.create(user=user_paciente)
+        self.hoje = datetime.combine(timezone.now().date(), time(10, 0))
+        self.consulta = Consulta.objects.create(
+            paciente=self.paciente, medico=self.user_medico, clinica=self.clinica,
+            data_hora=self.hoje, valor=Decimal('100.00')
+        )
+        self.url = reverse('pacientes-do-dia')
+        self.client.force_authenticate(user=self.user_medico)
+
+    def test_lista_em_cache_ate_a_agenda_do_dia_mudar(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['consulta_id'] for p in response.data], [self.consulta.pk])
+        versao = response['X-Versao']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Versao'], versao)
+
+        # Consulta de outro dia não muda a versão
+        Consulta.objects.create(
+            paciente=self.paciente, medico=self.user_medico, clinica=self.clinica,
+            data_hora=self.hoje + timedelta(days=1), valor=Decimal('100.00')
+        )
+        self.assertEqual(self.client.get(self.url)['X-Versao'], versao)
+
+        nova = Consulta.objects.create(
+            paciente=self.paciente, medico=self.user_medico, clinica=self.clinica,
+            data_hora=self.hoje + timedelta(hours=1), valor=Decimal('100.00')
+        )
+        response = self.client.get(self.url)
+        self.assertGreater(int(response['X-Versao']), int(versao))
+        self.assertEqual([p['consulta_id'] for p in response.data], [self.consulta.pk, nova.pk])
+
+    def test_versao_atual_responde_304(self):
+        versao = self.client.get(self.url)['X-Versao']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'versao': versao})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['X-Versao'], versao)
+
+        self.consulta.status_atual = 'CONFIRMADA'
+        self.consulta.save()
+        response = self.client.get(self.url, {'versao': versao})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['status'], 'CONFIRMADA')
+
+        response = self.client.get(self.url, {'versao': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
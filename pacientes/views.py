@@ -15,6 +15,9 @@ from .serializers import PacienteCreateSerializer, PacienteProfileSerializer
 # CORREÇÃO 2: Adiciona DashboardConsultaSerializer
 from agendamentos.serializers import ConsultaSerializer, DashboardConsultaSerializer 
 from django.db.models import Q
+from agendamentos.paginacao import paginar_por_cursor, ler_limite
+from .hoje import pacientes_do_dia, versao_atual
+from .historico import consultas_visiveis, projetar, item_do_historico
 
 # View para CRIAR pacientes (Esta classe estava faltando no seu arquivo anterior)
 class PacienteCreateView(generics.CreateAPIView):
@@ -54,46 +57,66 @@ class PacienteListView(generics.ListAPIView):
         # Outros: veem nada
         return Paciente.objects.none()
 
-# View para os PACIENTES DO DIA (sem alterações)
+# View para os PACIENTES DO DIA (em cache e versionada, ver pacientes.hoje)
 class PacientesDoDiaAPIView(APIView):
+    """
+    GET /api/pacientes/hoje/[?versao=<X-Versao anterior>]
+    Se 'versao' ainda for a atual, responde 304 sem consultar o banco.
+    """
     permission_classes = [IsAuthenticated, IsMedicoOrSecretaria]
+
     def get(self, request, *args, **kwargs):
         medico = request.user
-        hoje = timezone.now().date()
-        consultas_de_hoje = Consulta.objects.filter(
-            medico=medico,
-            data_hora__date=hoje
-        ).select_related('paciente__user', 'medico__perfil_medico').order_by('data_hora')
-        
-        dados_finais = []
-        for consulta in consultas_de_hoje:
-            dados_finais.append({
-                "id": consulta.paciente.user.id,
-                "consulta_id": consulta.id,
-                "nome_completo": consulta.paciente.nome_completo,
-                "email": consulta.paciente.user.email,
-                "telefone": consulta.paciente.telefone,
-                "cpf": consulta.paciente.user.cpf,
-                "horario": consulta.data_hora,
-                "status": consulta.status_atual,
-                "profissional": consulta.medico.get_full_name(),
-                "especialidade": consulta.medico.perfil_medico.get_especialidade_display()
-            })
-        return Response(dados_finais, status=status.HTTP_200_OK)
-    
+        versao = request.query_params.get('versao')
+        if versao:
+            try:
+                versao = int(versao)
+            except ValueError:
+                return Response(
+                    {"error": "O parâmetro 'versao' deve ser um número."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if versao_atual(medico.pk, timezone.now().date()) == versao:
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                response['X-Versao'] = versao
+                return response
+
+        dados_finais, versao = pacientes_do_dia(medico.pk)
+        response = Response(dados_finais, status=status.HTTP_200_OK)
+        response['X-Versao'] = versao
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
 # --- VIEW DO HISTÓRICO (sem alterações) ---
 class HistoricoPacienteAPIView(APIView):
     permission_classes = [IsAuthenticated, IsMedicoOrSecretaria]
 
     def get(self, request, pk, *args, **kwargs):
+        params = request.query_params
         medico = request.user
-        
+
+        # Paginação por cursor (projeção enxuta, ver pacientes.historico) quando
+        # o cliente pede 'limite' ou 'cursor'; sem eles, a lista completa de antes.
+        if 'cursor' in params or 'limite' in params:
+            outros_medicos = params.get('outros_medicos') in ('1', 'true')
+            com_anotacoes = params.get('anotacoes') in ('1', 'true')
+            consultas = projetar(consultas_visiveis(medico, pk, outros_medicos), com_anotacoes)
+            try:
+                pagina, proximo_cursor = paginar_por_cursor(
+                    consultas, cursor=params.get('cursor'), limite=ler_limite(params.get('limite')),
+                    decrescente=True,
+                )
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                'resultados': [item_do_historico(linha, medico, com_anotacoes) for linha in pagina],
+                'proximo_cursor': proximo_cursor,
+            })
+
         historico_consultas = Consulta.objects.filter(
             paciente__user_id=pk,
             medico=medico
-        ).select_related(
-            'paciente__user', 'medico__perfil_medico'
-        ).order_by('-data_hora')
+        ).com_detalhes().order_by('-data_hora')
 
         serializer = ConsultaSerializer(historico_consultas, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SecretariasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'secretarias'
+
+    def ready(self):
+        # Importa os sinais para que eles sejam conectados quando a app for carregada.
+        import secretarias.signals
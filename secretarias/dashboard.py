@@ -0,0 +1,65 @@
+# secretarias/dashboard.py
+"""
+Números dos cards do dashboard da secretária.
+
+Os cards saem dos contadores diários da clínica (`ContadorDiarioClinica`,
+mantidos a cada escrita de consulta): uma leitura de poucas linhas por dia do
+mês, sem varrer as consultas. O resultado fica em cache por clínica por
+ESTATISTICAS_CACHE_TTL segundos, e é descartado antes disso quando alguma
+consulta da clínica muda (ver `secretarias.signals`).
+"""
+from datetime import date
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from agendamentos.consts import STATUS_CONSULTA_CONFIRMADA, STATUS_CONSULTA_PENDENTE
+from clinicas.contadores import totais
+
+ESTATISTICAS_CACHE_TTL = 30
+
+
+def _chave(clinica_id, hoje):
+    return f'dashboard_secretaria:{clinica_id}:{hoje.isoformat()}'
+
+
+def hoje_na_clinica():
+    """Data corrente no fuso do projeto (as clínicas não têm fuso próprio)."""
+    agora = timezone.now()
+    return (timezone.localtime(agora) if timezone.is_aware(agora) else agora).date()
+
+
+def estatisticas(clinica_id, hoje=None):
+    """Retorna os cards {today, confirmed, pending, totalMonth} da clínica."""
+    hoje = hoje or hoje_na_clinica()
+    chave = _chave(clinica_id, hoje)
+    em_cache = cache.get(chave)
+    if em_cache is not None:
+        return em_cache
+
+    inicio_mes = date(hoje.year, hoje.month, 1)
+    fim_mes = date(hoje.year + 1, 1, 1) if hoje.month == 12 else date(hoje.year, hoje.month + 1, 1)
+    contadores = totais(clinica_id, inicio_mes, fim_mes)
+
+    do_dia = {status: total for (dia, status), total in contadores.items() if dia == hoje}
+    dados = {
+        'today': sum(do_dia.values()),
+        'confirmed': do_dia.get(STATUS_CONSULTA_CONFIRMADA, 0),
+        'pending': do_dia.get(STATUS_CONSULTA_PENDENTE, 0),
+        'totalMonth': sum(contadores.values()),
+    }
+    cache.set(chave, dados, ESTATISTICAS_CACHE_TTL)
+    return dados
+
+
+def invalidar_estatisticas(clinica_ids):
+    """Descarta os cards em cache do dia corrente das clínicas informadas."""
+    hoje = hoje_na_clinica()
+    chaves = [_chave(clinica_id, hoje) for clinica_id in clinica_ids]
+    if not chaves:
+        return
+    cache.delete_many(chaves)
+    # Repete após o commit: uma leitura concorrente pode ter recalculado o cache
+    # antes de a transação que alterou a agenda ser confirmada.
+    transaction.on_commit(lambda: cache.delete_many(chaves))
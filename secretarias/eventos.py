@@ -0,0 +1,166 @@
+# secretarias/eventos.py
+"""
+Eventos da recepção em tempo real (Server-Sent Events), por clínica.
+
+As escritas gravam `EventoClinica` na própria transação: as consultas pelo
+sinal `consultas_alteradas` e os pagamentos pelo post_save de `Pagamento`
+(ver `secretarias.signals`). Depois do commit, a versão da clínica avança no
+cache.
+
+Cada tela da recepção mantém uma conexão em `fluxo`, que:
+- retoma do `Last-Event-ID` (ou começa nos eventos novos);
+- relê sempre os últimos JANELA_REORDENACAO ids: ids são reservados quando a
+  transação insere, não quando confirma, e um evento de id menor pode ficar
+  visível depois de um de id maior. Na conexão, os eventos já enviados não se
+  repetem; numa reconexão, a janela antes do `Last-Event-ID` é reenviada e o
+  cliente descarta os ids que já tem;
+- só vai ao banco quando a versão da clínica muda no cache, ou a cada
+  HEARTBEAT segundos (o cache local não é compartilhado entre processos);
+- envia um comentário de heartbeat para manter proxies e o cliente vivos;
+- encerra depois de DURACAO_CONEXAO; o cliente reconecta com o último id.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max
+
+from .models import EventoClinica
+
+INTERVALO = 1  # segundos entre leituras do cache
+HEARTBEAT = 15
+DURACAO_CONEXAO = 5 * 60
+RECONEXAO_MS = 3000
+EVENTOS_POR_LEITURA = 200
+# Quantos ids antes do último enviado são relidos a cada leitura
+JANELA_REORDENACAO = 500
+
+
+def _chave(clinica_id):
+    return f'eventos_clinica_versao:{clinica_id}'
+
+
+def _estado(estado):
+    return {
+        'consulta': estado.id,
+        'medico': estado.medico_id,
+        'paciente': estado.paciente_id,
+        'data_hora': estado.data_hora,
+        'status': estado.status_atual,
+    }
+
+
+def eventos_das_alteracoes(alteracoes):
+    """Eventos correspondentes às alterações (antes, depois) de `consultas_alteradas`."""
+    Tipo = EventoClinica.Tipo
+    eventos = []
+    for antes, depois in alteracoes:
+        if antes is not None and (depois is None or depois.clinica_id != antes.clinica_id):
+            eventos.append((antes.clinica_id, Tipo.CONSULTA_REMOVIDA, antes.id, _estado(antes)))
+            antes = None
+        if depois is None:
+            continue
+        if antes is None:
+            eventos.append((depois.clinica_id, Tipo.CONSULTA_CRIADA, depois.id, _estado(depois)))
+        elif antes != depois:
+            dados = _estado(depois)
+            dados['status_anterior'] = antes.status_atual
+            dados['data_hora_anterior'] = antes.data_hora
+            eventos.append((depois.clinica_id, Tipo.CONSULTA_ALTERADA, depois.id, dados))
+    return eventos
+
+
+def registrar(eventos):
+    """Grava os eventos (clinica_id, tipo, consulta_id, dados) e avisa as conexões após o commit."""
+    if not eventos:
+        return
+    EventoClinica.objects.bulk_create([
+        EventoClinica(
+            clinica_id=clinica_id, tipo=tipo, consulta_id=consulta_id,
+            # Normaliza datas e decimais para o JSONField
+            dados=json.loads(json.dumps(dados, cls=DjangoJSONEncoder)),
+        )
+        for clinica_id, tipo, consulta_id, dados in eventos
+    ])
+    chaves = {_chave(clinica_id) for clinica_id, *_ in eventos}
+    transaction.on_commit(lambda: _avancar(chaves))
+
+
+def _avancar(chaves):
+    for chave in chaves:
+        try:
+            cache.incr(chave)
+        except ValueError:
+            cache.set(chave, 1, None)
+
+
+def ultimo_id(clinica_id):
+    return EventoClinica.objects.filter(clinica_id=clinica_id).aggregate(ultimo=Max('id'))['ultimo'] or 0
+
+
+def ids_na_janela(clinica_id, ultimo):
+    """Ids já visíveis na janela de reordenação que antecede `ultimo`."""
+    return set(
+        EventoClinica.objects.filter(
+            clinica_id=clinica_id, id__gt=ultimo - JANELA_REORDENACAO, id__lte=ultimo
+        ).values_list('id', flat=True)
+    )
+
+
+def eventos_desde(clinica_id, piso):
+    return list(
+        EventoClinica.objects.filter(clinica_id=clinica_id, id__gt=piso)
+        .order_by('id')
+        .values('id', 'tipo', 'consulta_id', 'dados', 'data_criacao')[:EVENTOS_POR_LEITURA]
+    )
+
+
+def formatar(evento):
+    """Evento no formato text/event-stream."""
+    dados = {**evento['dados'], 'data_criacao': evento['data_criacao']}
+    return (
+        f"id: {evento['id']}\n"
+        f"event: {evento['tipo']}\n"
+        f"data: {json.dumps(dados, cls=DjangoJSONEncoder)}\n\n"
+    )
+
+
+async def fluxo(clinica_id, ultimo=None, duracao=None):
+    """Gerador assíncrono do stream SSE da clínica, a partir do evento `ultimo`."""
+    duracao = DURACAO_CONEXAO if duracao is None else duracao
+    relogio = asyncio.get_running_loop().time
+    enviados = set()
+    if ultimo is None:
+        # Começa nos eventos novos: o que já está visível na janela não é enviado
+        ultimo = await sync_to_async(ultimo_id)(clinica_id)
+        enviados = await sync_to_async(ids_na_janela)(clinica_id, ultimo)
+
+    yield f'retry: {RECONEXAO_MS}\n\n'
+    fim = relogio() + duracao
+    versao, proxima_verificacao = object(), 0
+    while True:
+        atual = await cache.aget(_chave(clinica_id))
+        if atual != versao or relogio() >= proxima_verificacao:
+            versao = atual
+            piso = max(ultimo - JANELA_REORDENACAO, 0)
+            while True:
+                eventos = await sync_to_async(eventos_desde)(clinica_id, piso)
+                for evento in eventos:
+                    if evento['id'] not in enviados:
+                        enviados.add(evento['id'])
+                        ultimo = max(ultimo, evento['id'])
+                        yield formatar(evento)
+                if len(eventos) < EVENTOS_POR_LEITURA:
+                    break
+                piso = eventos[-1]['id']
+            enviados = {pk for pk in enviados if pk > ultimo - JANELA_REORDENACAO}
+            if relogio() >= proxima_verificacao:
+                if proxima_verificacao:
+                    yield ': heartbeat\n\n'
+                proxima_verificacao = relogio() + HEARTBEAT
+        if relogio() >= fim:
+            return
+        await asyncio.sleep(INTERVALO)
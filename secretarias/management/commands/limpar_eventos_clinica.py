@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from secretarias.models import EventoClinica
+
+
+class Command(BaseCommand):
+    help = (
+        'Remove os eventos da recepção (EventoClinica) mais antigos que --dias, em lotes. '
+        'As telas só retomam eventos recentes; agende a execução diária.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=2, help='Idade mínima, em dias, dos eventos removidos.')
+        parser.add_argument('--lote', type=int, default=5_000, help='Quantidade de eventos removidos por comando DELETE.')
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=max(0, options['dias']))
+        lote = max(1, options['lote'])
+        total = 0
+        while True:
+            ids = list(
+                EventoClinica.objects.filter(data_criacao__lt=limite).order_by('id').values_list('id', flat=True)[:lote]
+            )
+            if not ids:
+                break
+            EventoClinica.objects.filter(id__in=ids).delete()
+            total += len(ids)
+        self.stdout.write(self.style.SUCCESS(f'{total} evento(s) removido(s).'))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinicas', '0003_contadordiarioclinica'),
+        ('secretarias', '0002_alter_secretaria_clinica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoClinica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('consulta_criada', 'Consulta criada'), ('consulta_alterada', 'Consulta alterada'), ('consulta_removida', 'Consulta removida'), ('pagamento', 'Pagamento')], max_length=30)),
+                ('consulta_id', models.BigIntegerField(null=True)),
+                ('dados', models.JSONField(default=dict)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('clinica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos', to='clinicas.clinica')),
+            ],
+            options={
+                'verbose_name': 'Evento da Clínica',
+                'verbose_name_plural': 'Eventos das Clínicas',
+                'indexes': [models.Index(fields=['clinica', 'id'], name='evento_clinica_id_idx')],
+            },
+        ),
+    ]
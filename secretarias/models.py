@@ -47,4 +47,30 @@ class SecretariaUser(User):
     class Meta:
         proxy = True
         verbose_name = 'Secretária (Utilizador)'
-        verbose_name_plural = 'Secretárias (Utilizadores)'
\ No newline at end of file
+        verbose_name_plural = 'Secretárias (Utilizadores)'
+
+class EventoClinica(models.Model):
+    """
+    Evento da recepção (consulta criada, alterada ou removida, pagamento)
+    gravado na transação da escrita. O id crescente é o `id` do SSE: o
+    cliente retoma a conexão a partir do `Last-Event-ID` (ver secretarias.eventos).
+    """
+    class Tipo(models.TextChoices):
+        CONSULTA_CRIADA = 'consulta_criada', _('Consulta criada')
+        CONSULTA_ALTERADA = 'consulta_alterada', _('Consulta alterada')
+        CONSULTA_REMOVIDA = 'consulta_removida', _('Consulta removida')
+        PAGAMENTO = 'pagamento', _('Pagamento')
+
+    clinica = models.ForeignKey(Clinica, on_delete=models.CASCADE, related_name='eventos')
+    tipo = models.CharField(max_length=30, choices=Tipo.choices)
+    # Sem FK: o evento de remoção sobrevive à consulta
+    consulta_id = models.BigIntegerField(null=True)
+    dados = models.JSONField(default=dict)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Evento da Clínica"
+        verbose_name_plural = "Eventos das Clínicas"
+        indexes = [
+            models.Index(fields=['clinica', 'id'], name='evento_clinica_id_idx'),
+        ]
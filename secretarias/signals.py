@@ -0,0 +1,40 @@
+# secretarias/signals.py
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from agendamentos.models import Pagamento
+from agendamentos.signals import consultas_alteradas
+from .dashboard import invalidar_estatisticas
+from .eventos import eventos_das_alteracoes, registrar
+from .models import EventoClinica
+
+
+@receiver(consultas_alteradas)
+def invalidar_dashboard(sender, alteracoes, **kwargs):
+    """Descarta os cards do dashboard das clínicas com consultas alteradas."""
+    invalidar_estatisticas({
+        estado.clinica_id
+        for antes, depois in alteracoes
+        for estado in (antes, depois)
+        if estado is not None
+    })
+
+
+@receiver(consultas_alteradas)
+def registrar_eventos_consultas(sender, alteracoes, **kwargs):
+    """Grava os eventos da recepção das consultas criadas, alteradas ou removidas."""
+    registrar(eventos_das_alteracoes(alteracoes))
+
+
+@receiver(post_save, sender=Pagamento)
+def registrar_evento_pagamento(sender, instance, created, raw=False, **kwargs):
+    """Grava o evento de mudança de pagamento (a criação vem junto com a consulta)."""
+    if created or raw:
+        return
+    consulta = instance.consulta
+    registrar([(consulta.clinica_id, EventoClinica.Tipo.PAGAMENTO, consulta.pk, {
+        'consulta': consulta.pk,
+        'status_pagamento': instance.status,
+        'valor_pago': instance.valor_pago,
+        'data_pagamento': instance.data_pagamento,
+    })])
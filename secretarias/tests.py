@@ -1,22 +1,30 @@
 # secretarias/tests.py
 
-from django.test import TestCase
+from django.test import TestCase, AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
+from django.core.cache import cache
 from decimal import Decimal
+from unittest.mock import patch
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.tokens import AccessToken
 
 # Importa modelos da app em teste
-from .models import Secretaria
-from .serializers import DashboardStatsSerializer, ConsultaHojeSerializer
+from .models import Secretaria, EventoClinica
+from .eventos import fluxo, ultimo_id
+from .serializers import DashboardStatsSerializer
 
 # Importa modelos das apps dependentes
 from clinicas.models import Clinica, Cidade, Estado, TipoClinica
 from pacientes.models import Paciente
-from agendamentos.models import Consulta, ConsultaStatusLog
+from medicos.models import Medico
+from agendamentos.models import Consulta, ConsultaStatusLog, Pagamento
 # Importa constantes para criar os dados de teste com os status corretos
 from agendamentos.consts import STATUS_CONSULTA_CONFIRMADA, STATUS_CONSULTA_PENDENTE, STATUS_CONSULTA_CONCLUIDA
 
@@ -156,22 +164,6 @@ class SecretariaSerializerTests(BaseSecretariaAPITestCase):
         self.assertTrue(serializer.is_valid())
         self.assertEqual(serializer.data['totalMonth'], 3)
 
-    def test_consulta_hoje_serializer_data(self):
-        """
-        Verifica se o ConsultaHojeSerializer retorna os campos corretos e formatados.
-       
-        """
-        # Usamos a consulta confirmada
-        serializer = ConsultaHojeSerializer(instance=self.consulta_hoje_confirmada)
-        data = serializer.data
-        
-        self.assertEqual(data['id'], self.consulta_hoje_confirmada.id)
-        self.assertEqual(data['time'], '12:00') # 10:00 + 2h = 12:00
-        self.assertEqual(data['patient'], 'Paciente Teste') # Fonte: paciente.nome_completo
-        self.assertEqual(data['doctor'], 'Dr. Medico') # Fonte: medico.get_full_name
-        self.assertIn('Confirmada', data['type']) 
-        self.assertEqual(data['status'], 'confirmed') # get_status method
-
 
 # --- TESTES DE API (VIEWS) ---
 
@@ -199,6 +191,28 @@ class SecretariaAPITests(BaseSecretariaAPITestCase):
         self.assertEqual(response.data['pending'], 1)
         self.assertEqual(response.data['totalMonth'], 3)
         
+    def test_dashboard_stats_um_agregado_em_cache(self):
+        """
+        Os cards saem de uma única consulta, ficam em cache e são descartados
+        quando uma consulta da clínica muda.
+        """
+        cache.clear()
+        self.client.force_authenticate(user=self.user_secretaria)
+        url = reverse('dashboard-stats')
+        self.user_secretaria.perfil_secretaria  # perfil já carregado, como na autenticação real
+
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data['confirmed'], 1)
+
+        self.consulta_hoje_pendente.status_atual = STATUS_CONSULTA_CONFIRMADA
+        self.consulta_hoje_pendente.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data['confirmed'], 2)
+        self.assertEqual(response.data['pending'], 0)
+
     def test_dashboard_stats_forbidden_paciente(self):
         """
         Testa GET /dashboard/stats/ com Paciente logado (deve falhar por HasRole).
@@ -239,6 +253,26 @@ class SecretariaAPITests(BaseSecretariaAPITestCase):
         self.assertEqual(response.data[1]['time'], '12:00')
 
 
+    def test_consultas_hoje_queries_fixas(self):
+        """
+        A lista do dia é uma projeção: o número de queries não cresce com as consultas.
+        """
+        for i in range(20):
+            Consulta.objects.create(
+                paciente=self.paciente, medico=self.user_medico, clinica=self.clinica,
+                data_hora=self.today_dt.replace(hour=0) + timedelta(minutes=30 * i), valor=Decimal('100.00')
+            )
+        self.client.force_authenticate(user=self.user_secretaria)
+
+        # Perfil da secretária (se ainda não estiver carregado) + a projeção
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('consultas-hoje'))
+        self.assertLessEqual(len(queries.captured_queries), 2)
+        self.assertEqual(len(response.data), 22)
+        self.assertEqual(response.data[0]['patient'], 'Paciente Teste')
+        self.assertEqual(response.data[0]['doctor'], 'Dr. Medico')
+        self.assertEqual(response.data[-1]['status'], 'confirmed')
+
     # --- Testes para ConfirmarConsultaView (name='confirmar-consulta') ---
 
     def test_confirmar_consulta_success(self):
@@ -318,4 +352,265 @@ class SecretariaAPITests(BaseSecretariaAPITestCase):
         
         # 2. Verifica o log de auditoria (deve usar o motivo default)
         log = ConsultaStatusLog.objects.get(consulta=self.consulta_hoje_pendente)
-        self.assertEqual(log.status_novo, 'CANCELADA - Motivo: Cancelado pela secretaria')
\ No newline at end of file
+        self.assertEqual(log.status_novo, 'CANCELADA - Motivo: Cancelado pela secretaria')
+
+# --- TESTES DAS AÇÕES EM LOTE ---
+
+class AcoesEmLoteTests(BaseSecretariaAPITestCase):
+    """
+    Testes para ConfirmarConsultasLoteView e CancelarConsultasLoteView.
+    """
+
+    def setUp(self):
+        super().setUp()
+        estado = Estado.objects.get(uf="TO")
+        outra_clinica = Clinica.objects.create(
+            nome_fantasia="Outra Clínica", cidade=Cidade.objects.get(estado=estado),
+            tipo_clinica=TipoClinica.objects.first(), cnpj="55666777000188"
+        )
+        self.consulta_outra_clinica = Consulta.objects.create(
+            paciente=self.paciente, medico=self.user_medico, clinica=outra_clinica,
+            data_hora=self.today_dt + timedelta(hours=4), valor=Decimal('100.00'),
+            status_atual=STATUS_CONSULTA_PENDENTE
+        )
+        self.consulta_concluida = Consulta.objects.create(
+            paciente=self.paciente, medico=self.user_medico, clinica=self.clinica,
+            data_hora=self.today_dt - timedelta(days=2), valor=Decimal('100.00'),
+            status_atual=STATUS_CONSULTA_CONCLUIDA
+        )
+        self.client.force_authenticate(user=self.user_secretaria)
+
+    def test_confirmar_lote_por_ids(self):
+        """
+        Confirma por lista de ids e informa as ignoradas (já confirmada,
+        de outra clínica e inexistente).
+        """
+        ids = [
+            self.consulta_hoje_pendente.pk, self.consulta_mes.pk, self.consulta_hoje_confirmada.pk,
+            self.consulta_outra_clinica.pk, 999999,
+        ]
+        response = self.client.patch(reverse('confirmar-consultas-lote'), {'ids': ids}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(response.data['atualizadas'], [self.consulta_hoje_pendente.pk, self.consulta_mes.pk])
+        self.assertCountEqual(
+            [item['id'] for item in response.data['ignoradas']],
+            [self.consulta_hoje_confirmada.pk, self.consulta_outra_clinica.pk, 999999]
+        )
+
+        self.consulta_outra_clinica.refresh_from_db()
+        self.assertEqual(self.consulta_outra_clinica.status_atual, STATUS_CONSULTA_PENDENTE)
+        self.assertEqual(
+            Consulta.objects.filter(pk__in=response.data['atualizadas'], status_atual='CONFIRMADA').count(), 2
+        )
+        self.assertEqual(
+            ConsultaStatusLog.objects.filter(status_novo='CONFIRMADA', pessoa=self.user_secretaria).count(), 2
+        )
+
+    def test_confirmar_lote_por_filtro(self):
+        """
+        Confirma "todas as PENDENTE do médico X no dia Y".
+        """
+        filtro = {
+            'medico': self.user_medico.pk,
+            'data': self.today.isoformat(),
+            'status_atual': STATUS_CONSULTA_PENDENTE,
+        }
+        response = self.client.patch(reverse('confirmar-consultas-lote'), {'filtro': filtro}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['atualizadas'], [self.consulta_hoje_pendente.pk])
+        self.assertEqual(response.data['ignoradas'], [])
+
+    def test_cancelar_lote_com_motivo(self):
+        """
+        Cancela em lote; consultas concluídas não são alteradas.
+        """
+        ids = [self.consulta_hoje_pendente.pk, self.consulta_hoje_confirmada.pk, self.consulta_concluida.pk]
+        data = {'ids': ids, 'motivo': 'Médico ausente'}
+        response = self.client.patch(reverse('cancelar-consultas-lote'), data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['atualizadas']), 2)
+        self.assertEqual(response.data['ignoradas'][0]['id'], self.consulta_concluida.pk)
+
+        self.consulta_concluida.refresh_from_db()
+        self.assertEqual(self.consulta_concluida.status_atual, STATUS_CONSULTA_CONCLUIDA)
+        self.assertEqual(
+            ConsultaStatusLog.objects.filter(status_novo='CANCELADA - Motivo: Médico ausente').count(), 2
+        )
+
+    def test_lote_usa_quantidade_fixa_de_queries(self):
+        """
+        O número de queries não depende da quantidade de consultas alteradas.
+        """
+        consultas = Consulta.objects.bulk_create([
+            Consulta(
+                paciente=self.paciente, medico=self.user_medico, clinica=self.clinica,
+                data_hora=self.next_month_dt + timedelta(hours=i), valor=Decimal('100.00'),
+                status_atual=STATUS_CONSULTA_PENDENTE
+            )
+            for i in range(50)
+        ])
+        ids = [consulta.pk for consulta in consultas]
+
+        # SAVEPOINT + SELECT das consultas + UPDATE + INSERT dos logs + RELEASE,
+        # mais SAVEPOINT + INSERT + SELECT + UPDATE + RELEASE dos contadores diários
+        # e o INSERT dos eventos da recepção
+        # (o perfil da secretária já está em cache no usuário autenticado)
+        with self.assertNumQueries(11):
+            response = self.client.patch(reverse('confirmar-consultas-lote'), {'ids': ids}, format='json')
+        self.assertEqual(len(response.data['atualizadas']), 50)
+
+    def test_lote_requisicao_invalida(self):
+        """
+        Sem 'ids' nem 'filtro', ou com ids inválidos, retorna 400.
+        """
+        url = reverse('confirmar-consultas-lote')
+        self.assertEqual(self.client.patch(url, {}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.patch(url, {'ids': ['a']}, format='json').status_code, status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(
+            self.client.patch(url, {'ids': [True]}, format='json').status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_lote_por_filtro_respeita_limite(self):
+        """
+        Um filtro que seleciona mais consultas que LOTE_MAXIMO é recusado sem alterar nada.
+        """
+        filtro = {'data': self.today.isoformat()}
+        with patch('secretarias.views.LOTE_MAXIMO', 1):
+            response = self.client.patch(reverse('cancelar-consultas-lote'), {'filtro': filtro}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.consulta_hoje_pendente.refresh_from_db()
+        self.assertEqual(self.consulta_hoje_pendente.status_atual, STATUS_CONSULTA_PENDENTE)
+
+    def test_lote_forbidden_paciente(self):
+        """
+        Apenas secretárias podem usar as ações em lote.
+        """
+        self.client.force_authenticate(user=self.user_paciente)
+        response = self.client.patch(reverse('cancelar-consultas-lote'), {'ids': [1]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class AgendaClinicaTests(BaseSecretariaAPITestCase):
+    """
+    Testes para AgendaClinicaView (grade colunar da clínica).
+    """
+
+    def setUp(self):
+        super().setUp()
+        Medico.objects.create(user=self.user_medico, crm='10000-TO', clinicas=[self.clinica])
+        self.user_medico_sem_agenda = User.objects.create_user(
+            cpf='33333333333', email='med2@email.com', password='senha',
+            first_name='Ana', last_name='Livre', user_type='MEDICO'
+        )
+        Medico.objects.create(user=self.user_medico_sem_agenda, crm='20000-TO', clinicas=[self.clinica])
+        self.client.force_authenticate(user=self.user_secretaria)
+
+    def test_grade_colunar_do_periodo(self):
+        dia = self.today.isoformat()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('agenda-clinica'), {'data_inicio': dia, 'data_fim': dia})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['dias'], [dia])
+        medicos = response.data['medicos']
+        self.assertCountEqual(medicos['id'], [self.user_medico.pk, self.user_medico_sem_agenda.pk])
+
+        consultas = response.data['consultas']
+        self.assertEqual(len(consultas['id']), 2)
+        # Todas as colunas têm o mesmo tamanho
+        self.assertEqual({len(coluna) for coluna in consultas.values()}, {2})
+        self.assertEqual(consultas['minuto'], [600, 720])
+        self.assertEqual(consultas['dia'], [0, 0])
+        self.assertEqual({medicos['id'][i] for i in consultas['medico']}, {self.user_medico.pk})
+        self.assertEqual(consultas['paciente'][0], 'Paciente Teste')
+
+    def test_semana_corrente_por_padrao(self):
+        response = self.client.get(reverse('agenda-clinica'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['dias']), 7)
+
+    def test_periodo_invalido(self):
+        response = self.client.get(reverse('agenda-clinica'), {'data_inicio': '2025-01-10', 'data_fim': '2025-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_forbidden_medico(self):
+        self.client.force_authenticate(user=self.user_medico)
+        response = self.client.get(reverse('agenda-clinica'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class EventosClinicaTests(BaseSecretariaAPITestCase):
+    """
+    Testes dos eventos da recepção e do stream SSE.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.token = str(AccessToken.for_user(self.user_secretaria))
+
+    def test_escritas_gravam_eventos(self):
+        inicio = EventoClinica.objects.latest('id').id
+        Pagamento.objects.create(consulta=self.consulta_hoje_pendente, valor_pago=Decimal('150.00'))
+        self.client.force_authenticate(user=self.user_secretaria)
+        self.client.patch(reverse('confirmar-consulta', kwargs={'pk': self.consulta_hoje_pendente.pk}))
+        self.client.put(reverse('agendamentos-pagamento-update', kwargs={'pk': self.consulta_hoje_pendente.pk}))
+
+        eventos = list(EventoClinica.objects.filter(id__gt=inicio).order_by('id'))
+        self.assertEqual([e.tipo for e in eventos], ['consulta_alterada', 'pagamento'])
+        self.assertEqual(eventos[0].dados['status'], STATUS_CONSULTA_CONFIRMADA)
+        self.assertEqual(eventos[0].dados['status_anterior'], STATUS_CONSULTA_PENDENTE)
+        self.assertEqual(eventos[1].dados['status_pagamento'], 'PAGO')
+        self.assertEqual({e.clinica_id for e in eventos}, {self.clinica.pk})
+
+    @patch('secretarias.eventos.DURACAO_CONEXAO', 0)
+    async def test_stream_retoma_do_last_event_id(self):
+        primeiro = await EventoClinica.objects.filter(consulta_id=self.consulta_hoje_pendente.pk).afirst()
+        response = await AsyncClient().get(
+            reverse('eventos-clinica'),
+            headers={'Authorization': f'Bearer {self.token}', 'Last-Event-ID': str(primeiro.id)},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        corpo = ''.join([parte.decode() async for parte in response.streaming_content])
+
+        self.assertTrue(corpo.startswith('retry: '))
+        # A janela de reordenação antes do Last-Event-ID é reenviada; o cliente descarta pelo id
+        self.assertIn(f'id: {primeiro.id}\n', corpo)
+        self.assertEqual(corpo.count('event: consulta_criada'), 4)
+        self.assertIn(f'"consulta": {self.consulta_mes.pk}', corpo)
+
+    @patch('secretarias.eventos.INTERVALO', 0)
+    async def test_stream_entrega_evento_confirmado_fora_de_ordem(self):
+        """
+        A transação que reservou o id menor confirma depois: o evento ainda chega,
+        e nenhum evento é repetido na mesma conexão.
+        """
+        ultimo = await sync_to_async(ultimo_id)(self.clinica.pk)
+        novo = lambda pk: EventoClinica.objects.create(
+            id=pk, clinica=self.clinica, tipo=EventoClinica.Tipo.PAGAMENTO, dados={}
+        )
+        stream = fluxo(self.clinica.pk, duracao=60)
+        self.assertTrue((await anext(stream)).startswith('retry: '))
+
+        await sync_to_async(novo)(ultimo + 2)
+        await cache.aset(f'eventos_clinica_versao:{self.clinica.pk}', 1)
+        self.assertTrue((await anext(stream)).startswith(f'id: {ultimo + 2}\n'))
+
+        # O id ultimo + 1 só fica visível agora
+        await sync_to_async(novo)(ultimo + 1)
+        await cache.aset(f'eventos_clinica_versao:{self.clinica.pk}', 2)
+        self.assertTrue((await anext(stream)).startswith(f'id: {ultimo + 1}\n'))
+        await stream.aclose()
+
+    async def test_stream_exige_secretaria(self):
+        response = await AsyncClient().get(reverse('eventos-clinica'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        token = await sync_to_async(lambda: str(AccessToken.for_user(self.user_medico)))()
+        response = await AsyncClient().get(reverse('eventos-clinica'), headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
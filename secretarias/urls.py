@@ -6,16 +6,30 @@ from .views import (
     ConsultasHojeView,
     ConfirmarConsultaView,
     CancelarConsultaView,
+    ConfirmarConsultasLoteView,
+    CancelarConsultasLoteView,
+    AgendaClinicaView,
+    eventos_clinica,
 )
 
 urlpatterns = [
     # URL para os cards de estatísticas
     path('dashboard/stats/', DashboardStatsView.as_view(), name='dashboard-stats'),
 
+    # Grade semanal com a agenda de todos os médicos da clínica
+    path('agenda/', AgendaClinicaView.as_view(), name='agenda-clinica'),
+
+    # Eventos da recepção em tempo real (SSE), no lugar do polling das telas
+    path('eventos/', eventos_clinica, name='eventos-clinica'),
+
     # URL para a lista de consultas de hoje
     path('dashboard/consultas-hoje/', ConsultasHojeView.as_view(), name='consultas-hoje'),
 
     # URLs para as ações de confirmar e cancelar. O '<int:pk>' é um placeholder para o ID da consulta.
     path('consultas/<int:pk>/confirmar/', ConfirmarConsultaView.as_view(), name='confirmar-consulta'),
     path('consultas/<int:pk>/cancelar/', CancelarConsultaView.as_view(), name='cancelar-consulta'),
+
+    # Ações em lote: recebem uma lista de 'ids' ou um 'filtro' no corpo da requisição
+    path('consultas/confirmar-lote/', ConfirmarConsultasLoteView.as_view(), name='confirmar-consultas-lote'),
+    path('consultas/cancelar-lote/', CancelarConsultasLoteView.as_view(), name='cancelar-consultas-lote'),
 ]
\ No newline at end of file
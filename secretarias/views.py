@@ -1,19 +1,47 @@
 # secretarias/views.py
 
-from datetime import date
+from datetime import datetime, timedelta
+from django.db import transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Concat, Trim
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework.views import APIView
-from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
 
 # Importando os modelos e serializers necessários
-from agendamentos.models import Consulta, ConsultaStatusLog
-from .serializers import DashboardStatsSerializer, ConsultaHojeSerializer
+from agendamentos.models import Consulta, ConsultaStatusLog, EstadoAgenda
+from agendamentos.signals import consultas_alteradas
+from .serializers import DashboardStatsSerializer, status_para_tela
 from users.permissions import HasRole
 
 # 1. IMPORTE AS CONSTANTES DE STATUS DO SEU APP DE AGENDAMENTOS
-from agendamentos.consts import STATUS_CONSULTA_CONFIRMADA, STATUS_CONSULTA_PENDENTE
+from agendamentos.consts import (
+    STATUS_CONSULTA_CONFIRMADA, STATUS_CONSULTA_PENDENTE, STATUS_CONSULTA_CANCELADA,
+    STATUS_CONSULTA_CONCLUIDA, STATUS_CONSULTA_EM_ESPERA, STATUS_CONSULTA_EM_ATENDIMENTO,
+    STATUS_CONSULTA_CHOICES, LOTE_MAXIMO,
+    HORARIO_EXPEDIENTE_INICIO, HORARIO_EXPEDIENTE_FIM, INTERVALO_HORARIOS,
+)
+from agendamentos.disponibilidade import combinar
+from medicos.models import Medico
+from .dashboard import estatisticas, hoje_na_clinica
+from .eventos import fluxo
+
+
+# Status a partir dos quais a secretária não pode confirmar ou cancelar a consulta.
+# Consultas na recepção (check-in feito) seguem pelo fluxo de atendimento.
+STATUS_SEM_CONFIRMACAO = (
+    STATUS_CONSULTA_CANCELADA, STATUS_CONSULTA_CONCLUIDA,
+    STATUS_CONSULTA_EM_ESPERA, STATUS_CONSULTA_EM_ATENDIMENTO,
+)
+STATUS_SEM_CANCELAMENTO = (STATUS_CONSULTA_CONCLUIDA, STATUS_CONSULTA_EM_ATENDIMENTO)
 
 
 # ATENÇÃO: Verifique se sua classe de permissão está neste local e com este nome.
@@ -28,53 +56,46 @@ class DashboardStatsView(APIView):
     required_roles = ['SECRETARIA']
 
     def get(self, request):
-        today = date.today()
-        
-        # Obtém a clínica da secretária logada
-        clinica = request.user.perfil_secretaria.clinica
-        
-        # Filtra as consultas pela clínica
-        consultas_do_dia = Consulta.objects.filter(
-            data_hora__date=today,
-            clinica=clinica
-        )
-        consultas_do_mes = Consulta.objects.filter(
-            data_hora__year=today.year, 
-            data_hora__month=today.month,
-            clinica=clinica
-        )
-
-        # Contagens
-        stats_data = {
-            'today': consultas_do_dia.count(),
-            
-            # 👇 CORREÇÃO: USANDO AS CONSTANTES PARA GARANTIR CONSISTÊNCIA 👇
-            'confirmed': consultas_do_dia.filter(status_atual=STATUS_CONSULTA_CONFIRMADA).count(),
-            'pending': consultas_do_dia.filter(status_atual=STATUS_CONSULTA_PENDENTE).count(),
-            
-            'totalMonth': consultas_do_mes.count(),
-        }
+        # Um único agregado sobre o mês da clínica, em cache (ver secretarias.dashboard)
+        stats_data = estatisticas(request.user.perfil_secretaria.clinica_id)
 
         serializer = DashboardStatsSerializer(data=stats_data)
         serializer.is_valid(raise_exception=True)
         return Response(serializer.data)
 
-class ConsultasHojeView(ListAPIView):
+class ConsultasHojeView(APIView):
     """
     Fornece a lista de consultas agendadas para o dia de hoje.
+    Uma única projeção `.values()` com os nomes de paciente e médico montados
+    no SQL, no intervalo do dia sobre o índice (clinica, data_hora).
     """
-    serializer_class = ConsultaHojeSerializer
     permission_classes = [IsAuthenticated, HasRole]
     required_roles = ['SECRETARIA']
 
-    def get_queryset(self):
-        today = date.today()
-        # Filtra as consultas pela clínica da secretária
-        clinica = self.request.user.perfil_secretaria.clinica
-        return Consulta.objects.filter(
-            data_hora__date=today,
-            clinica=clinica
-        ).order_by('data_hora')
+    def get(self, request):
+        hoje = hoje_na_clinica()
+        clinica_id = request.user.perfil_secretaria.clinica_id
+        consultas = Consulta.objects.filter(
+            clinica_id=clinica_id,
+            data_hora__gte=combinar(hoje, datetime.min.time()),
+            data_hora__lt=combinar(hoje + timedelta(days=1), datetime.min.time()),
+        ).annotate(
+            nome_paciente=Trim(Concat('paciente__user__first_name', Value(' '), 'paciente__user__last_name')),
+            nome_medico=Trim(Concat('medico__first_name', Value(' '), 'medico__last_name')),
+        ).order_by('data_hora', 'id').values('id', 'data_hora', 'status_atual', 'nome_paciente', 'nome_medico')
+
+        rotulos = dict(STATUS_CONSULTA_CHOICES)
+        return Response([
+            {
+                'id': consulta['id'],
+                'time': consulta['data_hora'].strftime('%H:%M'),
+                'patient': consulta['nome_paciente'],
+                'doctor': consulta['nome_medico'],
+                'type': str(rotulos.get(consulta['status_atual'], consulta['status_atual'])),
+                'status': status_para_tela(consulta['status_atual']),
+            }
+            for consulta in consultas
+        ])
 
 
 class ConfirmarConsultaView(APIView):
@@ -90,7 +111,12 @@ class ConfirmarConsultaView(APIView):
             # Filtra pela clínica da secretária
             clinica = request.user.perfil_secretaria.clinica
             consulta = Consulta.objects.get(pk=pk, clinica=clinica)
-            
+            if consulta.status_atual in STATUS_SEM_CONFIRMACAO:
+                return Response(
+                    {'error': f'Consulta já está {consulta.status_atual}.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
             consulta.status_atual = 'CONFIRMADA'
             consulta.save()
 
@@ -121,7 +147,12 @@ class CancelarConsultaView(APIView):
             # Filtra pela clínica da secretária
             clinica = request.user.perfil_secretaria.clinica
             consulta = Consulta.objects.get(pk=pk, clinica=clinica)
-            
+            if consulta.status_atual in STATUS_SEM_CANCELAMENTO:
+                return Response(
+                    {'error': f'Consulta já está {consulta.status_atual}.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
             consulta.status_atual = 'CANCELADA'
             consulta.save()
             
@@ -136,4 +167,277 @@ class CancelarConsultaView(APIView):
             return Response(
                 {'error': 'Consulta não encontrada ou não pertence à sua clínica.'}, 
                 status=status.HTTP_404_NOT_FOUND
-            )
\ No newline at end of file
+            )
+
+
+class AlterarStatusLoteView(APIView):
+    """
+    Base para as ações em lote da secretária. Recebe um PATCH com a lista de
+    consultas em `ids` ou um `filtro` ({"medico", "data", "status_atual"}),
+    sempre restrito à clínica da secretária.
+
+    Todas as consultas elegíveis são alteradas com um único UPDATE e os logs
+    de auditoria são gravados com um único INSERT. As consultas que não
+    puderam ser alteradas são devolvidas em `ignoradas`, com o motivo.
+    """
+    permission_classes = [IsAuthenticated, HasRole]
+    required_roles = ['SECRETARIA']
+
+    novo_status = None
+    # Status a partir dos quais a alteração não é permitida
+    status_finais = ()
+
+    def texto_log(self, request):
+        return self.novo_status
+
+    def selecionar(self, queryset, data):
+        """Aplica `ids` ou `filtro` do corpo da requisição. Levanta ValueError se inválidos."""
+        ids = data.get('ids')
+        filtro = data.get('filtro')
+
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+                raise ValueError("O campo 'ids' deve ser uma lista de números.")
+            if len(ids) > LOTE_MAXIMO:
+                raise ValueError(f'Envie no máximo {LOTE_MAXIMO} consultas por requisição.')
+            return queryset.filter(pk__in=ids), ids
+
+        if not isinstance(filtro, dict) or not filtro:
+            raise ValueError("Informe 'ids' ou 'filtro'.")
+
+        medico = filtro.get('medico')
+        if medico is not None:
+            if not str(medico).isdigit():
+                raise ValueError("O campo 'filtro.medico' deve ser um número.")
+            queryset = queryset.filter(medico_id=int(medico))
+
+        data_str = filtro.get('data')
+        if data_str is not None:
+            dia = parse_date(str(data_str))
+            if dia is None:
+                raise ValueError("O campo 'filtro.data' deve estar no formato AAAA-MM-DD.")
+            queryset = queryset.filter(
+                data_hora__gte=combinar(dia, datetime.min.time()),
+                data_hora__lt=combinar(dia + timedelta(days=1), datetime.min.time()),
+            )
+
+        status_atual = filtro.get('status_atual')
+        if status_atual is not None:
+            if status_atual not in [choice[0] for choice in STATUS_CONSULTA_CHOICES]:
+                raise ValueError(f"Status '{status_atual}' inválido.")
+            queryset = queryset.filter(status_atual=status_atual)
+
+        return queryset, None
+
+    def patch(self, request):
+        clinica_id = request.user.perfil_secretaria.clinica_id
+        try:
+            consultas, ids_pedidos = self.selecionar(
+                Consulta.objects.filter(clinica_id=clinica_id), request.data
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        texto_log = self.texto_log(request)
+        try:
+            with transaction.atomic():
+                encontradas = [
+                    EstadoAgenda(*linha) for linha in consultas.select_for_update().order_by('pk').values_list(
+                        'id', 'medico_id', 'paciente_id', 'clinica_id', 'data_hora', 'status_atual'
+                    )[:LOTE_MAXIMO + 1]
+                ]
+                # O filtro também respeita o limite por requisição
+                if len(encontradas) > LOTE_MAXIMO:
+                    raise ValueError(
+                        f'O filtro seleciona mais de {LOTE_MAXIMO} consultas; restrinja o filtro.'
+                    )
+                alteradas = [
+                    antes for antes in encontradas
+                    if antes.status_atual != self.novo_status and antes.status_atual not in self.status_finais
+                ]
+                ids_alterados = [antes.id for antes in alteradas]
+
+                if alteradas:
+                    # update() não passa pelo auto_now: a data de atualização vai explícita
+                    Consulta.objects.filter(pk__in=ids_alterados).update(
+                        status_atual=self.novo_status, data_atualizacao=timezone.now()
+                    )
+                    ConsultaStatusLog.objects.bulk_create([
+                        ConsultaStatusLog(consulta_id=pk, status_novo=texto_log, pessoa=request.user)
+                        for pk in ids_alterados
+                    ])
+                    # update() não dispara post_save: avisa caches e contadores explicitamente
+                    consultas_alteradas.send(sender=Consulta, alteracoes=[
+                        (antes, antes._replace(status_atual=self.novo_status)) for antes in alteradas
+                    ])
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        conjunto_alterados = set(ids_alterados)
+        ignoradas = [
+            {'id': antes.id, 'error': f'Consulta já está {antes.status_atual}.'}
+            for antes in encontradas if antes.id not in conjunto_alterados
+        ]
+        if ids_pedidos is not None:
+            ids_encontrados = {antes.id for antes in encontradas}
+            ignoradas.extend(
+                {'id': pk, 'error': 'Consulta não encontrada ou não pertence à sua clínica.'}
+                for pk in dict.fromkeys(ids_pedidos) if pk not in ids_encontrados
+            )
+
+        return Response({'atualizadas': ids_alterados, 'ignoradas': ignoradas}, status=status.HTTP_200_OK)
+
+
+class ConfirmarConsultasLoteView(AlterarStatusLoteView):
+    """
+    Confirma várias consultas de uma vez.
+    Recebe um PATCH request em /api/secretarias/consultas/confirmar-lote/
+    """
+    novo_status = STATUS_CONSULTA_CONFIRMADA
+    status_finais = STATUS_SEM_CONFIRMACAO
+
+
+class CancelarConsultasLoteView(AlterarStatusLoteView):
+    """
+    Cancela várias consultas de uma vez, com um `motivo` opcional.
+    Recebe um PATCH request em /api/secretarias/consultas/cancelar-lote/
+    """
+    novo_status = STATUS_CONSULTA_CANCELADA
+    status_finais = STATUS_SEM_CANCELAMENTO
+
+    def texto_log(self, request):
+        motivo = request.data.get('motivo', 'Cancelado pela secretaria')
+        return f'CANCELADA - Motivo: {motivo}'
+
+
+class AgendaClinicaView(APIView):
+    """
+    Grade da agenda de todos os médicos da clínica da secretária num período
+    (padrão: a semana corrente, de segunda a domingo).
+    Recebe GET em /api/secretarias/agenda/?data_inicio=AAAA-MM-DD&data_fim=AAAA-MM-DD
+
+    A resposta é colunar: `medicos` e `consultas` trazem listas paralelas, e
+    cada consulta aponta para a posição do médico em `medicos` e do dia em
+    `dias`, com o horário em minutos desde a meia-noite. Uma semana da clínica
+    inteira vem numa única resposta, montada com uma consulta por tabela.
+    """
+    permission_classes = [IsAuthenticated, HasRole]
+    required_roles = ['SECRETARIA']
+
+    MAX_DIAS = 31
+
+    def get(self, request):
+        clinica_id = request.user.perfil_secretaria.clinica_id
+
+        hoje = hoje_na_clinica()
+        data_inicio = request.query_params.get('data_inicio')
+        data_fim = request.query_params.get('data_fim')
+        inicio = parse_date(data_inicio) if data_inicio else hoje - timedelta(days=hoje.weekday())
+        fim = parse_date(data_fim) if data_fim else inicio + timedelta(days=6)
+        if inicio is None or fim is None:
+            return Response(
+                {"error": "Os parâmetros 'data_inicio' e 'data_fim' devem estar no formato AAAA-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if fim < inicio or (fim - inicio).days >= self.MAX_DIAS:
+            return Response(
+                {"error": f"O período deve ter entre 1 e {self.MAX_DIAS} dias."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dias = [inicio + timedelta(days=i) for i in range((fim - inicio).days + 1)]
+        indice_dia = {dia: i for i, dia in enumerate(dias)}
+
+        # Uma consulta indexada em (clinica, data_hora) para todo o período
+        consultas = list(
+            Consulta.objects.ativas()
+            .filter(
+                clinica_id=clinica_id,
+                data_hora__gte=combinar(inicio, datetime.min.time()),
+                data_hora__lt=combinar(fim + timedelta(days=1), datetime.min.time()),
+            )
+            .order_by('medico_id', 'data_hora')
+            .values_list(
+                'id', 'medico_id', 'data_hora', 'status_atual',
+                'paciente__user__first_name', 'paciente__user__last_name',
+            )
+        )
+
+        # Médicos da clínica e também os que atendem nela no período sem vínculo cadastrado
+        ids_com_consulta = {medico_id for _, medico_id, *_ in consultas}
+        medicos = list(
+            Medico.objects.filter(Q(clinicas__id=clinica_id) | Q(user_id__in=ids_com_consulta))
+            .distinct()
+            .order_by('user__first_name', 'user__last_name', 'user_id')
+            .values_list('user_id', 'user__first_name', 'user__last_name', 'especialidade')
+        )
+        indice_medico = {medico_id: i for i, (medico_id, *_) in enumerate(medicos)}
+        rotulos = dict(Medico.EspecialidadeChoices.choices)
+
+        colunas = {'id': [], 'medico': [], 'dia': [], 'minuto': [], 'status': [], 'paciente': []}
+        for pk, medico_id, data_hora, status_atual, nome, sobrenome in consultas:
+            if medico_id not in indice_medico:
+                continue  # usuário sem perfil de médico
+            colunas['id'].append(pk)
+            colunas['medico'].append(indice_medico[medico_id])
+            colunas['dia'].append(indice_dia[data_hora.date()])
+            colunas['minuto'].append(data_hora.hour * 60 + data_hora.minute)
+            colunas['status'].append(status_atual)
+            colunas['paciente'].append(f'{nome} {sobrenome}'.strip())
+
+        return Response({
+            'dias': [dia.isoformat() for dia in dias],
+            'expediente': {
+                'inicio': HORARIO_EXPEDIENTE_INICIO.strftime('%H:%M'),
+                'fim': HORARIO_EXPEDIENTE_FIM.strftime('%H:%M'),
+                'intervalo_minutos': int(INTERVALO_HORARIOS.total_seconds() // 60),
+            },
+            'medicos': {
+                'id': [medico_id for medico_id, *_ in medicos],
+                'nome': [f'{nome} {sobrenome}'.strip() for _, nome, sobrenome, _ in medicos],
+                'especialidade': [str(rotulos.get(esp, esp)) for *_, esp in medicos],
+            },
+            'consultas': colunas,
+        })
+
+
+def _secretaria_autenticada(request):
+    """Autentica o JWT como as views DRF fazem e retorna o id da clínica da secretária (ou None)."""
+    try:
+        resultado = JWTAuthentication().authenticate(request)
+    except (AuthenticationFailed, InvalidToken):
+        return None
+    if resultado is None:
+        return None
+    user = resultado[0]
+    if user.user_type != 'SECRETARIA' or not hasattr(user, 'perfil_secretaria'):
+        return None
+    return user.perfil_secretaria.clinica_id
+
+
+async def eventos_clinica(request):
+    """
+    Stream SSE com os eventos da recepção da clínica da secretária
+    (ver secretarias.eventos). View assíncrona: sob o servidor ASGI (uvicorn),
+    cada tela conectada ocupa uma tarefa, não uma thread.
+    GET /api/secretarias/eventos/   (cabeçalho opcional Last-Event-ID)
+    """
+    if request.method != 'GET':
+        return JsonResponse({"error": "Método não permitido."}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    clinica_id = await sync_to_async(_secretaria_autenticada)(request)
+    if clinica_id is None:
+        return JsonResponse({"error": "Acesso restrito às secretárias."}, status=status.HTTP_401_UNAUTHORIZED)
+
+    ultimo = request.headers.get('Last-Event-ID') or request.GET.get('ultimo')
+    if ultimo is not None:
+        if not ultimo.isdigit():
+            return JsonResponse({"error": "Last-Event-ID inválido."}, status=status.HTTP_400_BAD_REQUEST)
+        ultimo = int(ultimo)
+
+    response = StreamingHttpResponse(fluxo(clinica_id, ultimo), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Desliga o buffer do nginx para os eventos saírem na hora
+    response['X-Accel-Buffering'] = 'no'
+    return response